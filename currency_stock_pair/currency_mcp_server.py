@@ -5,15 +5,23 @@ from dotenv import load_dotenv
 import os
 
 load_dotenv()
+
+from structured_log import get_logger
+from tracing import set_service, span, traced
+
 EXCHANGE_RATE_API_KEY=os.getenv("EXCHANGE_RATE_API_KEY", "")
 
 
 mcp=FastMCP("Currency Server")
+set_service("currency_mcp")
+# Never print in this server: stdout is the MCP stdio channel. Logs go to stderr / LOG_FILE.
+log = get_logger("currency_mcp")
 
 
 
 
 @mcp.tool()
+@traced(mcp)
 def convert_currency_with_api(amount: float, from_currency: str, to_currency: str) -> str:
     """
     Converts an amount using a specific API service (ExchangeRate-API).
@@ -24,7 +32,9 @@ def convert_currency_with_api(amount: float, from_currency: str, to_currency: st
     url = f"https://v6.exchangerate-api.com/v6/{EXCHANGE_RATE_API_KEY}/latest/{from_currency}"
     
     try:
-        response = requests.get(url)
+        with span("GET v6.exchangerate-api.com/latest", "http", from_currency=from_currency) as record:
+            response = requests.get(url)
+            record.set(status_code=response.status_code)
         response.raise_for_status() # Raise an exception for bad status codes
         
         data = response.json()
@@ -33,15 +43,21 @@ def convert_currency_with_api(amount: float, from_currency: str, to_currency: st
         if to_currency in rates:
             rate = rates[to_currency]
             converted_amount = amount * rate
-            print(f"{amount} {from_currency} = {round(converted_amount, 2)} {to_currency}")
+            log.info("converted", amount=amount, from_currency=from_currency, to_currency=to_currency, rate=rate)
 
             return f"{amount} {from_currency} = {round(converted_amount, 2)} {to_currency}"
         else:
-            print(f"Target currency code '{to_currency}' not found in the API response.")
+            log.warning("target currency not in the API response", to_currency=to_currency)
             return f"Target currency code '{to_currency}' not found in the API response."
 
     except requests.exceptions.RequestException as e:
-        print(f"Failed to fetch exchange rates: {e}")
+        # str(e) holds the request URL, which contains the API key.
+        log.error(
+            "failed to fetch exchange rates",
+            from_currency=from_currency,
+            error=type(e).__name__,
+            status_code=getattr(e.response, "status_code", None),
+        )
         return f"Failed to fetch exchange rates. {e}"
 
 
@@ -16,41 +16,81 @@
 
 from __future__ import annotations
 
+import asyncio
 import json
 import os
 from typing import Any
 from uuid import uuid4
 
-import httpx
 from dotenv import load_dotenv
 
 import aisuite as ai  # 👈 NEW
 
+from langchain_core.tools import BaseTool, ToolException
 from langchain_mcp_adapters.client import MultiServerMCPClient
+from mcp.types import TextContent
 
 from a2a.client import A2ACardResolver, A2AClient
+from a2a.client.errors import A2AClientHTTPError, A2AClientTimeoutError
 from a2a.server.agent_execution import AgentExecutor, RequestContext
 from a2a.server.apps import A2AStarletteApplication
 from a2a.server.events import EventQueue
 from a2a.server.request_handlers import DefaultRequestHandler
-from a2a.server.tasks import InMemoryTaskStore
+from a2a.server.tasks import TaskUpdater
 from a2a.types import (
     AgentCapabilities,
     AgentCard,
     AgentSkill,
     MessageSendParams,
-    SendMessageRequest,
+    Part,
+    SendStreamingMessageRequest,
+    TextPart,
 )
-from a2a.utils import new_agent_text_message
+from a2a.utils import new_task
 
 load_dotenv()
 
+from cancellation import RunningTasks, cancel_downstream
+from deadline import deadline_scope, downstream_metadata, from_metadata, has_time, time_limit
+from metrics import instrument, mcp_call
+from sqlite_task_store import make_task_store
+from structured_log import get_logger
+from tracing import inject, server_span, set_service, span, traced_client
+
+set_service("currency")
+log = get_logger("currency")
+
 # Where Stock Agent (Agent2) will run
 STOCK_AGENT_URL = os.getenv("STOCK_AGENT_URL", "http://localhost:8082")
 
 # Shared LLM model for this whole currency+stock pair system
 DEFAULT_MODEL = os.getenv("CURRENCY_STOCK_MODEL", "openai:gpt-4o-mini")
 
+# Under a request deadline (deadline.py): the optional call to the other agent is only made
+# with this many seconds left, and the LLM summary is skipped (raw tool output returned)
+# with less than CURRENCY_STOCK_SUMMARY_MIN_TIME left.
+PEER_CALL_MIN_TIME = float(os.getenv("CURRENCY_STOCK_PEER_MIN_TIME", "10"))
+SUMMARY_MIN_TIME = float(os.getenv("CURRENCY_STOCK_SUMMARY_MIN_TIME", "5"))
+
+
+def _propagate_trace(client: MultiServerMCPClient, server: str, tool: BaseTool) -> BaseTool:
+    """
+    Run each call of the tool on its own stdio session (as the adapter does) with the
+    caller's trace context in the request _meta, so the server's spans join the trace.
+    """
+    async def call(**arguments: Any) -> tuple[str | list[str], None]:
+        with mcp_call(tool.name):
+            async with client.session(server) as session:
+                result = await session.call_tool(tool.name, arguments, meta=inject() or None)
+            texts = [c.text for c in result.content if isinstance(c, TextContent)]
+            content = texts[0] if len(texts) == 1 else texts or ""
+            if result.isError:
+                raise ToolException(content)
+        return content, None
+
+    tool.coroutine = call
+    return tool
+
 
 class CurrencyPairAgent:
     """
@@ -94,27 +134,21 @@ class CurrencyPairAgent:
         if self._currency_tool is None:
             tools = await self._mcp_client.get_tools()
 
-            # Debug: see what tools we actually got
-            print("\n[CurrencyPairAgent] MCP tools:")
-            for t in tools:
-                try:
-                    print(" -", t.name)
-                except AttributeError:
-                    print(" - tool without .name:", t)
+            log.info("MCP tools", tools=[getattr(t, "name", repr(t)) for t in tools])
 
             # Try to find the specific tool by (partial) name match
             for t in tools:
                 name = getattr(t, "name", "")
                 if "convert_currency_with_api" in name or name == "convert_currency_with_api":
-                    self._currency_tool = t
+                    self._currency_tool = _propagate_trace(self._mcp_client, "currency", t)
                     break
 
             # Fallback: just pick the first tool if we didn't find by name
             if self._currency_tool is None:
                 if not tools:
                     raise RuntimeError("No tools returned from currency MCP server.")
-                print("[CurrencyPairAgent] No tool named convert_currency_with_api; using first tool.")
-                self._currency_tool = tools[0]
+                log.warning("no tool named convert_currency_with_api; using the first tool")
+                self._currency_tool = _propagate_trace(self._mcp_client, "currency", tools[0])
 
         return self._currency_tool
 
@@ -124,13 +158,17 @@ class CurrencyPairAgent:
     ) -> str:
         tool = await self._get_currency_tool()
         # LangChain tools support ainvoke in async contexts
-        result = await tool.ainvoke(
-            {
-                "amount": amount,
-                "from_currency": from_currency,
-                "to_currency": to_currency,
-            }
-        )
+        with span(f"tool {tool.name}", "tool", tool=tool.name):
+            result = await asyncio.wait_for(
+                tool.ainvoke(
+                    {
+                        "amount": amount,
+                        "from_currency": from_currency,
+                        "to_currency": to_currency,
+                    }
+                ),
+                time_limit(),
+            )
         # currency_mcp_server returns a string like "100 USD = 82.34 EUR"
         return str(result)
 
@@ -139,7 +177,7 @@ class CurrencyPairAgent:
         Call Stock Agent (Agent2) over A2A using HTTP.
         payload_dict is usually {"symbol": "...", "start_date": "...", "end_date": "..."}.
         """
-        async with httpx.AsyncClient(timeout=60.0) as httpx_client:
+        async with traced_client(timeout=time_limit(60.0)) as httpx_client:
             # 1) Discover Stock Agent via its AgentCard
             resolver = A2ACardResolver(
                 httpx_client=httpx_client,
@@ -151,36 +189,53 @@ class CurrencyPairAgent:
             client = A2AClient(httpx_client=httpx_client, agent_card=agent_card)
 
             message_text = json.dumps(payload_dict)
+            metadata = inject(downstream_metadata())
 
             payload: dict[str, Any] = {
                 "message": {
                     "role": "user",
                     "parts": [{"kind": "text", "text": message_text}],
                     "messageId": uuid4().hex,
+                    **({"metadata": metadata} if metadata else {}),
                 }
             }
 
-            request = SendMessageRequest(
+            request = SendStreamingMessageRequest(
                 id=str(uuid4()),
                 params=MessageSendParams(**payload),
             )
 
-            response = await client.send_message(request)
-            data = response.model_dump(mode="json", exclude_none=True)
-
-            if "error" in data:
-                return f"(Stock Agent error: {data['error'].get('message')})"
-
-            result = data.get("result") or {}
-            parts = result.get("parts") or []
-            for part in parts:
-                if (
-                    isinstance(part, dict)
-                    and part.get("kind") == "text"
-                    and isinstance(part.get("text"), str)
-                ):
-                    return part["text"]
-
+            # Streamed, so the Stock Agent's task id is known (and cancellable) while it works.
+            texts: list[str] = []
+            forget = None
+            try:
+                async for response in client.send_message_streaming(request):
+                    data = response.model_dump(mode="json", exclude_none=True)
+
+                    if "error" in data:
+                        return f"(Stock Agent error: {data['error'].get('message')})"
+
+                    event = data.get("result") or {}
+                    task_id = event.get("id") if event.get("kind") == "task" else event.get("taskId")
+                    if forget is None and task_id:
+                        forget = cancel_downstream(client, task_id)
+
+                    if event.get("kind") == "artifact-update":
+                        parts = (event.get("artifact") or {}).get("parts") or []
+                    else:
+                        # A failed task explains why in its status message.
+                        parts = ((event.get("status") or {}).get("message") or {}).get("parts") or []
+                    texts.extend(
+                        part["text"]
+                        for part in parts
+                        if part.get("kind") == "text" and isinstance(part.get("text"), str)
+                    )
+            finally:
+                if forget is not None:
+                    forget()
+
+            if texts:
+                return "\n".join(texts)
             return "(Stock Agent did not return a usable text response.)"
 
     async def invoke(self, user_input: str) -> str:
@@ -192,7 +247,7 @@ class CurrencyPairAgent:
         - Then use AISuite OpenAI LLM to summarize the pair analysis
         """
         # 🔍 Debug: see what we actually got
-        print("\n[CurrencyPairAgent] raw user_input:", repr(user_input))
+        log.debug("user input", user_input=user_input)
 
         try:
             data = json.loads(user_input)
@@ -206,7 +261,7 @@ class CurrencyPairAgent:
 
         # 🔧 If the decoded JSON is a list (e.g. [{"amount": ...}]), pick the first dict
         if isinstance(data, list):
-            print("[CurrencyPairAgent] decoded data is a list, taking first element")
+            log.info("decoded data is a list, taking the first element")
             if data and isinstance(data[0], dict):
                 data = data[0]
             else:
@@ -244,7 +299,18 @@ class CurrencyPairAgent:
                 "start_date": start_date,
                 "end_date": end_date,
             }
-            stock_text = await self._call_stock_agent(stock_payload)
+            if not has_time(PEER_CALL_MIN_TIME):
+                stock_text = "(Stock data skipped: not enough time left before the deadline.)"
+            else:
+                try:
+                    # A2AClient turns httpx timeouts / transport errors into its own errors.
+                    with span("a2a stock", "a2a", agent="stock"):
+                        async with asyncio.timeout(time_limit()):
+                            stock_text = await self._call_stock_agent(stock_payload)
+                except (TimeoutError, A2AClientTimeoutError):
+                    stock_text = "(Stock Agent didn't answer before the deadline.)"
+                except A2AClientHTTPError as e:
+                    stock_text = f"(Stock Agent unavailable: {e.message})"
 
         # Combine raw tool outputs
         tools_output = f"[FX via Currency MCP] {fx_text}"
@@ -263,22 +329,31 @@ class CurrencyPairAgent:
             "- Keep it under 200 words and avoid jargon."
         )
 
+        if not has_time(SUMMARY_MIN_TIME):
+            return tools_output
+
         try:
-            completion = self._llm_client.chat.completions.create(
-                model=self._model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {
-                        "role": "user",
-                        "content": (
-                            "User input (JSON or natural language):\n"
-                            f"{user_input}\n\n"
-                            "Tool outputs (FX + optional stock):\n"
-                            f"{tools_output}"
-                        ),
-                    },
-                ],
-            )
+            with span("llm summary", "llm", model=self._model) as record:
+                completion = await asyncio.wait_for(
+                    asyncio.to_thread(
+                        self._llm_client.chat.completions.create,
+                        model=self._model,
+                        messages=[
+                            {"role": "system", "content": system_prompt},
+                            {
+                                "role": "user",
+                                "content": (
+                                    "User input (JSON or natural language):\n"
+                                    f"{user_input}\n\n"
+                                    "Tool outputs (FX + optional stock):\n"
+                                    f"{tools_output}"
+                                ),
+                            },
+                        ],
+                    ),
+                    time_limit(),
+                )
+                record.set_usage(completion)
 
             content: Any = completion.choices[0].message.content
 
@@ -292,7 +367,7 @@ class CurrencyPairAgent:
 
         except Exception as e:
             # If LLM fails for any reason, fall back to raw tools output
-            print("[CurrencyPairAgent] LLM error:", repr(e))
+            log.warning("LLM summary failed, returning the raw tool output", error=repr(e))
             return tools_output
 
 
@@ -304,6 +379,7 @@ class CurrencyPairAgentExecutor(AgentExecutor):
 
     def __init__(self) -> None:
         self.agent = CurrencyPairAgent()
+        self.running = RunningTasks()
 
     async def execute(
         self,
@@ -311,15 +387,33 @@ class CurrencyPairAgentExecutor(AgentExecutor):
         event_queue: EventQueue,
     ) -> None:
         user_input: str = context.get_user_input()  # type: ignore[assignment]
-        result_text = await self.agent.invoke(user_input)
-        await event_queue.enqueue_event(new_agent_text_message(result_text))
+        metadata = (context.message.metadata if context.message else None) or {}
+        # Run as an A2A task, so callers can cancel it (tasks/cancel) while it works.
+        task = context.current_task
+        if task is None:
+            task = new_task(context.message)
+            await event_queue.enqueue_event(task)
+        updater = TaskUpdater(event_queue, task.id, task.context_id)
+        await updater.start_work()
+
+        with deadline_scope(from_metadata(metadata)), server_span("currency.execute", metadata):
+            try:
+                async with self.running.track(task.id):
+                    result_text = await self.agent.invoke(user_input)
+            except Exception as e:
+                log.error("request failed", error=repr(e))
+                await updater.failed(updater.new_agent_message([Part(root=TextPart(text=f"Currency pair analysis failed: {e}"))]))
+                return
+
+        await updater.add_artifact([Part(root=TextPart(text=result_text))], name="answer")
+        await updater.complete()
 
     async def cancel(
         self,
         context: RequestContext,
         event_queue: EventQueue,
     ) -> None:
-        raise Exception("Cancellation is not supported for this agent.")
+        await self.running.cancel(context, event_queue)
 
 
 # ---- AgentCard for CurrencyPairAgent ----------------------------------------------
@@ -354,7 +448,7 @@ currency_pair_card = AgentCard(
 
 request_handler = DefaultRequestHandler(
     agent_executor=CurrencyPairAgentExecutor(),
-    task_store=InMemoryTaskStore(),
+    task_store=make_task_store("currency_pair"),
 )
 
 _server_app_builder = A2AStarletteApplication(
@@ -363,4 +457,4 @@ _server_app_builder = A2AStarletteApplication(
 )
 
 # uv run uvicorn currency_pair_agent:app --port 8081
-app = _server_app_builder.build()
+app = instrument(_server_app_builder.build(), "currency")
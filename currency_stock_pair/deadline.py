@@ -0,0 +1,86 @@
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
+# Message metadata key holding the absolute deadline of a request (Unix time, seconds).
+DEADLINE_KEY = "deadline"
+# Budget applied when a request arrives without a deadline (0 = no deadline).
+A2A_DEFAULT_BUDGET = float(os.getenv("A2A_DEFAULT_BUDGET", "0"))
+# Each hop keeps this much of the budget back to send its answer upstream, so a
+# downstream agent gets a slightly earlier deadline than its caller.
+A2A_DEADLINE_MARGIN = float(os.getenv("A2A_DEADLINE_MARGIN", "2"))
+# Derived timeouts never go below this, so a nearly spent budget fails fast instead of with 0.
+MIN_TIMEOUT = 0.5
+
+_deadline: ContextVar[float | None] = ContextVar("a2a_deadline", default=None)
+
+
+def from_metadata(metadata: dict | None) -> float | None:
+    try:
+        return float((metadata or {})[DEADLINE_KEY])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+@contextmanager
+def deadline_scope(deadline: float | None) -> Iterator[float | None]:
+    """
+    Make `deadline` the deadline of the code running in this context (and of the asyncio
+    tasks it starts). Falls back to A2A_DEFAULT_BUDGET; never extends an outer deadline.
+    """
+    if deadline is None and A2A_DEFAULT_BUDGET > 0:
+        deadline = time.time() + A2A_DEFAULT_BUDGET
+    outer = _deadline.get()
+    if outer is not None and (deadline is None or outer < deadline):
+        deadline = outer
+    token = _deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _deadline.reset(token)
+
+
+def current() -> float | None:
+    return _deadline.get()
+
+
+def remaining() -> float | None:
+    """
+    Seconds left until the current deadline, or None without one.
+    """
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.time()
+
+
+def has_time(seconds: float) -> bool:
+    """
+    True when at least `seconds` are left (always true without a deadline).
+    Used to skip optional work that would not finish in time.
+    """
+    left = remaining()
+    return left is None or left >= seconds
+
+
+def time_limit(cap: float | None = None) -> float | None:
+    """
+    Timeout for one LLM / MCP / HTTP call: `cap`, shortened to what is left of the budget.
+    None (no timeout) without either.
+    """
+    left = remaining()
+    if left is None:
+        return cap
+    left = max(MIN_TIMEOUT, left)
+    return left if cap is None else min(cap, left)
+
+
+def downstream_metadata(metadata: dict | None = None) -> dict:
+    """
+    Message metadata for a call to another agent, carrying our deadline minus the hop margin.
+    """
+    metadata = dict(metadata or {})
+    deadline = _deadline.get()
+    if deadline is not None:
+        metadata[DEADLINE_KEY] = deadline - A2A_DEADLINE_MARGIN
+    return metadata
@@ -0,0 +1,122 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+
+from a2a.server.context import ServerCallContext
+from a2a.server.tasks import InMemoryTaskStore, TaskStore
+from a2a.types import Task
+
+# memory (default) or sqlite
+A2A_TASK_STORE = os.getenv("A2A_TASK_STORE", "memory")
+A2A_TASK_DIR = os.getenv("A2A_TASK_DIR", ".a2a_tasks")
+# Tasks not updated for this long are evicted.
+A2A_TASK_TTL = float(os.getenv("A2A_TASK_TTL", str(24 * 3600)))
+# At most this many tasks are kept; the least recently updated go first.
+A2A_TASK_MAX = int(os.getenv("A2A_TASK_MAX", "10000"))
+# Only the most recent messages of a task's history are stored.
+A2A_TASK_MAX_HISTORY = int(os.getenv("A2A_TASK_MAX_HISTORY", "20"))
+
+# Evict at most once per this many saves.
+EVICT_EVERY = 100
+
+
+class SqliteTaskStore(TaskStore):
+    """
+    Durable, bounded TaskStore backed by one SQLite file (WAL mode).
+
+    Tasks are stored as zlib-compressed JSON with the history trimmed to the last
+    max_history messages. Expired (ttl) and excess (max_tasks) tasks are evicted as
+    saves come in. SQLite calls run in a worker thread so the event loop never blocks.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ttl: float = A2A_TASK_TTL,
+        max_tasks: int = A2A_TASK_MAX,
+        max_history: int = A2A_TASK_MAX_HISTORY,
+    ) -> None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.ttl = ttl
+        self.max_tasks = max_tasks
+        self.max_history = max_history
+        self._saves = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            " id TEXT PRIMARY KEY, context_id TEXT, state TEXT, updated_at REAL NOT NULL, data BLOB NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS tasks_updated_at ON tasks (updated_at)")
+
+    def _encode(self, task: Task) -> bytes:
+        if task.history and len(task.history) > self.max_history:
+            task = task.model_copy(update={"history": task.history[-self.max_history:]})
+        return zlib.compress(task.model_dump_json(exclude_none=True).encode(), 6)
+
+    def _save(self, task: Task) -> None:
+        data = self._encode(task)
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO tasks (id, context_id, state, updated_at, data) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET context_id=excluded.context_id, state=excluded.state, "
+                "updated_at=excluded.updated_at, data=excluded.data",
+                (task.id, task.context_id, task.status.state.value, time.time(), data),
+            )
+            self._saves += 1
+            if self._saves % EVICT_EVERY == 0:
+                self._evict()
+
+    def _evict(self) -> None:
+        self._db.execute("DELETE FROM tasks WHERE updated_at < ?", (time.time() - self.ttl,))
+        self._db.execute(
+            "DELETE FROM tasks WHERE id IN (SELECT id FROM tasks ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_tasks,),
+        )
+
+    def _get(self, task_id: str) -> Task | None:
+        with self._lock:
+            row = self._db.execute("SELECT updated_at, data FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        if row is None or row[0] < time.time() - self.ttl:
+            return None
+        return Task.model_validate_json(zlib.decompress(row[1]))
+
+    def _delete(self, task_id: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+
+    async def save(self, task: Task, context: ServerCallContext | None = None) -> None:
+        await asyncio.to_thread(self._save, task)
+
+    async def get(self, task_id: str, context: ServerCallContext | None = None) -> Task | None:
+        return await asyncio.to_thread(self._get, task_id)
+
+    async def delete(self, task_id: str, context: ServerCallContext | None = None) -> None:
+        await asyncio.to_thread(self._delete, task_id)
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+def make_task_store(name: str) -> TaskStore:
+    """
+    The task store for one A2A app, selected with A2A_TASK_STORE (memory | sqlite).
+    SQLite stores live in A2A_TASK_DIR/<name>.db.
+    """
+    if A2A_TASK_STORE == "sqlite":
+        return SqliteTaskStore(os.path.join(A2A_TASK_DIR, f"{name}.db"))
+    if A2A_TASK_STORE == "memory":
+        return InMemoryTaskStore()
+    raise ValueError(f"Unknown A2A_TASK_STORE: {A2A_TASK_STORE!r} (expected 'memory' or 'sqlite')")
@@ -4,10 +4,16 @@ from datetime import datetime
 from mcp.server.fastmcp import FastMCP
 
 import pandas as pd
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from tracing import set_service, span, traced
 
 
 
 mcp=FastMCP("Stock Data Server")
+set_service("stock_mcp")
 
 
 
@@ -20,12 +26,14 @@ def get_current_date():
     return datetime.now().strftime("%Y-%m-%d")
 
 @mcp.tool()
+@traced(mcp)
 def get_stock_data(symbol, start_date, end_date):
     """
     Returns a clean DataFrame with columns:
     Date, Close, High, Open, Volume
     """
-    df = yf.download(symbol, start=start_date, end=end_date)
+    with span("yfinance download", "http", symbol=symbol):
+        df = yf.download(symbol, start=start_date, end=end_date)
 
     # Reset index to make 'Date' a column
     df = df.reset_index()
@@ -1,18 +1,36 @@
 import asyncio
 import json
+import os
+import time
 from uuid import uuid4
 
-import httpx
 from a2a.client import A2ACardResolver, A2AClient
 from a2a.types import MessageSendParams, SendMessageRequest
 
+from deadline import DEADLINE_KEY
+from tracing import inject, set_service, span, traced_client
+
+set_service("test")
+
 
 AGENT1_URL = "http://localhost:8081"  # Currency Pair Agent URL
 
+# Seconds the agents get for the request; sent as an absolute deadline so every hop
+# (Agent1 -> Agent2) derives its timeouts from what is left.
+REQUEST_BUDGET = float(os.getenv("A2A_REQUEST_BUDGET", "60"))
+
 
 async def main():
+    deadline = time.time() + REQUEST_BUDGET
+
+    with span("test.main", "a2a", agent="currency") as root:
+        print(f"trace: {root.trace_id}  (render with: python tracing.py {root.trace_id[:8]})")
+        await _ask_currency_agent(deadline)
+
+
+async def _ask_currency_agent(deadline: float) -> None:
     # 1) Discover Agent1 via its AgentCard
-    async with httpx.AsyncClient(timeout=60.0) as httpx_client:
+    async with traced_client(timeout=REQUEST_BUDGET) as httpx_client:
         resolver = A2ACardResolver(
             httpx_client=httpx_client,
             base_url=AGENT1_URL,
@@ -39,6 +57,7 @@ async def main():
                 "role": "user",
                 "parts": [{"kind": "text", "text": message_text}],
                 "messageId": uuid4().hex,
+                "metadata": inject({DEADLINE_KEY: deadline}),
             }
         }
 
@@ -1,32 +1,97 @@
 import asyncio
+import os
+import sys
+import time
 from uuid import uuid4
 from typing import Any
 
-import httpx
 from a2a.client import A2ACardResolver, A2AClient
-from a2a.types import MessageSendParams, SendMessageRequest
+from a2a.types import (
+    GetTaskRequest,
+    MessageSendConfiguration,
+    MessageSendParams,
+    SendMessageRequest,
+    TaskQueryParams,
+)
 
 from dotenv import load_dotenv
 
-
+load_dotenv()
 
 import agents.initialPlanner, agents.clientResponse
+from agents.a2a_response import decode_response, decode_result
+from deadline import DEADLINE_KEY
+from tracing import inject, set_service, span, traced_client
 
-load_dotenv()
+set_service("a2a_client")
 
 BASE_URL = "http://localhost:8131"
 
+# The workflow runs as a background task on the Docs agent; we poll it this often.
+POLL_INTERVAL = float(os.getenv("A2A_POLL_INTERVAL", "3"))
+
+TERMINAL_STATES = {"completed", "failed", "canceled", "rejected"}
 
-async def ask_agent(message: str) -> None:
+# cached: plan (from the plan cache when possible) before dispatching;
+# concurrent: plan alongside the dispatch; off: don't plan.
+PLANNING_MODE = os.getenv("PLANNING_MODE", "cached")
+
+# Seconds the workflow may take, sent as an absolute deadline in the message metadata
+# (0 = no deadline; the run can still be resumed from its checkpoints).
+REQUEST_BUDGET = float(os.getenv("A2A_REQUEST_BUDGET", "0"))
+
+
+async def wait_for_task(client: A2AClient, task_id: str) -> dict:
+    """
+    Poll the task until it reaches a terminal state, printing each new progress message.
+    Returns the final task as JSON.
+    """
+    last_status = None
+    while True:
+        response = await client.get_task(GetTaskRequest(id=str(uuid4()), params=TaskQueryParams(id=task_id)))
+        response = response.model_dump(mode="json", exclude_none=True)
+        if "error" in response:
+            raise RuntimeError(response["error"].get("message"))
+
+        task = response["result"]
+        status = task.get("status") or {}
+        progress = decode_result({"kind": "status-update", "status": status}).text
+        if progress and progress != last_status:
+            print(f"[{status.get('state')}] {progress}")
+            last_status = progress
+
+        if status.get("state") in TERMINAL_STATES:
+            return task
+        await asyncio.sleep(POLL_INTERVAL)
+
+
+async def ask_agent(message: str, resume_task_id: str | None = None) -> None:
     """
     Send a simple A2A message to the Flight agent and print the response.
     """
 
-    strategy = await agents.initialPlanner.inital_planner_ollama(message)
-
-    print(strategy)
+    # The plan is informational only; the Docs agent runs its own workflow.
+    planner = None
+    if PLANNING_MODE == "cached":
+        print(await agents.initialPlanner.cached_plan(message))
+    elif PLANNING_MODE == "concurrent":
+        planner = asyncio.create_task(agents.initialPlanner.cached_plan(message))
+        planner.add_done_callback(lambda t: t.cancelled() or t.exception() or print(t.result()))
     
-    async with httpx.AsyncClient(timeout=120.0) as httpx_client:
+    metadata = {"resume_task_id": resume_task_id} if resume_task_id else {}
+    if REQUEST_BUDGET > 0:
+        metadata[DEADLINE_KEY] = time.time() + REQUEST_BUDGET
+
+    with span("a2a_client.ask_agent", "a2a", agent="docs") as root:
+        print(f"trace: {root.trace_id}  (render with: python tracing.py {root.trace_id[:8]})")
+        await _run_workflow(message, metadata, resume_task_id)
+
+    if planner is not None and not planner.done():
+        planner.cancel()
+
+
+async def _run_workflow(message: str, metadata: dict, resume_task_id: str | None) -> None:
+    async with traced_client(timeout=120.0) as httpx_client:
         # 1) Discover agent card from /.well-known/agent-card.json
         resolver = A2ACardResolver(
             httpx_client=httpx_client,
@@ -59,21 +124,34 @@ async def ask_agent(message: str) -> None:
                     {"kind": "text", "text": full_message},
                 ],
                 "messageId": uuid4().hex,
+                # resume_task_id continues an earlier run from its last checkpointed stage.
+                "metadata": inject(metadata),
             }
         }
 
         request = SendMessageRequest(
             id=str(uuid4()),
-            params=MessageSendParams(**send_message_payload),
+            params=MessageSendParams(
+                **send_message_payload,
+                # Return as soon as the task is created; the workflow keeps running.
+                configuration=MessageSendConfiguration(blocking=False),
+            ),
         )
 
-        # 4) Call the agent via A2A
+        # 4) Start the workflow via A2A, then follow its progress
         response = await client.send_message(request)
+        task_id = decode_response(response).task_id
+        if task_id is None:
+            raise RuntimeError(f"The agent did not start a task: {response}")
+        # Checkpoints stay keyed by the task that started the run.
+        print(f"Workflow task {task_id} started (resume with: python a2a_client.py {resume_task_id or task_id})")
+
+        task = await wait_for_task(client, task_id)
 
-        # 5) Print raw JSON for now
-        print("=== Raw A2A response ===")
+        # 5) Extract the text/data parts of the response (no extra LLM pass)
+        print("=== A2A response ===")
 
-        final_response = await agents.clientResponse.client_response_ollama(str(response.model_dump(mode="json", exclude_none=True)))
+        final_response = await agents.clientResponse.client_response_ollama({"result": task})
 
         print(final_response)
 
@@ -81,9 +159,10 @@ async def ask_agent(message: str) -> None:
 
 
 async def main() -> None:
+    # python a2a_client.py [resume_task_id]
     await ask_agent(
         "Write me a content about Marvel's latest upcoming movies and their updates.",
-      
+        resume_task_id=sys.argv[1] if len(sys.argv) > 1 else None,
     )
 
 
@@ -0,0 +1,103 @@
+import json
+from dataclasses import dataclass, field
+from typing import Any
+
+
+@dataclass
+class A2AContent:
+    """
+    The useful content of an A2A response: text parts, data parts and file references,
+    in the order the agent produced them.
+    """
+    texts: list[str] = field(default_factory=list)
+    data: list[dict] = field(default_factory=list)
+    files: list[dict] = field(default_factory=list)
+    task_id: str | None = None
+    state: str | None = None
+    error: str | None = None
+
+    @property
+    def text(self) -> str:
+        if self.error:
+            return f"(Agent error: {self.error})"
+        return "\n".join(self.texts)
+
+    def render(self) -> str:
+        """
+        Text parts followed by the data parts as compact JSON lines.
+        """
+        lines = [self.text] if self.text else []
+        lines.extend(json.dumps(d, ensure_ascii=False) for d in self.data)
+        return "\n".join(lines)
+
+    def merge(self, other: "A2AContent") -> None:
+        self.texts.extend(other.texts)
+        self.data.extend(other.data)
+        self.files.extend(other.files)
+        self.task_id = other.task_id or self.task_id
+        self.state = other.state or self.state
+        self.error = other.error or self.error
+
+
+def _collect_parts(parts: list[dict], content: A2AContent) -> None:
+    for part in parts or []:
+        kind = part.get("kind")
+        if kind == "text" and isinstance(part.get("text"), str):
+            content.texts.append(part["text"])
+        elif kind == "data" and isinstance(part.get("data"), dict):
+            content.data.append(part["data"])
+        elif kind == "file" and isinstance(part.get("file"), dict):
+            file = part["file"]
+            content.files.append({k: file[k] for k in ("name", "mimeType", "uri") if k in file})
+
+
+def decode_result(result: dict) -> A2AContent:
+    """
+    Decode the `result` of an A2A call: a Message, a Task, or a streaming
+    status/artifact update event.
+    """
+    content = A2AContent()
+    kind = result.get("kind")
+
+    if kind == "message":
+        content.task_id = result.get("taskId")
+        _collect_parts(result.get("parts"), content)
+
+    elif kind == "task":
+        content.task_id = result.get("id")
+        status = result.get("status") or {}
+        content.state = status.get("state")
+        for artifact in result.get("artifacts") or []:
+            _collect_parts(artifact.get("parts"), content)
+        # The final agent message (e.g. TaskUpdater.complete(message)) lives in the status.
+        _collect_parts((status.get("message") or {}).get("parts"), content)
+
+    elif kind == "artifact-update":
+        content.task_id = result.get("taskId")
+        _collect_parts((result.get("artifact") or {}).get("parts"), content)
+
+    elif kind == "status-update":
+        content.task_id = result.get("taskId")
+        status = result.get("status") or {}
+        content.state = status.get("state")
+        _collect_parts((status.get("message") or {}).get("parts"), content)
+
+    return content
+
+
+def decode_response(response: Any) -> A2AContent:
+    """
+    Decode a SendMessageResponse / SendStreamingMessageResponse (pydantic model or its
+    JSON dump) into its text and data parts. No LLM involved.
+    """
+    if hasattr(response, "model_dump"):
+        response = response.model_dump(mode="json", exclude_none=True)
+
+    if not isinstance(response, dict):
+        return A2AContent(texts=[str(response)])
+
+    if "error" in response:
+        error = response["error"]
+        return A2AContent(error=error.get("message") if isinstance(error, dict) else str(error))
+
+    return decode_result(response.get("result", response))
@@ -2,6 +2,9 @@ import json
 import aisuite as ai
 import re
 
+from agents.a2a_response import decode_response
+from tracing import span
+
 CLIENT = ai.Client()
 
 # ollama:gemma3:latest
@@ -10,17 +13,25 @@ CLIENT = ai.Client()
 # openai:gpt-4o-mini
 
 
-async def client_response_ollama(response: str, model: str = "ollama:gemma3:latest") -> str:
+async def client_response_ollama(response, model: str = "ollama:gemma3:latest", use_llm: bool = False) -> str:
         """
-        Use the LLM to plan how to:
-        - execute the user's request
+        Extract the content from an A2A response.
+
+        The text and data parts are taken deterministically from the
+        Message/Task/Artifact envelope. Set use_llm=True to additionally have
+        the LLM redraft the extracted content.
         """
+        text = decode_response(response).render()
+
+        if not use_llm:
+            return text
+
         prompt = f"""
 
-                This is the response received from the agent: {response}
+                This is the response received from the agent: {text}
 
                 Extract the content from the response.
-                
+
                 Carefully draft a response message from this content and give it to me.
 
                 Do not give any additional information.
@@ -30,17 +41,18 @@ async def client_response_ollama(response: str, model: str = "ollama:gemma3:late
 
                     """
 
-        completion = CLIENT.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": "You are a meticulous data extractor."},
-                {"role": "user", "content": prompt},
-            ],
-        )
+        with span("llm client_response", "llm", model=model):
+            completion = CLIENT.chat.completions.create(
+                model=model,
+                messages=[
+                    {"role": "system", "content": "You are a meticulous data extractor."},
+                    {"role": "user", "content": prompt},
+                ],
+            )
 
         content = completion.choices[0].message.content
 
 
-                
+
 
         return content
@@ -0,0 +1,108 @@
+import heapq
+import itertools
+import json
+from dataclasses import dataclass
+from typing import Any, Iterator
+
+from agents.context_manager import estimate_tokens
+
+REPLY_FIELDS = ("replies", "children", "comments")
+
+
+@dataclass
+class CommentBudget:
+    """
+    Limits for one comment-tree walk.
+
+    token_budget: stop once the yielded comments would exceed this many tokens.
+    max_depth:    replies deeper than this are never expanded (0 = top-level only).
+    min_score:    comments below this score are dropped together with their replies.
+    max_comments: hard cap on the number of comments yielded.
+    body_chars:   each comment body is cut to this length.
+    """
+    token_budget: int = 1500
+    max_depth: int = 3
+    min_score: int = 1
+    max_comments: int = 30
+    body_chars: int = 500
+
+
+def _score(comment: dict) -> int:
+    try:
+        return int(comment.get("score") or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _replies(comment: dict) -> list[dict]:
+    for key in REPLY_FIELDS:
+        replies = comment.get(key)
+        if isinstance(replies, list):
+            return [r for r in replies if isinstance(r, dict)]
+    return []
+
+
+def iter_top_comments(comments: list[dict], budget: CommentBudget = CommentBudget()) -> Iterator[dict]:
+    """
+    Walk a comment tree best-first (highest score first, across all depths) and yield
+    flattened comments until the budget runs out.
+
+    The walk is lazy: a comment's replies are only looked at once the comment itself
+    has been yielded, so low-scoring branches of a huge thread are never traversed.
+    """
+    order = itertools.count()
+    heap: list[tuple[int, int, int, dict]] = []
+
+    def push(children: list[dict], depth: int) -> None:
+        for child in children:
+            if _score(child) >= budget.min_score:
+                heapq.heappush(heap, (-_score(child), depth, next(order), child))
+
+    push(comments, 0)
+    used = yielded = 0
+    while heap and yielded < budget.max_comments:
+        _, depth, _, comment = heapq.heappop(heap)
+        body = str(comment.get("body") or comment.get("content") or "")
+        if len(body) > budget.body_chars:
+            body = body[: budget.body_chars] + "..."
+        flat = {"author": comment.get("author"), "score": _score(comment), "depth": depth, "body": body}
+
+        cost = estimate_tokens(json.dumps(flat, ensure_ascii=False))
+        if used + cost > budget.token_budget:
+            break
+        used += cost
+        yielded += 1
+        yield flat
+
+        if depth < budget.max_depth:
+            push(_replies(comment), depth + 1)
+
+
+def prune_comments(text: str, budget: CommentBudget = CommentBudget()) -> str:
+    """
+    Tool-result hook for comment fetches (get_post_content / get_post_comments):
+    replaces the full tree with the best comments that fit the budget.
+    Anything that isn't a comment tree passes through unchanged.
+    """
+    try:
+        payload = json.loads(text)
+    except ValueError:
+        return text
+
+    post = None
+    if isinstance(payload, dict) and isinstance(payload.get("comments"), list):
+        post, comments = payload.get("post"), payload["comments"]
+    elif isinstance(payload, list) and payload and all(isinstance(c, dict) and "body" in c for c in payload):
+        comments = payload
+    else:
+        return text
+
+    top = list(iter_top_comments(comments, budget))
+    result: dict[str, Any] = {"comments": top, "comments_shown": len(top)}
+    if isinstance(post, dict):
+        post = dict(post)
+        for key in ("content", "selftext", "body"):
+            if isinstance(post.get(key), str) and len(post[key]) > budget.body_chars * 4:
+                post[key] = post[key][: budget.body_chars * 4] + "..."
+        result = {"post": post, **result}
+    return json.dumps(result, ensure_ascii=False, default=str)
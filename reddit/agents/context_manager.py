@@ -0,0 +1,173 @@
+import ast
+import json
+from typing import Any, Callable
+
+COMPACTED_MARKER = "[compacted tool result]"
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token estimate (~4 characters per token) for providers that don't report usage.
+    """
+    return max(1, len(text) // 4) if text else 0
+
+
+def estimate_messages_tokens(messages: list[dict]) -> int:
+    """
+    Rough token estimate for a whole chat history, including tool call arguments.
+    """
+    total = 0
+    for message in messages:
+        total += estimate_tokens(str(message.get("content") or ""))
+        for tool_call in message.get("tool_calls") or []:
+            total += estimate_tokens(tool_call["function"]["arguments"] or "")
+    return total
+
+
+def _clip(value: Any, max_chars: int) -> Any:
+    if isinstance(value, str) and len(value) > max_chars:
+        return value[:max_chars] + "…"
+    return value
+
+
+def _parse_structured(text: str) -> Any:
+    """
+    Tool results are JSON, or a Python repr of a dict/list (str(dict)); anything else is text.
+    """
+    for parse in (json.loads, ast.literal_eval):
+        try:
+            value = parse(text)
+        except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+            continue
+        if isinstance(value, (dict, list)):
+            return value
+    return None
+
+
+def _extract(value: Any, max_items: int, max_field_chars: int, depth: int = 0, max_depth: int = 3) -> Any:
+    """
+    Keep the shape of a JSON value but only its scalar fields, the first few list items
+    and a bounded nesting depth.
+    """
+    if isinstance(value, dict):
+        out = {}
+        for key, item in value.items():
+            if item is None or isinstance(item, (str, int, float, bool)):
+                out[key] = _clip(item, max_field_chars)
+            elif depth < max_depth:
+                out[key] = _extract(item, max_items, max_field_chars, depth + 1, max_depth)
+        return out
+    if isinstance(value, list):
+        items = [_extract(item, max_items, max_field_chars, depth + 1, max_depth) for item in value[:max_items]]
+        if len(value) > max_items:
+            items.append(f"... {len(value) - max_items} more")
+        return items
+    return _clip(value, max_field_chars)
+
+
+def extract_tool_result(
+    text: str,
+    max_chars: int = 600,
+    max_items: int = 5,
+    max_field_chars: int = 80,
+) -> str:
+    """
+    Structured extract of a tool result: JSON-like payloads keep their keys, first items
+    and short scalar values; plain text keeps its head. Always at most ~max_chars.
+    """
+    value = _parse_structured(text)
+    if value is not None:
+        extract = json.dumps(_extract(value, max_items, max_field_chars), ensure_ascii=False, default=str)
+    else:
+        extract = text
+    if len(extract) > max_chars:
+        extract = extract[:max_chars] + f"…[{len(text) - max_chars} chars dropped]"
+    return f"{COMPACTED_MARKER} {extract}"
+
+
+class ContextManager:
+    """
+    Keeps the prompt of a tool loop under a token budget.
+
+    The full history stays with the caller; view(messages) returns what is actually sent
+    to the model. Once the running token estimate exceeds token_budget, tool results
+    older than the last keep_recent_turns assistant turns are replaced (oldest first) by
+    a structured extract, or by summarizer(text) when one is given.
+    """
+
+    def __init__(
+        self,
+        token_budget: int = 6000,
+        keep_recent_turns: int = 2,
+        extract_chars: int = 600,
+        summarizer: Callable[[str], str] | None = None,
+    ) -> None:
+        self.token_budget = token_budget
+        self.keep_recent_turns = keep_recent_turns
+        self.extract_chars = extract_chars
+        self.summarizer = summarizer
+
+        self.raw_tokens = 0
+        self.sent_tokens = 0
+        self._counted = 0
+        self._token_counts: list[int] = []
+        self._compacted: dict[int, str] = {}
+
+    def _track(self, messages: list[dict]) -> None:
+        # The tool loop only ever appends, so the running estimate is updated incrementally.
+        for message in messages[self._counted:]:
+            tokens = estimate_messages_tokens([message])
+            self._token_counts.append(tokens)
+            self.raw_tokens += tokens
+        self._counted = len(messages)
+
+    def _compact_content(self, content: str) -> str:
+        if self.summarizer is not None:
+            return f"{COMPACTED_MARKER} {self.summarizer(content)}"
+        return extract_tool_result(content, max_chars=self.extract_chars)
+
+    def _protected_from(self, messages: list[dict]) -> int:
+        """
+        Index of the first message that belongs to the recent turns kept verbatim.
+        """
+        seen = 0
+        for index in range(len(messages) - 1, -1, -1):
+            if messages[index]["role"] == "assistant":
+                seen += 1
+                if seen >= self.keep_recent_turns:
+                    return index
+        return 0
+
+    def view(self, messages: list[dict]) -> list[dict]:
+        self._track(messages)
+
+        tokens = self.raw_tokens
+        for index, compacted in self._compacted.items():
+            tokens += estimate_tokens(compacted) - self._token_counts[index]
+
+        if self.token_budget is not None and tokens > self.token_budget:
+            tokens = self._compact(messages, tokens)
+
+        self.sent_tokens = tokens
+        return [
+            {**m, "content": self._compacted[i]} if i in self._compacted else m
+            for i, m in enumerate(messages)
+        ]
+
+    def _compact(self, messages: list[dict], tokens: int) -> int:
+        for index in range(self._protected_from(messages)):
+            if tokens <= self.token_budget:
+                break
+            message = messages[index]
+            if message["role"] != "tool" or index in self._compacted:
+                continue
+            compacted = self._compact_content(str(message["content"]))
+            if estimate_tokens(compacted) >= self._token_counts[index]:
+                continue
+            self._compacted[index] = compacted
+            tokens += estimate_tokens(compacted) - self._token_counts[index]
+        return tokens
+
+    @property
+    def compacted_count(self) -> int:
+        return len(self._compacted)
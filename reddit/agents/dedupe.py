@@ -0,0 +1,120 @@
+import hashlib
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Any
+
+from agents.context_manager import estimate_tokens
+
+FINGERPRINT_BITS = 64
+# Posts whose fingerprints differ in at most this many bits are near-duplicates
+# (reposts, cross-posts, the same story with a slightly different title).
+MAX_HAMMING_DISTANCE = 3
+# MAX_HAMMING_DISTANCE + 1 bands: two fingerprints within the distance agree on at least one band.
+BANDS = MAX_HAMMING_DISTANCE + 1
+BAND_BITS = FINGERPRINT_BITS // BANDS
+# Below this many bigrams (empty or one- and two-word link/image titles) fingerprints
+# collide by chance, so such posts are only matched by url / id.
+MIN_FEATURES = 3
+
+BODY_FIELDS = ("content", "selftext", "body", "text")
+
+
+def _features(text: str) -> list[str]:
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < 3:
+        return words
+    return [" ".join(words[i:i + 2]) for i in range(len(words) - 1)]
+
+
+def simhash(text: str) -> int:
+    """
+    64-bit SimHash over word bigrams: similar texts get fingerprints a few bits apart.
+    """
+    return _simhash(_features(text))
+
+
+def _simhash(features: list[str]) -> int:
+    weights = [0] * FINGERPRINT_BITS
+    for feature in features:
+        h = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), "big")
+        for bit in range(FINGERPRINT_BITS):
+            weights[bit] += 1 if h >> bit & 1 else -1
+    return sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+
+
+def post_text(post: dict) -> str:
+    body = next((post[k] for k in BODY_FIELDS if isinstance(post.get(k), str)), "")
+    return f"{post.get('title') or ''}\n{body[:2000]}"
+
+
+@dataclass
+class FingerprintIndex:
+    """
+    Fingerprints of every post seen during one workflow task, banded for fast
+    near-duplicate lookup, plus what dropping duplicates has saved.
+    """
+    seen_keys: set[str] = field(default_factory=set)
+    bands: dict[tuple[int, int], list[int]] = field(default_factory=dict)
+    dropped: int = 0
+    tokens_saved: int = 0
+
+    def _bands(self, fingerprint: int):
+        mask = (1 << BAND_BITS) - 1
+        for band in range(BANDS):
+            yield band, fingerprint >> (band * BAND_BITS) & mask
+
+    def is_duplicate(self, post: dict) -> bool:
+        key = str(post.get("url") or post.get("id") or "")
+        if key and key in self.seen_keys:
+            return True
+        features = _features(post_text(post))
+        fingerprint = _simhash(features) if len(features) >= MIN_FEATURES else None
+        if fingerprint is not None:
+            for band in self._bands(fingerprint):
+                for other in self.bands.get(band, ()):
+                    if bin(fingerprint ^ other).count("1") <= MAX_HAMMING_DISTANCE:
+                        return True
+        if key:
+            self.seen_keys.add(key)
+        if fingerprint is not None:
+            for band in self._bands(fingerprint):
+                self.bands.setdefault(band, []).append(fingerprint)
+        return False
+
+
+def _split_posts(payload: Any) -> tuple[list | None, Any]:
+    if isinstance(payload, list):
+        return payload, None
+    if isinstance(payload, dict) and isinstance(payload.get("posts"), list):
+        return payload["posts"], payload
+    return None, None
+
+
+def dedupe_posts(text: str, index: FingerprintIndex) -> str:
+    """
+    Tool-result hook for Reddit post listings: drops posts already seen in this task
+    (exact or near-duplicate) before they reach the model. Other results pass through.
+    """
+    try:
+        payload = json.loads(text)
+    except ValueError:
+        return text
+    posts, envelope = _split_posts(payload)
+    if not posts:
+        return text
+
+    kept = []
+    for post in posts:
+        if isinstance(post, dict) and index.is_duplicate(post):
+            index.dropped += 1
+            index.tokens_saved += estimate_tokens(json.dumps(post, ensure_ascii=False, default=str))
+        else:
+            kept.append(post)
+
+    if len(kept) == len(posts):
+        return text
+    omitted = len(posts) - len(kept)
+    if envelope is None:
+        return json.dumps({"posts": kept, "omitted_already_seen": omitted}, ensure_ascii=False, default=str)
+    return json.dumps({**envelope, "posts": kept, "omitted_already_seen": omitted}, ensure_ascii=False, default=str)
@@ -1,9 +1,20 @@
+import asyncio
 import json
+import os
 import aisuite as ai
 import re
 
+from tracing import span
+
 CLIENT = ai.Client()
 
+# Plans are reused across runs for requests with the same intent template.
+PLAN_CACHE_PATH = os.getenv("PLAN_CACHE_PATH", ".plan_cache.json")
+
+# "Write me a content about <topic>" -> the topic is whatever follows the last of these, so
+# qualifiers ("posts for beginners on <topic>") stay in the template instead of the topic.
+TOPIC_MARKERS = re.compile(r"\b(about|on|regarding|covering|for)\b\s+", re.IGNORECASE)
+
 # ollama:gemma3:latest
 # ollama:qwen3:4b
 # ollama:gpt-oss:20b-cloud
@@ -33,10 +44,10 @@ async def inital_planner_ollama(user_input: str, model: str = "ollama:gemma3:lat
 
                 The end goal is to:
 
-                - Research using redit
-                - draft the doc on Google Docs
-                - Reflect on it and check for alternate on reddit and evaluate the source
-                - final draft on Google Docs
+                - Research using redit (the Google Doc is created at the same time)
+                - Check the research against the request; only if it is off-topic,
+                  research again on reddit for more relevant posts
+                - Write the final draft to the Google Doc once
                 
 
 
@@ -45,13 +56,15 @@ async def inital_planner_ollama(user_input: str, model: str = "ollama:gemma3:lat
 
                     """
 
-        completion = CLIENT.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": "You are planner for a content research assistant."},
-                {"role": "user", "content": prompt},
-            ],
-        )
+        with span("llm planner", "llm", model=model):
+            completion = await asyncio.to_thread(
+                CLIENT.chat.completions.create,
+                model=model,
+                messages=[
+                    {"role": "system", "content": "You are planner for a content research assistant."},
+                    {"role": "user", "content": prompt},
+                ],
+            )
 
         print("Planner ollama has responded...")
 
@@ -61,3 +74,57 @@ async def inital_planner_ollama(user_input: str, model: str = "ollama:gemma3:lat
                 
 
         return content
+
+
+def intent_template(user_input: str) -> tuple[str, str]:
+    """
+    Split a request into its intent template and topic:
+    "Write me a content about Marvel's movies." -> ("write me a content about {topic}", "Marvel's movies")
+    "Posts for beginners on Rust" -> ("posts for beginners on {topic}", "Rust")
+    Requests without a topic marker are their own (normalized) template.
+    """
+    text = " ".join(user_input.split()).rstrip(".!? ")
+    matches = list(TOPIC_MARKERS.finditer(text))
+    match = matches[-1] if matches else None
+    if not match or match.end() >= len(text):
+        return text.lower(), ""
+    return f"{text[:match.end()].lower()}{{topic}}", text[match.end():]
+
+
+def _load_plans() -> dict[str, str]:
+    try:
+        with open(PLAN_CACHE_PATH) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _save_plans(plans: dict[str, str]) -> None:
+    tmp = f"{PLAN_CACHE_PATH}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(plans, f, indent=2)
+    os.replace(tmp, PLAN_CACHE_PATH)
+
+
+async def cached_plan(user_input: str, model: str = "ollama:gemma3:latest") -> str:
+        """
+        The plan for the request's intent template, from the plan cache if an earlier
+        request had the same template (no LLM call), otherwise from the planner LLM.
+        """
+        template, topic = intent_template(user_input)
+        plans = _load_plans()
+
+        if template in plans:
+            print("Plan served from cache.")
+            return plans[template].replace("{topic}", topic)
+
+        plan = await inital_planner_ollama(user_input, model)
+
+        # Store the plan with the topic abstracted out so other topics can reuse it. A plan
+        # that paraphrases the topic can't be abstracted (it would carry this topic into
+        # every later hit), so it isn't cached.
+        if topic and not re.search(re.escape(topic), plan, flags=re.IGNORECASE):
+            return plan
+        plans[template] = re.sub(re.escape(topic), "{topic}", plan, flags=re.IGNORECASE) if topic else plan
+        _save_plans(plans)
+        return plan
@@ -1,25 +1,24 @@
-import json
-import aisuite as ai
-import re
+from functools import partial
 
-CLIENT = ai.Client()
+from agents.comment_tree import CommentBudget, prune_comments
+from agents.tool_loop import run_tool_loop
 
-async def reddit_search_openai(user_input: str,tool_mapping: dict = {}, tool_defs: list = [], model: str = "openai:gpt-4o-mini") -> str: 
+COMMENT_TOOLS = ("get_post_content", "get_post_comments")
 
-    ### START CODE HERE ###
+SYSTEM_PROMPT = "You are an expert research assistant."
 
-    # Define your prompt here. A multi-line f-string is typically used for this.
-    prompt = f"""
+PROMPT_TEMPLATE = """
 
 
                 User query: {user_input}
-                
+
                 You need to help the user with his search on reddit.
                 Use tools if required.
 
                 Make sure it's relevant to the user's query and 
                 you are free to search through any subreddit 
                 but it is your task to decide the subreddits based on the request.
+                To look at several subreddits, call search_subreddits once with all of them.
 
                 Make sure you give only atmost 5 findings.
                 And give your findings in a concise way.
@@ -27,100 +26,25 @@ async def reddit_search_openai(user_input: str,tool_mapping: dict = {}, tool_def
 
                 """
 
-    ### END CODE HERE ###
-
-    max_turns = len(tool_mapping)+1
-
-    messages = [
-
-                {"role": "system", "content": "You are an expert travel assistant."},
-                {"role": "user", "content": prompt}
-                ]
-
-    for i in range(max_turns):
-
-        print(f"\n**********************************************************************************\n")
-
-        print(f"Attempt : {i+1}")
-    
-        # Get a response from the LLM by creating a chat with the client.
-        response = CLIENT.chat.completions.create(
-            model=model,
-            messages=messages,
-            tools = tool_defs,
-            temperature=1.0,
-        )
-
-        msg = response.choices[0].message
-
-        assistant_msg = {
-            "role": msg.role,
-            "content": msg.content or ""
-        }
-
-        # IMPORTANT: keep tool_calls if present
-        if getattr(msg, "tool_calls", None):
-            assistant_msg["tool_calls"] = [
-                {
-                    "id": tc.id,
-                    "type": tc.type,
-                    "function": {
-                        "name": tc.function.name,
-                        "arguments": tc.function.arguments,
-                    },
-                }
-                for tc in msg.tool_calls
-            ]
-
-        messages.append(assistant_msg)
-
-
-
-        if not msg.tool_calls:      
-            final_text = msg.content
-            print("✅ Final answer:")
-            print(final_text)
-            break
-
-        else:
-            print("Tool Calls Detected:")
-            print(msg.tool_calls)
-
-
-        for tool_call in msg.tool_calls:
-
-            tool_id = tool_call.id
-            tool_name = tool_call.function.name
-            tool_args = tool_call.function.arguments
-
-            args = json.loads(tool_args or "{}")  
-
-
-            print(f'Calling tool: {tool_name} with args: {tool_args}')
-
-            # tool_response = tool_mapping[tool_name](**args)
-
-            tool = tool_mapping[tool_name]
-
-            # 🔄 ASYNC EXECUTION
-            # if hasattr(tool, "ainvoke"):
-            #     tool_response = await tool.ainvoke(args)
-            # else:
-            #     tool_response = tool.invoke(args)
-
-            tool_response = await tool.coroutine(**args)
-
-            print(f'Tool response: {tool_response}')
-
-            messages.append(
-                {
-                    "role": "tool",
-                    "tool_call_id": tool_id,
-                    "tool_name": tool_name,         
-                    "content": str(tool_response)    
-                }
-            )
-
-
 
-    return final_text
+async def reddit_search_openai(user_input: str,tool_mapping: dict = {}, tool_defs: list = [], model: str = "openai:gpt-4o-mini", prompt_template: str = PROMPT_TEMPLATE, comment_budget: CommentBudget = CommentBudget(), **loop_options) -> str:
+    """
+    Runs the reddit research tool loop. Extra keyword arguments (max_turns, token_budget,
+    max_tool_result_chars, should_stop, tool_result_hooks, ...) are passed to run_tool_loop.
+
+    Comment trees are walked best-first and pruned to comment_budget before they
+    reach the model.
+    """
+    hooks = {name: partial(prune_comments, budget=comment_budget) for name in COMMENT_TOOLS}
+    hooks.update(loop_options.pop("tool_result_hooks", None) or {})
+    result = await run_tool_loop(
+        prompt_template.format(user_input=user_input),
+        tool_mapping,
+        tool_defs,
+        model=model,
+        system_prompt=SYSTEM_PROMPT,
+        tool_result_hooks=hooks,
+        **loop_options,
+    )
+
+    return result.final_text
@@ -1,39 +1,207 @@
-from agents.googleDocs_llm import googleDocs_openAI
-
-async def workflow(user_input,agent):
-
-    redditResearch = await agent.invoke(user_input, googleDocs_openAI, "reddit")
-
-    googleDocsPrompt = redditResearch + "\nThis is the info based on user research\n"
+import asyncio
+import os
+import re
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
 
-
-    googleDocsResponse = await agent.invoke(googleDocsPrompt, googleDocs_openAI, "googleDocs")
-
-    revisedText = f'''
+from agents.googleDocs_llm import googleDocs_openAI
+from deadline import current, deadline_scope, has_time
+from structured_log import get_logger
+from tracing import span
+
+# Share of the request's keywords the research must mention to skip the revision round.
+RELEVANCE_THRESHOLD = float(os.getenv("WORKFLOW_RELEVANCE_THRESHOLD", "0.5"))
+# Under a request deadline, research rounds must finish this many seconds early so the
+# write stage still has time, and the optional revision round only runs when at least
+# WORKFLOW_REVISE_MIN_TIME seconds are left.
+WRITE_RESERVE = float(os.getenv("WORKFLOW_WRITE_RESERVE", "30"))
+REVISE_MIN_TIME = float(os.getenv("WORKFLOW_REVISE_MIN_TIME", "90"))
+
+log = get_logger("workflow")
+
+STOPWORDS = {
+    "a", "about", "after", "all", "also", "an", "and", "any", "are", "as", "at", "be", "been",
+    "but", "by", "can", "content", "do", "for", "from", "get", "give", "has", "have", "how",
+    "i", "in", "into", "is", "it", "its", "latest", "make", "me", "more", "my", "new", "of",
+    "on", "or", "our", "please", "post", "posts", "reddit", "research", "some", "than", "that",
+    "the", "their", "them", "these", "this", "to", "up", "upcoming", "updates", "us", "was",
+    "we", "what", "when", "which", "who", "why", "will", "with", "write", "you", "your",
+}
+
+
+@dataclass
+class Stage:
+    """
+    One node of the workflow graph. run(state) receives the results of all finished
+    stages by name; when(state), if given, decides after the dependencies finish
+    whether the stage runs at all (a skipped stage's result is None).
+    """
+    name: str
+    run: Callable[[dict], Awaitable[Any]]
+    after: tuple[str, ...] = ()
+    when: Callable[[dict], bool] | None = None
+
+
+async def _run_stage(stage: Stage, state: dict) -> Any:
+    with span(f"stage {stage.name}", "stage", stage=stage.name):
+        return await stage.run(state)
+
+
+async def run_stages(
+    stages: list[Stage],
+    state: dict | None = None,
+    on_stage: Callable[[str, Any, dict], Awaitable[None]] | None = None,
+) -> dict:
+    """
+    Run a stage graph, starting every stage as soon as its dependencies are done,
+    so independent stages run concurrently. Returns the state with every stage's result.
+
+    Stages already present in state (e.g. restored from a checkpoint) are not run again.
+    on_stage(name, result, state) is awaited after each stage finishes or is skipped.
+    """
+    state = dict(state or {})
+    pending = {stage.name: stage for stage in stages if stage.name not in state}
+    running: dict[asyncio.Task, tuple[str, float]] = {}
+
+    try:
+        while pending or running:
+            # A skipped stage can make others ready, so schedule until nothing changes.
+            scheduled = True
+            while scheduled:
+                scheduled = False
+                for name, stage in list(pending.items()):
+                    if not all(dep in state for dep in stage.after):
+                        continue
+                    del pending[name]
+                    scheduled = True
+                    if stage.when is not None and not stage.when(state):
+                        log.info("stage skipped", stage=name)
+                        state[name] = None
+                        if on_stage is not None:
+                            await on_stage(name, None, state)
+                        continue
+                    running[asyncio.create_task(_run_stage(stage, state))] = (name, time.perf_counter())
+
+            if not running:
+                if pending:
+                    raise ValueError(f"Unsatisfiable stage dependencies: {sorted(pending)}")
+                break
+
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                name, started = running.pop(task)
+                state[name] = task.result()
+                log.info("stage done", stage=name, seconds=round(time.perf_counter() - started, 2))
+                if on_stage is not None:
+                    await on_stage(name, state[name], state)
+    finally:
+        for task in running:
+            task.cancel()
+
+    return state
+
+
+def keywords(text: str) -> set[str]:
+    words = (w.removesuffix("'s") for w in re.findall(r"[a-z0-9']+", text.lower()))
+    return {w for w in words if len(w) > 2 and w not in STOPWORDS}
+
+
+def relevance(user_input: str, research: str) -> float:
+    """
+    Cheap lexical relevance: the share of the request's keywords that the research mentions.
+    """
+    wanted = keywords(user_input)
+    if not wanted:
+        return 1.0
+    return len(wanted & keywords(research)) / len(wanted)
+
+
+def doc_title(user_input: str, max_chars: int = 60) -> str:
+    title = " ".join(user_input.split())
+    return title if len(title) <= max_chars else title[: max_chars - 3].rstrip() + "..."
+
+
+# Stage names of build_stages(), in graph order.
+STAGES = ("research", "create_doc", "relevance", "revise", "write")
+
+
+def build_stages(user_input: str, agent, task_id: str | None = None) -> list[Stage]:
+    """
+    research ─┬─ relevance ─ revise (only if research is off-topic) ─┬─ write
+    create_doc ───────────────────────────────────────────────────────┘
+
+    Both research rounds carry task_id, so the Reddit agent drops posts the first
+    round already returned. Under a request deadline they get an earlier deadline
+    (WRITE_RESERVE), and the revision round is skipped when time is short.
+    """
+    reddit_metadata = {"workflow_task_id": task_id} if task_id else None
+
+    async def ask_reddit(prompt: str) -> str:
+        deadline = current()
+        with deadline_scope(None if deadline is None else deadline - WRITE_RESERVE):
+            return await agent.invoke(prompt, googleDocs_openAI, "reddit", metadata=reddit_metadata)
+
+    async def research(state: dict) -> str:
+        return await ask_reddit(user_input)
+
+    async def create_doc(state: dict) -> str | None:
+        # A direct MCP call: creating an empty doc needs no LLM.
+        try:
+            return (await agent.call_tool("create_doc", title=doc_title(user_input))).strip()
+        except Exception as e:
+            log.warning("create_doc failed, the write stage will create the doc", error=str(e))
+            return None
+
+    async def check_relevance(state: dict) -> float:
+        score = relevance(user_input, state["research"])
+        log.info("relevance", score=round(score, 2), threshold=RELEVANCE_THRESHOLD)
+        return score
+
+    async def revise(state: dict) -> str:
+        revisedText = f'''
 
 The user request's strategy: {user_input}
 
-The inital reddit research : {redditResearch}
-
-The content drafted: {googleDocsResponse}
+The inital reddit research : {state["research"]}
 
-Based on this I need to know if the content aligns with the user's request and if not,
-do a revised research and pull reddit posts more relevant to the user's request.
-
-After the research do not forget to send back the google docs's ID along with your response.
-It is important to call another agent to edit the doc.
+This research doesn't cover the user's request well enough.
+Do a revised research and pull reddit posts more relevant to the user's request.
 
 '''
-    
-
-    revisedResearch = await agent.invoke(revisedText, googleDocs_openAI, "reddit")
-
-
-    docsFinalPrompt = revisedResearch + "\nYou have the google docs ID so you are gonna write it to the same doc.\n"
-
-
-    googleDocsFinalResponse = await agent.invoke(docsFinalPrompt, googleDocs_openAI, "googleDocs")
-
-    
-    return googleDocsFinalResponse
-
+        return await ask_reddit(revisedText)
+
+    def needs_revision(state: dict) -> bool:
+        if state["relevance"] >= RELEVANCE_THRESHOLD:
+            return False
+        if not has_time(REVISE_MIN_TIME):
+            log.info("revise skipped: not enough time left before the deadline")
+            return False
+        return True
+
+    async def write(state: dict) -> str:
+        docsPrompt = (state["revise"] or state["research"]) + "\nThis is the info based on user research\n"
+        if state["create_doc"]:
+            docsPrompt += f"\nWrite the content to the existing Google Doc with ID {state['create_doc']}. Do not create a new doc.\n"
+        return await agent.invoke(docsPrompt, googleDocs_openAI, "googleDocs")
+
+    return [
+        Stage("research", research),
+        Stage("create_doc", create_doc),
+        Stage("relevance", check_relevance, after=("research",)),
+        Stage("revise", revise, after=("relevance",), when=needs_revision),
+        Stage("write", write, after=("create_doc", "revise")),
+    ]
+
+
+async def workflow(user_input, agent, state: dict | None = None, on_stage=None, task_id: str | None = None):
+    """
+    Reddit research and doc creation run concurrently; a revision round runs only when
+    the research fails the relevance check; the doc is written once at the end.
+
+    Pass the stage results of an earlier run as state to resume after the last
+    completed stage; on_stage is called as each stage completes (see run_stages).
+    task_id identifies the run to the Reddit agent for cross-round de-duplication.
+    """
+    state = await run_stages(build_stages(user_input, agent, task_id), state, on_stage)
+    return state["write"]
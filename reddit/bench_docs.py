@@ -0,0 +1,71 @@
+import argparse
+import os
+import tempfile
+import time
+from collections import Counter
+
+# Drives the Docs MCP tools in-process against the local backend, so the numbers are
+# deterministic and free of network noise: each backend call costs exactly the
+# injected latency, and everything above that is our own overhead.
+#
+# uv run python bench_docs.py --latency-ms 80 --appends 10 --reads 5
+
+os.environ.setdefault("DOCS_BACKEND", "local")
+os.environ.setdefault("DOCS_LOCAL_DIR", tempfile.mkdtemp(prefix="bench_docs_"))
+
+import googleDocs
+from docs_backends import LocalDocsBackend
+
+
+class CountingBackend:
+    def __init__(self, backend: LocalDocsBackend) -> None:
+        self._backend = backend
+        self.calls: Counter[str] = Counter()
+
+    def __getattr__(self, name: str):
+        method = getattr(self._backend, name)
+
+        def counted(*args, **kwargs):
+            self.calls[name] += 1
+            return method(*args, **kwargs)
+
+        return counted
+
+
+def run(label: str, appends: int, reads: int, window_ms: float, latency_ms: float) -> None:
+    backend = CountingBackend(LocalDocsBackend(os.environ["DOCS_LOCAL_DIR"], latency_ms=latency_ms))
+    googleDocs.backend = backend
+    googleDocs.DOCS_WRITE_WINDOW_MS = window_ms
+    googleDocs._text_cache.clear()
+
+    started = time.perf_counter()
+    doc_id = googleDocs.create_doc(f"bench {label}")
+    for i in range(appends):
+        googleDocs.write_to_doc(f"# Section {i}\n" + "Research notes. " * 50, id=doc_id)
+    for _ in range(reads):
+        googleDocs.read_doc(id=doc_id, limit=2000)
+    googleDocs.read_doc(id=doc_id, section="Section 1")
+    elapsed = (time.perf_counter() - started) * 1000
+
+    total_calls = sum(backend.calls.values())
+    injected = total_calls * latency_ms
+    print(
+        f"{label:<12} total={elapsed:8.1f}ms  backend_calls={total_calls:3d} {dict(backend.calls)}  "
+        f"overhead={elapsed - injected:6.1f}ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the Docs MCP tools on the local backend.")
+    parser.add_argument("--latency-ms", type=float, default=80.0, help="injected latency per backend call")
+    parser.add_argument("--appends", type=int, default=10)
+    parser.add_argument("--reads", type=int, default=5)
+    parser.add_argument("--window-ms", type=float, default=50.0, help="write-coalescing window for the buffered run")
+    args = parser.parse_args()
+
+    run("unbuffered", args.appends, args.reads, 0, args.latency_ms)
+    run("buffered", args.appends, args.reads, args.window_ms, args.latency_ms)
+
+
+if __name__ == "__main__":
+    main()
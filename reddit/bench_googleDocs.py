@@ -0,0 +1,85 @@
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from google.oauth2.credentials import Credentials
+from googleapiclient.discovery import build
+
+import googleDocs
+
+# Per-call client overhead of the Docs MCP tools, before and after caching credentials
+# and service objects. No Google API request is made: discovery documents ship with
+# google-api-python-client, and a throwaway token is used when token.json is missing.
+#
+# uv run python bench_googleDocs.py --calls 50
+
+
+def fake_token() -> dict:
+    return {
+        "token": "bench-token",
+        "refresh_token": "bench-refresh",
+        "client_id": "bench",
+        "client_secret": "bench",
+        "scopes": googleDocs.SCOPES,
+        "expiry": (datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(hours=1)).isoformat() + "Z",
+    }
+
+
+def per_call_uncached(token_path: str) -> None:
+    # What every tool call used to do (create_doc did it for Docs and Drive).
+    with open(token_path) as f:
+        creds = Credentials.from_authorized_user_info(json.load(f), googleDocs.SCOPES)
+    build("docs", "v1", credentials=creds)
+    build("drive", "v3", credentials=creds)
+
+
+def per_call_cached() -> None:
+    googleDocs.get_docs_service()
+    googleDocs.get_drive_service()
+
+
+def measure(fn, calls: int) -> list[float]:
+    timings = []
+    for _ in range(calls):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def report(label: str, timings: list[float]) -> None:
+    print(
+        f"{label:<10} first={timings[0]:8.2f}ms  median={statistics.median(timings):8.3f}ms  "
+        f"mean={statistics.mean(timings):8.3f}ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure per-call Google API client overhead.")
+    parser.add_argument("--calls", type=int, default=50)
+    parser.add_argument("--token", default="token.json", help="token file (a fake one is used if missing)")
+    args = parser.parse_args()
+
+    token_path = args.token
+    if not os.path.exists(token_path):
+        fd, token_path = tempfile.mkstemp(suffix=".json")
+        with os.fdopen(fd, "w") as f:
+            json.dump(fake_token(), f)
+
+    with open(token_path) as f:
+        googleDocs._creds = Credentials.from_authorized_user_info(json.load(f), googleDocs.SCOPES)
+
+    before = measure(lambda: per_call_uncached(token_path), args.calls)
+    after = measure(per_call_cached, args.calls)
+
+    report("uncached", before)
+    report("cached", after)
+    print(f"saved per call: {statistics.median(before) - statistics.median(after):.2f}ms (median)")
+
+
+if __name__ == "__main__":
+    main()
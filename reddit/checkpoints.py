@@ -0,0 +1,49 @@
+import json
+import os
+import re
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+CHECKPOINT_DIR = os.getenv("WORKFLOW_CHECKPOINT_DIR", ".checkpoints")
+
+
+class CheckpointStore:
+    """
+    One JSON file per workflow run, keyed by the A2A task ID:
+
+        {"task_id", "user_input", "status", "stages": {stage: result}, "updated_at"}
+
+    Files are replaced atomically (write to a temp file, then os.replace), so a crash
+    mid-write never leaves a truncated checkpoint behind.
+    """
+
+    def __init__(self, directory: str = CHECKPOINT_DIR) -> None:
+        self.directory = Path(directory)
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{re.sub(r'[^A-Za-z0-9_.-]', '_', key)}.json"
+
+    def load(self, key: str) -> dict[str, Any] | None:
+        try:
+            return json.loads(self._path(key).read_text())
+        except FileNotFoundError:
+            return None
+
+    def save(self, key: str, checkpoint: dict[str, Any]) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        checkpoint = {**checkpoint, "updated_at": time.time()}
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".tmp-", suffix=".json")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(checkpoint, f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self._path(key))
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+
+    def delete(self, key: str) -> None:
+        self._path(key).unlink(missing_ok=True)
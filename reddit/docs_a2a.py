@@ -4,27 +4,38 @@ from typing import Any
 
 import asyncio
 from uuid import uuid4
-import httpx
 
-from langchain_mcp_adapters.client import MultiServerMCPClient
 
 from a2a.server.agent_execution import AgentExecutor, RequestContext
 from a2a.server.events import EventQueue
 from a2a.server.request_handlers import DefaultRequestHandler
-from a2a.server.tasks import InMemoryTaskStore
+from a2a.server.tasks import TaskUpdater
 from a2a.server.apps import A2AStarletteApplication
-from a2a.types import AgentCapabilities, AgentCard, AgentSkill
-from a2a.utils import new_agent_text_message
+from a2a.types import AgentCapabilities, AgentCard, AgentSkill, Part, TaskState, TextPart
+from a2a.utils import new_task
 
 from dotenv import load_dotenv
 import aisuite as ai
 
 load_dotenv()
 
-import agents.workflow, agents.clientResponse
+import agents.workflow
+from agents.a2a_response import A2AContent, decode_response
+from agents.tool_loop import call_tool, tool_output_text
+from cancellation import RunningTasks, cancel_downstream
+from deadline import deadline_scope, downstream_metadata, from_metadata, time_limit
+from checkpoints import CheckpointStore
+from mcp_pool import McpServerPool
+from metrics import instrument
+from sqlite_task_store import make_task_store
+from structured_log import get_logger
+from tracing import inject, server_span, set_service, span, traced_client
 
 from a2a.client import A2ACardResolver, A2AClient
-from a2a.types import MessageSendParams, SendMessageRequest
+from a2a.types import MessageSendParams, SendStreamingMessageRequest
+
+set_service("docs")
+log = get_logger("docs")
 
 
 
@@ -39,17 +50,29 @@ def load_mcp_config(config_path: str = "config.json"):
 
 class GoogleDocsAgent:
     def __init__(self) -> None:
-        self._mcp_client = MultiServerMCPClient(load_mcp_config("google_docs_config.json"))
+        self.mcp_pool = McpServerPool(load_mcp_config("google_docs_config.json"))
         self._llm_client = ai.Client()
         self._model = "ollama:gemma3:latest"
-        self._tools = None
 
     async def _ensure_tools(self):
-        if self._tools is None:
-            self._tools = await self._mcp_client.get_tools()
-        return self._tools
-
-    async def invoke(self, user_input: str, function, agent: str) -> str:
+        return await self.mcp_pool.get_tools()
+
+    async def call_tool(self, name: str, **args: Any) -> str:
+        """
+        Call one Google Docs MCP tool directly, without an LLM in the loop.
+        """
+        tools = {t.name: t for t in await self._ensure_tools()}
+        if name not in tools:
+            raise ValueError(f"Unknown tool: {name}")
+        return tool_output_text(await asyncio.wait_for(call_tool(tools[name], args), time_limit()))
+
+    async def invoke(self, user_input: str, function, agent: str, metadata: dict | None = None) -> str:
+        """
+        metadata is attached to the message sent to the Reddit agent
+        (e.g. workflow_task_id, so it can skip posts seen in earlier rounds).
+        The Reddit call is streamed so its task ID is known right away: cancelling
+        the workflow task cancels the Reddit task too. The request deadline is passed on.
+        """
         tools = await self._ensure_tools()
 
         if tools:
@@ -64,51 +87,58 @@ class GoogleDocsAgent:
             response = await function(user_input,tool_mapping,tool_def)
 
         else:
-            async with httpx.AsyncClient(timeout=120.0) as httpx_client:
-                # 1) Discover agent card from /.well-known/agent-card.json
-                resolver = A2ACardResolver(
-                    httpx_client=httpx_client,
-                    base_url="http://localhost:8130/",
-                )
-                agent_card = await resolver.get_agent_card()
-
-                if agent_card:
-                    print("\n******************")
-
-                    print("Orchestrator: Hey I know a friend who can help you with this:")
-
-                    print(agent_card.name)
-
-                    print("******************\n")
+            with span("a2a reddit", "a2a", agent="reddit"):
+                metadata = inject(downstream_metadata(metadata))
+                async with traced_client(timeout=time_limit(120.0)) as httpx_client:
+                    # 1) Discover agent card from /.well-known/agent-card.json
+                    resolver = A2ACardResolver(
+                        httpx_client=httpx_client,
+                        base_url="http://localhost:8130/",
+                    )
+                    agent_card = await resolver.get_agent_card()
+
+                    if agent_card:
+                        log.info("delegating", agent=agent_card.name)
 
                 
 
 
-                # 2) Create an A2A client for that agent
-                client = A2AClient(httpx_client=httpx_client, agent_card=agent_card)
+                    # 2) Create an A2A client for that agent
+                    client = A2AClient(httpx_client=httpx_client, agent_card=agent_card)
 
-                # 3) Build the user message (A2A message structure)
-                full_message = f"{user_input}"
+                    # 3) Build the user message (A2A message structure)
+                    full_message = f"{user_input}"
 
-                send_message_payload: dict[str, Any] = {
-                    "message": {
-                        "role": "user",
-                        "parts": [
-                            {"kind": "text", "text": full_message},
-                        ],
-                        "messageId": uuid4().hex,
+                    send_message_payload: dict[str, Any] = {
+                        "message": {
+                            "role": "user",
+                            "parts": [
+                                {"kind": "text", "text": full_message},
+                            ],
+                            "messageId": uuid4().hex,
+                            **({"metadata": metadata} if metadata else {}),
+                        }
                     }
-                }
 
-                request = SendMessageRequest(
-                    id=str(uuid4()),
-                    params=MessageSendParams(**send_message_payload),
-                )
+                    request = SendStreamingMessageRequest(
+                        id=str(uuid4()),
+                        params=MessageSendParams(**send_message_payload),
+                    )
 
-                # 4) Call the agent via A2A
-                result = await client.send_message(request)
+                    # 4) Call the agent via A2A
+                    content = A2AContent()
+                    forget = None
+                    try:
+                        async for event in client.send_message_streaming(request):
+                            decoded = decode_response(event)
+                            if forget is None and decoded.task_id:
+                                forget = cancel_downstream(client, decoded.task_id)
+                            content.merge(decoded)
+                    finally:
+                        if forget is not None:
+                            forget()
 
-                response = await agents.clientResponse.client_response_ollama(str(result.model_dump(mode="json", exclude_none=True)))
+                    response = content.render()
 
 
         
@@ -116,8 +146,18 @@ class GoogleDocsAgent:
 
 
 class GoogleDocsAgentExecutor(AgentExecutor):
+    """
+    Runs the Reddit -> Docs workflow as a long-running A2A task.
+
+    Every finished stage is checkpointed under the task ID and reported as a working
+    status update. Send a new message with metadata {"resume_task_id": <task id>} to
+    continue a failed or interrupted run from its last completed stage.
+    """
+
     def __init__(self) -> None:
         self.agent = GoogleDocsAgent()
+        self.checkpoints = CheckpointStore()
+        self.running = RunningTasks()
 
     async def execute(
         self,
@@ -125,12 +165,69 @@ class GoogleDocsAgentExecutor(AgentExecutor):
         event_queue: EventQueue,
     ) -> None:
         user_input: str = context.get_user_input()  # type: ignore[assignment]
-        # result = await self.agent.invoke(user_input)
-        result = await agents.workflow.workflow(user_input, self.agent)
-        await event_queue.enqueue_event(new_agent_text_message(result))
+
+        task = context.current_task
+        if task is None:
+            task = new_task(context.message)
+            await event_queue.enqueue_event(task)
+        updater = TaskUpdater(event_queue, task.id, task.context_id)
+
+        def status(text: str, **metadata: Any):
+            return updater.new_agent_message([Part(root=TextPart(text=text))], metadata=metadata or None)
+
+        metadata = (context.message.metadata if context.message else None) or {}
+        key = metadata.get("resume_task_id") or task.id
+        checkpoint = self.checkpoints.load(key) or {"task_id": key, "user_input": user_input, "stages": {}}
+        user_input = checkpoint["user_input"]
+        stages = checkpoint["stages"]
+
+        if checkpoint.get("status") == "completed":
+            await updater.add_artifact([Part(root=TextPart(text=stages["write"]))], name="answer")
+            await updater.complete()
+            return
+
+        done = [name for name in agents.workflow.STAGES if name in stages]
+        await updater.start_work(
+            status(f"Resuming after {', '.join(done)}" if done else "Workflow started", checkpoint=key, completed=done)
+        )
+
+        async def on_stage(name: str, result: Any, state: dict) -> None:
+            stages[name] = result
+            self.checkpoints.save(key, {**checkpoint, "status": "working", "stages": stages})
+            finished = sum(1 for n in agents.workflow.STAGES if n in stages)
+            await updater.update_status(
+                TaskState.working,
+                status(
+                    f"{name} {'skipped' if result is None else 'done'} ({finished}/{len(agents.workflow.STAGES)})",
+                    checkpoint=key,
+                    stage=name,
+                ),
+            )
+
+        try:
+            with deadline_scope(from_metadata(metadata)), server_span("docs.execute", metadata, task_id=key):
+                async with self.running.track(task.id):
+                    result = await agents.workflow.workflow(
+                        user_input, self.agent, state=dict(stages), on_stage=on_stage, task_id=key
+                    )
+        except asyncio.CancelledError:
+            # Finished stages stay checkpointed, so a cancelled run can still be resumed.
+            self.checkpoints.save(key, {**checkpoint, "status": "canceled", "stages": stages})
+            raise
+        except Exception as e:
+            self.checkpoints.save(key, {**checkpoint, "status": "failed", "stages": stages, "error": str(e)})
+            await updater.failed(
+                status(f"Workflow failed: {e}. Resume with metadata resume_task_id={key}.", checkpoint=key)
+            )
+            return
+
+        self.checkpoints.save(key, {**checkpoint, "status": "completed", "stages": stages})
+        await updater.add_artifact([Part(root=TextPart(text=result))], name="answer")
+        await updater.complete()
 
     async def cancel(self, context: RequestContext, event_queue: EventQueue) -> None:
-        raise Exception("Cancellation not supported")    
+        # Stops the workflow and cancels the Reddit task of the stage in flight.
+        await self.running.cancel(context, event_queue)
 
 external_skill = AgentSkill(
     id="google_docs_agent",
@@ -151,9 +248,11 @@ external_card = AgentCard(
     supportsAuthenticatedExtendedCard=False,
 )
 
+agent_executor = GoogleDocsAgentExecutor()
+
 request_handler = DefaultRequestHandler(
-    agent_executor=GoogleDocsAgentExecutor(),
-    task_store=InMemoryTaskStore(),
+    agent_executor=agent_executor,
+    task_store=make_task_store("docs"),
 )
 
 app_builder = A2AStarletteApplication(
@@ -162,4 +261,9 @@ app_builder = A2AStarletteApplication(
 )
 
 # uv run uvicorn docs_a2a:app --port 8131
-app = app_builder.build()
+# The lifespan launches the Google Docs MCP server once at startup and keeps it resident.
+app = app_builder.build(
+    lifespan=agent_executor.agent.mcp_pool.lifespan,
+    routes=[agent_executor.agent.mcp_pool.route()],
+)
+instrument(app, "docs")
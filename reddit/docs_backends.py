@@ -0,0 +1,159 @@
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Protocol
+
+# Storage behind the Google Docs MCP tools, selected with DOCS_BACKEND:
+#   google (default)  the live Docs / Drive APIs
+#   local             append-only files under DOCS_LOCAL_DIR, for offline runs and benchmarks
+DOCS_BACKEND = os.getenv("DOCS_BACKEND", "google")
+DOCS_LOCAL_DIR = os.getenv("DOCS_LOCAL_DIR", ".local_docs")
+# Injected per-call latency of the local backend, to model the remote API.
+DOCS_LOCAL_LATENCY_MS = float(os.getenv("DOCS_LOCAL_LATENCY_MS", "0"))
+DOCS_LOCAL_JITTER_MS = float(os.getenv("DOCS_LOCAL_JITTER_MS", "0"))
+
+
+class DocsBackend(Protocol):
+    def create(self, title: str) -> str:
+        """Create an empty doc and return its ID."""
+
+    def append(self, id: str, text: str) -> None:
+        """Append text to the end of the doc body."""
+
+    def revision_id(self, id: str) -> str | None:
+        """Current revision of the doc; changes on every write."""
+
+    def document(self, id: str) -> dict[str, Any]:
+        """The doc in Docs API shape: {"revisionId", "body": {"content": [...]}}."""
+
+
+class GoogleDocsBackend:
+    """
+    The live Google Docs API. Takes the (cached) service factories of googleDocs.py.
+    """
+
+    def __init__(self, docs_service: Callable[[], Any], drive_service: Callable[[], Any]) -> None:
+        self._docs = docs_service
+        self._drive = drive_service
+
+    def create(self, title: str) -> str:
+        doc = self._docs().documents().create(body={"title": title}).execute()
+        doc_id = doc.get("documentId")
+
+        # Make it public (anyone with the link can VIEW)
+        self._drive().permissions().create(
+            fileId=doc_id,
+            body={"type": "anyone", "role": "reader"},
+        ).execute()
+        return doc_id
+
+    def append(self, id: str, text: str) -> None:
+        # endOfSegmentLocation appends without first reading the doc to find its end index.
+        self._docs().documents().batchUpdate(
+            documentId=id,
+            body={"requests": [{"insertText": {"endOfSegmentLocation": {}, "text": text}}]},
+        ).execute()
+
+    def revision_id(self, id: str) -> str | None:
+        return self._docs().documents().get(documentId=id, fields="revisionId").execute().get("revisionId")
+
+    def document(self, id: str) -> dict[str, Any]:
+        return self._docs().documents().get(documentId=id).execute()
+
+
+class LocalDocsBackend:
+    """
+    Docs as append-only text files plus an index.json of {id: {title, revision, length}}.
+
+    Every call sleeps latency_ms (+ up to jitter_ms, from a seeded RNG so runs are
+    repeatable) to stand in for the network. Lines starting with "#" are headings.
+    """
+
+    def __init__(
+        self,
+        root: str = DOCS_LOCAL_DIR,
+        latency_ms: float = DOCS_LOCAL_LATENCY_MS,
+        jitter_ms: float = DOCS_LOCAL_JITTER_MS,
+        seed: int = 0,
+    ) -> None:
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._index_path = self.root / "index.json"
+        self._index: dict[str, dict] = json.loads(self._index_path.read_text()) if self._index_path.exists() else {}
+
+    def _delay(self) -> None:
+        delay = self.latency_ms + (self._random.uniform(0, self.jitter_ms) if self.jitter_ms else 0)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+    def _entry(self, id: str) -> dict:
+        entry = self._index.get(id)
+        if entry is None:
+            raise KeyError(f"Document {id} not found")
+        return entry
+
+    def _save_index(self) -> None:
+        tmp = self._index_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self._index))
+        os.replace(tmp, self._index_path)
+
+    def create(self, title: str) -> str:
+        self._delay()
+        doc_id = uuid.uuid4().hex
+        with self._lock:
+            (self.root / f"{doc_id}.txt").touch()
+            self._index[doc_id] = {"title": title, "revision": 0, "length": 0, "created_at": time.time()}
+            self._save_index()
+        return doc_id
+
+    def append(self, id: str, text: str) -> None:
+        self._delay()
+        with self._lock:
+            entry = self._entry(id)
+            with open(self.root / f"{id}.txt", "a", encoding="utf-8") as f:
+                f.write(text)
+            entry["revision"] += 1
+            entry["length"] += len(text)
+            self._save_index()
+
+    def revision_id(self, id: str) -> str | None:
+        self._delay()
+        with self._lock:
+            return str(self._entry(id)["revision"])
+
+    def document(self, id: str) -> dict[str, Any]:
+        self._delay()
+        with self._lock:
+            revision = str(self._entry(id)["revision"])
+            text = (self.root / f"{id}.txt").read_text(encoding="utf-8")
+
+        content = []
+        for line in text.splitlines(keepends=True):
+            style = "HEADING_1" if line.startswith("#") else "NORMAL_TEXT"
+            if style == "HEADING_1":
+                line = line.lstrip("#").lstrip()
+            content.append(
+                {
+                    "paragraph": {
+                        "elements": [{"textRun": {"content": line}}],
+                        "paragraphStyle": {"namedStyleType": style},
+                    }
+                }
+            )
+        return {"documentId": id, "title": self._index[id]["title"], "revisionId": revision, "body": {"content": content}}
+
+
+def make_backend(name: str = DOCS_BACKEND, **google_services: Callable[[], Any]) -> DocsBackend:
+    if name == "local":
+        return LocalDocsBackend()
+    if name == "google":
+        return GoogleDocsBackend(google_services["docs_service"], google_services["drive_service"])
+    raise ValueError(f"Unknown DOCS_BACKEND: {name!r} (expected 'google' or 'local')")
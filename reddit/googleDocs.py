@@ -1,18 +1,36 @@
 from __future__ import print_function
+import atexit
 import os.path
-from datetime import datetime
-
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any
+from urllib.parse import urlsplit
+
+import httplib2
 from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 from googleapiclient.discovery import build
+from googleapiclient.http import HttpRequest
 
+from dotenv import load_dotenv
 from mcp.server.fastmcp import FastMCP
 
+load_dotenv()
+
+from docs_backends import make_backend
+from structured_log import get_logger
+from tracing import set_service, span, traced
+
 # ---------------------------------------------------------------------
 # MCP SERVER SETUP
 # ---------------------------------------------------------------------
 mcp = FastMCP("Google Docs Server")
+set_service("google_docs_mcp")
+log = get_logger("google_docs_mcp")
 
 # ---------------------------------------------------------------------
 # GOOGLE API CONFIG
@@ -38,9 +56,22 @@ def get_current_date() -> str:
     return datetime.now().strftime("%d %B %Y, %H:%M")
 
 
-def get_credentials() -> Credentials:
+# Credentials and API clients live for the whole server process. The token is
+# refreshed in memory (and written back to token.json) shortly before it expires,
+# by a background thread, so tool calls never wait on a refresh.
+TOKEN_REFRESH_MARGIN = int(os.getenv("GOOGLE_TOKEN_REFRESH_MARGIN", "300"))
+
+_creds: Credentials | None = None
+_creds_lock = threading.Lock()
+_refresher: threading.Thread | None = None
+_services: dict[tuple[str, str], Any] = {}
+_services_lock = threading.Lock()
+_local = threading.local()
+
+
+def _load_credentials() -> Credentials:
     """
-    Loads or creates OAuth credentials and returns a Credentials object.
+    Loads token.json, or runs the OAuth flow, and returns valid credentials.
     """
     creds = None
     if os.path.exists("token.json"):
@@ -52,131 +83,300 @@ def get_credentials() -> Credentials:
         else:
             flow = InstalledAppFlow.from_client_secrets_file("credentials.json", SCOPES)
             creds = flow.run_local_server(port=0)
-        with open("token.json", "w") as token:
-            token.write(creds.to_json())
+        _save_credentials(creds)
 
     return creds
 
 
+def _save_credentials(creds: Credentials) -> None:
+    with open("token.json", "w") as token:
+        token.write(creds.to_json())
+
+
+def _utcnow() -> datetime:
+    # google-auth keeps creds.expiry as naive UTC.
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _needs_refresh(creds: Credentials) -> bool:
+    if not creds.expiry:
+        return not creds.valid
+    return creds.expiry - timedelta(seconds=TOKEN_REFRESH_MARGIN) <= _utcnow()
+
+
+def _refresh(creds: Credentials) -> None:
+    with _creds_lock:
+        if _needs_refresh(creds) and creds.refresh_token:
+            creds.refresh(Request())
+            _save_credentials(creds)
+
+
+def _refresh_loop() -> None:
+    while True:
+        creds = _creds
+        if creds is None or creds.expiry is None:
+            time.sleep(60)
+            continue
+        wait = (creds.expiry - timedelta(seconds=TOKEN_REFRESH_MARGIN) - _utcnow()).total_seconds()
+        time.sleep(max(wait, 5))
+        try:
+            _refresh(creds)
+        except Exception as e:
+            log.error("background token refresh failed", error=str(e))
+
+
+def get_credentials() -> Credentials:
+    """
+    Returns the process-wide OAuth credentials, loading them once.
+    """
+    global _creds, _refresher
+    creds = _creds
+    if creds is not None and not _needs_refresh(creds):
+        return creds
+
+    if creds is None:
+        with _creds_lock:
+            if _creds is None:
+                _creds = _load_credentials()
+            creds = _creds
+        if _refresher is None:
+            _refresher = threading.Thread(target=_refresh_loop, name="google-token-refresh", daemon=True)
+            _refresher.start()
+
+    # Only reached when the background refresh hasn't caught up (e.g. after a suspend).
+    _refresh(creds)
+    return creds
+
+
+class _TracedRequest(HttpRequest):
+    """
+    Records an "http" span per Google API call.
+    """
+
+    def execute(self, *args, **kwargs):
+        url = urlsplit(self.uri)
+        with span(f"{self.method} {url.netloc}{url.path}", "http", url=f"{url.netloc}{url.path}"):
+            return super().execute(*args, **kwargs)
+
+
+def _build_request(http, *args, **kwargs) -> HttpRequest:
+    """
+    httplib2 isn't thread-safe: every thread gets its own authorized connection
+    (reused across calls), shared by all services.
+    """
+    authed = getattr(_local, "http", None)
+    if authed is None:
+        authed = _local.http = AuthorizedHttp(get_credentials(), http=httplib2.Http(timeout=60))
+    return _TracedRequest(authed, *args, **kwargs)
+
+
+def _get_service(name: str, version: str):
+    service = _services.get((name, version))
+    if service is None:
+        with _services_lock:
+            service = _services.get((name, version))
+            if service is None:
+                service = build(
+                    name,
+                    version,
+                    credentials=get_credentials(),
+                    requestBuilder=_build_request,
+                    cache_discovery=False,
+                )
+                _services[(name, version)] = service
+    return service
+
+
 def get_docs_service():
     """
-    Returns an authenticated Google Docs service.
+    Returns the cached, authenticated Google Docs service.
     """
-    creds = get_credentials()
-    return build("docs", "v1", credentials=creds)
+    return _get_service("docs", "v1")
 
 
 def get_drive_service():
     """
-    Returns an authenticated Google Drive service.
+    Returns the cached, authenticated Google Drive service.
     """
-    creds = get_credentials()
-    return build("drive", "v3", credentials=creds)
+    return _get_service("drive", "v3")
+
+
+# Live Google APIs by default; DOCS_BACKEND=local for offline runs (see docs_backends.py).
+backend = make_backend(docs_service=get_docs_service, drive_service=get_drive_service)
 
 
 # ---------------------------------------------------------------------
 # TOOLS
 # ---------------------------------------------------------------------
 @mcp.tool()
+@traced(mcp)
 def create_doc(title: str = "New Python Document") -> str:
     """
     Creates a new Google Doc, makes it publicly viewable (anyone with link),
     and returns the document ID as a string.
     """
-    docs_service = get_docs_service()
+    doc_id = backend.create(title)
 
-    # Create the doc
-    doc = docs_service.documents().create(body={"title": title}).execute()
-    doc_id = doc.get("documentId")
+    # Never print here: stdout is the MCP stdio channel.
+    log.info("document created", title=title, doc_id=doc_id, url=f"https://docs.google.com/document/d/{doc_id}/edit")
 
-    print(f"✅ Created new document: {title}")
-    print(f"📄 Document ID: {doc_id}")
+    # For MCP use, returning just the ID is fine; client can form URL if needed
+    return doc_id
 
-    # Make it public (anyone with the link can VIEW)
-    drive_service = get_drive_service()
-    permission = {
-        "type": "anyone",
-        "role": "reader",  # change to 'writer' if you ever want public edit (dangerous!)
-    }
 
-    drive_service.permissions().create(
-        fileId=doc_id,
-        body=permission
-    ).execute()
+def _append(id: str, texts: list[str]) -> None:
+    """
+    Appends texts to the end of the doc in a single backend call.
+    """
+    backend.append(id, "".join(texts))
 
-    print("🌍 Document is now publicly viewable.")
-    print(f"🔗 Public link: https://docs.google.com/document/d/{doc_id}/edit")
 
-    # For MCP use, returning just the ID is fine; client can form URL if needed
-    return doc_id
+# Write buffering: with DOCS_WRITE_WINDOW_MS > 0, appends to the same doc within the
+# window are coalesced into one batchUpdate. The buffer is flushed before every read
+# of that doc and at exit.
+DOCS_WRITE_WINDOW_MS = float(os.getenv("DOCS_WRITE_WINDOW_MS", "0"))
+
+_pending: dict[str, list[str]] = {}
+_flush_timers: dict[str, threading.Timer] = {}
+_flush_errors: dict[str, str] = {}
+_pending_lock = threading.Lock()
+_flush_lock = threading.Lock()
+
+
+def flush_writes(id: str) -> None:
+    # Serialized, so a read that flushes first also waits for a flush already in flight.
+    with _flush_lock:
+        with _pending_lock:
+            texts = _pending.pop(id, None)
+            timer = _flush_timers.pop(id, None)
+        if timer is not None:
+            timer.cancel()
+        if not texts:
+            return
+        try:
+            _append(id, texts)
+        except Exception as e:
+            _flush_errors[id] = str(e)
+            log.error("buffered write failed", doc_id=id, error=str(e))
+
+
+def flush_all_writes() -> None:
+    for id in list(_pending):
+        flush_writes(id)
+
+
+atexit.register(flush_all_writes)
 
 
 @mcp.tool()
+@traced(mcp)
 def write_to_doc(text: str, id: str = DOCUMENT_ID) -> str:
     """
     Appends text to the end of the given Google Doc, prefixed with a timestamp.
     Returns the "message_added" and the "id" of this document.
     """
-    service = get_docs_service()
+    message = f"\n\n{get_current_date()}\n{text}"
 
-    # Fetch document to find the end index
-    doc = service.documents().get(documentId=id).execute()
-    content = doc.get("body", {}).get("content", [])
-    if not content:
-        # Empty doc: index 1 is right after the implicit start
-        end_index = 1
-    else:
-        end_index = content[-1].get("endIndex", 1) - 1
+    if DOCS_WRITE_WINDOW_MS <= 0:
+        _append(id, [message])
+        return str({"id": id, "message_added": message})
 
-    requests = [
-        {
-            "insertText": {
-                "location": {"index": end_index},
-                "text": f"\n\n{get_current_date()}\n{text}",
-            }
-        }
-    ]
+    # A failed earlier flush is reported on the next write to the same doc.
+    error = _flush_errors.pop(id, None)
+    if error:
+        raise RuntimeError(f"An earlier buffered write to {id} failed: {error}")
 
-    service.documents().batchUpdate(
-        documentId=id,
-        body={"requests": requests}
-    ).execute()
+    with _pending_lock:
+        _pending.setdefault(id, []).append(message)
+        if id not in _flush_timers:
+            timer = threading.Timer(DOCS_WRITE_WINDOW_MS / 1000, flush_writes, args=(id,))
+            timer.daemon = True
+            _flush_timers[id] = timer
+            timer.start()
 
+    return str({"id": id, "message_added": message, "status": "queued"})
 
-    # msg = f"✅ Text appended to document ({id})"
-    # print(msg)
 
-    result = {
-        "id" : id,
-        "message_added": f"\n\n{get_current_date()}\n{text}"
-    }
-    return str(result)
+# Characters returned by one read_doc call unless a limit is given.
+READ_DOC_LIMIT = int(os.getenv("READ_DOC_LIMIT", "20000"))
 
+# Extracted text per doc, reused while the doc's revisionId is unchanged.
+_text_cache: "OrderedDict[str, dict]" = OrderedDict()
+_TEXT_CACHE_SIZE = 32
 
-@mcp.tool()
-def read_doc(id: str = DOCUMENT_ID) -> str:
+
+def extract_text(doc: dict) -> dict:
     """
-    Reads the full plain-text content of the given Google Doc.
-    Returns the "id" of the doc and the plain text "content".
+    Plain text of the doc body (built in linear time) and the character offset of each
+    heading, as {"revision_id", "text", "sections": [(heading, offset)]}.
     """
-    service = get_docs_service()
-    doc = service.documents().get(documentId=id).execute()
-    content = doc.get("body", {}).get("content", [])
+    parts: list[str] = []
+    sections: list[tuple[str, int]] = []
+    length = 0
+    for element in doc.get("body", {}).get("content", []):
+        paragraph = element.get("paragraph")
+        if not paragraph:
+            continue
+        runs = [elem["textRun"]["content"] for elem in paragraph.get("elements", []) if "textRun" in elem]
+        style = paragraph.get("paragraphStyle", {}).get("namedStyleType", "")
+        if style.startswith("HEADING") or style in ("TITLE", "SUBTITLE"):
+            heading = "".join(runs).strip()
+            if heading:
+                sections.append((heading, length))
+        parts.extend(runs)
+        length += sum(len(run) for run in runs)
+    return {"revision_id": doc.get("revisionId"), "text": "".join(parts), "sections": sections}
+
+
+def _doc_text(id: str) -> dict:
+    # A metadata-only request tells us whether the cached text is still current.
+    revision_id = backend.revision_id(id)
+    cached = _text_cache.get(id)
+    if cached is not None and revision_id is not None and cached["revision_id"] == revision_id:
+        _text_cache.move_to_end(id)
+        return cached
+
+    extracted = extract_text(backend.document(id))
+    _text_cache[id] = extracted
+    _text_cache.move_to_end(id)
+    while len(_text_cache) > _TEXT_CACHE_SIZE:
+        _text_cache.popitem(last=False)
+    return extracted
 
-    text = ""
-    for element in content:
-        if "paragraph" in element:
-            for elem in element["paragraph"]["elements"]:
-                if "textRun" in elem:
-                    text += elem["textRun"]["content"]
 
-    print("\n📖 Document content:\n")
-    print(text)
+@mcp.tool()
+@traced(mcp)
+def read_doc(id: str = DOCUMENT_ID, offset: int = 0, limit: int = READ_DOC_LIMIT, section: str = "") -> str:
+    """
+    Reads the plain-text content of the given Google Doc, one page at a time.
+    offset/limit select a character range; section (a heading's text) restricts
+    the read to that section. Returns the "id" of the doc, the "content", its
+    "length", the doc's "sections" and, if there is more, the "next_offset" to read from.
+    """
+    flush_writes(id)
+    extracted = _doc_text(id)
+    text, sections = extracted["text"], extracted["sections"]
+
+    start, end = 0, len(text)
+    if section:
+        matches = [i for i, (heading, _) in enumerate(sections) if section.lower() in heading.lower()]
+        if not matches:
+            return str({"id": id, "error": f"No section matching {section!r}", "sections": [h for h, _ in sections]})
+        index = matches[0]
+        start = sections[index][1]
+        end = sections[index + 1][1] if index + 1 < len(sections) else len(text)
+
+    page_start = min(start + max(offset, 0), end)
+    page_end = min(page_start + limit, end) if limit and limit > 0 else end
 
     result = {
         "id" : id,
-        "content": text
+        "content": text[page_start:page_end],
+        "length": end - start,
+        "sections": [heading for heading, _ in sections],
     }
+    if page_end < end:
+        result["next_offset"] = page_end - start
 
     return str(result)
 
@@ -0,0 +1,185 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any
+
+from langchain_core.tools import BaseTool, ToolException
+from langchain_mcp_adapters.client import MultiServerMCPClient
+from langchain_mcp_adapters.tools import load_mcp_tools
+from mcp import ClientSession
+from mcp.types import TextContent
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from metrics import mcp_call
+from structured_log import get_logger
+from tracing import inject
+
+log = get_logger("mcp_pool")
+
+
+@dataclass
+class ServerStartup:
+    """
+    Startup timings of one MCP server.
+
+    cold_start_s: spawn + initialize + first list_tools (package resolution for npx/uvx included).
+    warm_list_s:  list_tools round trip on the resident session, i.e. what a request pays now.
+    """
+    name: str
+    cold_start_s: float = 0.0
+    warm_list_s: float = 0.0
+    tools: list[str] = field(default_factory=list)
+    error: str | None = None
+
+
+def _propagate_trace(session: ClientSession, tool: BaseTool) -> BaseTool:
+    """
+    Send the tool's calls with the caller's trace context in the request _meta, so the
+    resident server's spans join the trace of the request that made the call.
+    """
+    async def call(**arguments: Any) -> tuple[str | list[str], None]:
+        with mcp_call(tool.name):
+            result = await session.call_tool(tool.name, arguments, meta=inject() or None)
+            texts = [c.text for c in result.content if isinstance(c, TextContent)]
+            content = texts[0] if len(texts) == 1 else texts or ""
+            if result.isError:
+                raise ToolException(content)
+        return content, None
+
+    tool.coroutine = call
+    return tool
+
+
+class McpServerPool:
+    """
+    Keeps one initialized session per configured MCP server alive for the lifetime of
+    the process, instead of spawning a fresh `npx`/`uvx`/`python` subprocess per tool call.
+
+    Each session lives in its own task (stdio sessions must be opened and closed by the
+    same task), so all servers start concurrently. Use `lifespan` as the Starlette
+    lifespan to warm everything before the first request; otherwise the pool starts
+    lazily on the first get_tools().
+    """
+
+    def __init__(self, connections: dict[str, dict], expected_tools: dict[str, list[str]] | None = None) -> None:
+        self._client = MultiServerMCPClient(connections)
+        self._server_names = list(connections)
+        self._expected_tools = expected_tools or {}
+        self._lock = asyncio.Lock()
+        self._stop: asyncio.Event | None = None
+        self._runners: list[asyncio.Task] = []
+        self._tools: list | None = None
+        self.startup: dict[str, ServerStartup] = {}
+
+    async def _serve(self, name: str, ready: asyncio.Future) -> None:
+        stats = ServerStartup(name=name)
+        self.startup[name] = stats
+        started = time.perf_counter()
+        try:
+            async with self._client.session(name) as session:
+                tools = [_propagate_trace(session, t) for t in await load_mcp_tools(session)]
+                stats.cold_start_s = time.perf_counter() - started
+                stats.tools = [t.name for t in tools]
+
+                started = time.perf_counter()
+                await session.list_tools()
+                stats.warm_list_s = time.perf_counter() - started
+
+                ready.set_result(tools)
+                await self._stop.wait()
+        except Exception as e:
+            stats.error = repr(e)
+            if not ready.done():
+                ready.set_exception(e)
+                return
+            # The server died after startup: drop the cached tools so the next request restarts the pool.
+            log.error("server stopped unexpectedly", server=name, error=repr(e))
+            self._tools = None
+
+    def _verify(self, name: str, tools: list) -> None:
+        names = {t.name for t in tools}
+        if not names:
+            raise RuntimeError(f"MCP server '{name}' returned no tools.")
+        missing = set(self._expected_tools.get(name, [])) - names
+        if missing:
+            raise RuntimeError(f"MCP server '{name}' is missing expected tools: {sorted(missing)}")
+
+    async def start(self) -> list:
+        async with self._lock:
+            if self._tools is not None:
+                return self._tools
+
+            await self._shutdown_runners()
+            self._stop = asyncio.Event()
+            loop = asyncio.get_running_loop()
+            readies = {name: loop.create_future() for name in self._server_names}
+            self._runners = [
+                asyncio.create_task(self._serve(name, ready), name=f"mcp-server:{name}")
+                for name, ready in readies.items()
+            ]
+
+            tools: list = []
+            try:
+                for name, ready in readies.items():
+                    server_tools = await ready
+                    self._verify(name, server_tools)
+                    tools.extend(server_tools)
+            except BaseException:
+                await self._shutdown_runners()
+                raise
+
+            self._tools = tools
+            log.info("pool started", report=self.report())
+            return tools
+
+    async def get_tools(self) -> list:
+        if self._tools is None:
+            return await self.start()
+        return self._tools
+
+    async def _shutdown_runners(self) -> None:
+        if self._stop is not None:
+            self._stop.set()
+        if self._runners:
+            await asyncio.gather(*self._runners, return_exceptions=True)
+        self._runners = []
+
+    async def close(self) -> None:
+        async with self._lock:
+            self._tools = None
+            await self._shutdown_runners()
+
+    def report(self) -> dict[str, Any]:
+        return {
+            name: {
+                "cold_start_s": round(s.cold_start_s, 3),
+                "warm_list_s": round(s.warm_list_s, 3),
+                "tools": s.tools,
+                "error": s.error,
+            }
+            for name, s in self.startup.items()
+        }
+
+    @asynccontextmanager
+    async def lifespan(self, app: Any):
+        """
+        Starlette lifespan: launch and verify every server before serving requests.
+        """
+        await self.start()
+        try:
+            yield
+        finally:
+            await self.close()
+
+    def route(self, path: str = "/mcp/startup") -> Route:
+        """
+        JSON endpoint with the per-server cold/warm startup timings.
+        """
+
+        async def startup_report(request: Request) -> JSONResponse:
+            return JSONResponse(self.report())
+
+        return Route(path, startup_report, methods=["GET"])
@@ -0,0 +1,278 @@
+import asyncio
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+import tracing
+
+# Prometheus text-format metrics for one A2A app, served at METRICS_PATH.
+# Every app runs in its own process, so the scraper's job/instance labels tell them apart.
+METRICS_PATH = "/metrics"
+# The event loop is sampled this often: a sleep that wakes up late measures the lag.
+METRICS_LOOP_LAG_INTERVAL = float(os.getenv("METRICS_LOOP_LAG_INTERVAL", "0.5"))
+
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+_metrics: list["Metric"] = []
+_collectors: list[Callable[[], None]] = []
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: dict[tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+        if not labels and self.kind != "histogram":
+            self._values[()] = 0.0
+        _metrics.append(self)
+
+    def _key(self, labels: dict[str, Any]) -> tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labels)
+
+    def _samples(self) -> Iterator[str]:
+        for key, value in sorted(self._values.items()):
+            yield f"{self.name}{_format_labels(self.labels, key)} {_format_number(value)}"
+
+    def render(self) -> str:
+        with self._lock:
+            samples = list(self._samples())
+        return "\n".join([f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", *samples])
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def set_total(self, value: float, **labels: Any) -> None:
+        """
+        For totals counted elsewhere (e.g. TTLCache.hits), copied in at scrape time.
+        """
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: Any) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (), buckets: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        super().__init__(name, help, labels)
+        self.buckets = (*buckets, float("inf"))
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._values[key] = (counts, total + value)
+
+    def _samples(self) -> Iterator[str]:
+        for key, (counts, total) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = f'le="{_format_number(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labels, key)} {_format_number(total)}"
+            yield f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}"
+
+
+APP_INFO = Gauge("a2a_app_info", "The A2A app served by this process.", ("app",))
+
+HTTP_REQUESTS = Counter("a2a_http_requests_total", "HTTP requests handled.", ("path", "method", "status"))
+HTTP_IN_FLIGHT = Gauge("a2a_http_requests_in_flight", "HTTP requests (including open streams) being handled.")
+HTTP_LATENCY = Histogram("a2a_http_request_duration_seconds", "HTTP request duration, until the response ends.", ("path",))
+
+TASKS = Counter("a2a_tasks_total", "AgentExecutor executions, by outcome.", ("outcome",))
+TASKS_IN_FLIGHT = Gauge("a2a_tasks_in_flight", "AgentExecutor executions running.")
+
+STAGE_LATENCY = Histogram(
+    "a2a_stage_duration_seconds",
+    "Duration of each traced stage: request handling, workflow stages, LLM completions, tool calls, A2A hops, HTTP calls.",
+    ("kind", "name"),
+)
+
+LLM_REQUESTS = Counter("llm_requests_total", "Chat completions, by model and status.", ("model", "status"))
+LLM_TOKENS = Counter("llm_tokens_total", "Tokens used by chat completions, by model and type (prompt / completion).", ("model", "type"))
+
+MCP_CALLS = Counter("mcp_calls_total", "MCP tool calls sent to a server.", ("tool",))
+MCP_ERRORS = Counter("mcp_call_errors_total", "MCP tool calls that failed or returned an error.", ("tool",))
+MCP_LATENCY = Histogram("mcp_call_duration_seconds", "MCP tool call duration.", ("tool",))
+
+CACHE_HITS = Counter("cache_hits_total", "Cache hits.", ("cache",))
+CACHE_MISSES = Counter("cache_misses_total", "Cache misses.", ("cache",))
+CACHE_HIT_RATIO = Gauge("cache_hit_ratio", "Cache hits / lookups since start.", ("cache",))
+CACHE_SIZE = Gauge("cache_entries", "Entries in the cache.", ("cache",))
+
+LOOP_LAG = Histogram("event_loop_lag_seconds", "How late the event loop wakes up a sleeping task.", buckets=LAG_BUCKETS)
+LOOP_LAG_LAST = Gauge("event_loop_lag_last_seconds", "Event loop lag of the latest sample.")
+
+
+def _stage_name(record: tracing.Span) -> str:
+    # HTTP span names carry the URL path (document ids, ...): keep the method and host only.
+    return record.name.split("/", 1)[0] if record.kind == "http" else record.name
+
+
+def _observe_span(record: tracing.Span) -> None:
+    STAGE_LATENCY.observe((record.end or record.start) - record.start, kind=record.kind, name=_stage_name(record))
+    if record.kind == "llm":
+        model = record.attributes.get("model", "unknown")
+        LLM_REQUESTS.inc(model=model, status="error" if record.error else "ok")
+        for kind in ("prompt", "completion"):
+            if (tokens := record.attributes.get(f"{kind}_tokens")) is not None:
+                LLM_TOKENS.inc(tokens, model=model, type=kind)
+
+
+tracing.on_span_end(_observe_span)
+
+
+@contextmanager
+def mcp_call(tool: str) -> Iterator[None]:
+    """
+    Count one MCP tool call (and its failure) and record its duration.
+    """
+    MCP_CALLS.inc(tool=tool)
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        MCP_ERRORS.inc(tool=tool)
+        raise
+    finally:
+        MCP_LATENCY.observe(time.perf_counter() - started, tool=tool)
+
+
+def watch_caches(*caches: Any) -> None:
+    """
+    Export the hit / miss counters of TTLCache-like objects (name, hits, misses, len()).
+    """
+    def collect() -> None:
+        for cache in caches:
+            lookups = cache.hits + cache.misses
+            CACHE_HITS.set_total(cache.hits, cache=cache.name)
+            CACHE_MISSES.set_total(cache.misses, cache=cache.name)
+            CACHE_HIT_RATIO.set(cache.hits / lookups if lookups else 0.0, cache=cache.name)
+            CACHE_SIZE.set(len(cache), cache=cache.name)
+
+    _collectors.append(collect)
+
+
+def render() -> str:
+    for collect in _collectors:
+        collect()
+    return "\n".join(metric.render() for metric in _metrics) + "\n"
+
+
+async def metrics_endpoint(request: Request) -> PlainTextResponse:
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4")
+
+
+async def _watch_loop_lag() -> None:
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(METRICS_LOOP_LAG_INTERVAL)
+        lag = max(0.0, loop.time() - started - METRICS_LOOP_LAG_INTERVAL)
+        LOOP_LAG.observe(lag)
+        LOOP_LAG_LAST.set(lag)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware counting requests per route, in-flight requests and their duration
+    (a streamed response counts until its last chunk). Starts the event-loop lag sampler.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self._lag_task: asyncio.Task | None = None
+        self._paths: set[str] | None = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if self._lag_task is None:
+            self._lag_task = asyncio.create_task(_watch_loop_lag())
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if self._paths is None:
+            self._paths = {route.path for route in scope["app"].routes if hasattr(route, "path")}
+        # Unknown paths share one label, so scanners can't blow up the series count.
+        path = scope["path"] if scope["path"] in self._paths else "other"
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            HTTP_REQUESTS.inc(path=path, method=scope["method"], status=status)
+            HTTP_LATENCY.observe(time.perf_counter() - started, path=path)
+
+
+def instrument(app: Starlette, name: str) -> Starlette:
+    """
+    Add the /metrics route and the request metrics middleware to a built A2A app.
+    """
+    APP_INFO.set(1, app=name)
+    app.add_route(METRICS_PATH, metrics_endpoint, methods=["GET"], include_in_schema=False)
+    app.add_middleware(MetricsMiddleware)
+    return app
@@ -1,20 +1,21 @@
 import json
+import os
 from pathlib import Path
 from typing import Any
 
 import asyncio
+from functools import partial
 from uuid import uuid4
 import httpx
 
-from langchain_mcp_adapters.client import MultiServerMCPClient
 
 from a2a.server.agent_execution import AgentExecutor, RequestContext
 from a2a.server.events import EventQueue
 from a2a.server.request_handlers import DefaultRequestHandler
-from a2a.server.tasks import InMemoryTaskStore
+from a2a.server.tasks import TaskUpdater
 from a2a.server.apps import A2AStarletteApplication
-from a2a.types import AgentCapabilities, AgentCard, AgentSkill
-from a2a.utils import new_agent_text_message
+from a2a.types import AgentCapabilities, AgentCard, AgentSkill, Part, TextPart
+from a2a.utils import new_task
 
 from dotenv import load_dotenv
 import aisuite as ai
@@ -22,6 +23,19 @@ import aisuite as ai
 load_dotenv()
 
 import agents.reddit_llm
+from agents.dedupe import FingerprintIndex, dedupe_posts
+from agents.tool_loop import call_tool, tool_output_text
+from cancellation import RunningTasks
+from deadline import deadline_scope, from_metadata
+from mcp_pool import McpServerPool
+from metrics import instrument, watch_caches
+from sqlite_task_store import make_task_store
+from structured_log import get_logger
+from tracing import server_span, set_service
+from ttl_cache import TTLCache
+
+set_service("reddit")
+log = get_logger("reddit")
 
 # git clone https://github.com/Hawstein/mcp-server-reddit
 
@@ -34,19 +48,168 @@ def load_mcp_config(config_path: str = "config.json"):
     return servers
 
 
+# Hot/new/rising listings change by the minute; comment trees and subreddit info
+# barely move within a research session.
+REDDIT_LISTING_TTL = float(os.getenv("REDDIT_LISTING_TTL", "120"))
+REDDIT_TOP_TTL = float(os.getenv("REDDIT_TOP_TTL", "900"))
+REDDIT_COMMENTS_TTL = float(os.getenv("REDDIT_COMMENTS_TTL", "1800"))
+
+TOOL_TTLS = {
+    "get_frontpage_posts": REDDIT_LISTING_TTL,
+    "get_subreddit_hot_posts": REDDIT_LISTING_TTL,
+    "get_subreddit_new_posts": REDDIT_LISTING_TTL,
+    "get_subreddit_rising_posts": REDDIT_LISTING_TTL,
+    "get_subreddit_top_posts": REDDIT_TOP_TTL,
+    "get_subreddit_info": REDDIT_COMMENTS_TTL,
+    "get_post_content": REDDIT_COMMENTS_TTL,
+    "get_post_comments": REDDIT_COMMENTS_TTL,
+}
+
+POST_LISTING_TOOLS = {
+    "get_frontpage_posts",
+    "get_subreddit_hot_posts",
+    "get_subreddit_new_posts",
+    "get_subreddit_top_posts",
+    "get_subreddit_rising_posts",
+    "search_subreddits",
+}
+
+FANOUT_MAX_SUBREDDITS = 8
+FANOUT_MAX_POSTS = 25
+
+
+class CachedRedditTool:
+    """
+    A Reddit MCP tool behind the shared cache, keyed by tool name and arguments.
+    Exposes .coroutine so it drops into a tool mapping in place of the MCP tool;
+    failed calls raise and are never cached.
+    """
+
+    def __init__(self, tool: Any, cache: TTLCache, ttl: float | None = None) -> None:
+        self.name = tool.name
+        self._tool = tool
+        self._cache = cache
+        self._ttl = ttl
+
+    async def coroutine(self, **args: Any) -> str:
+        key = (self.name, json.dumps(args, sort_keys=True, default=str))
+
+        async def load() -> str:
+            return tool_output_text(await call_tool(self._tool, args))
+
+        return await self._cache.get_or_load(key, load, ttl=self._ttl)
+
+
+def _posts(text: str) -> list[dict]:
+    try:
+        payload = json.loads(text)
+    except ValueError:
+        return []
+    if isinstance(payload, dict):
+        payload = payload.get("posts") or payload.get("data") or []
+    return [p for p in payload if isinstance(p, dict)] if isinstance(payload, list) else []
+
+
+class SubredditFanOutTool:
+    """
+    search_subreddits: one tool call that fetches a listing from several subreddits
+    concurrently (through the cached tools) and returns the merged, de-duplicated
+    posts ordered by score.
+    """
+
+    name = "search_subreddits"
+    description = (
+        "Fetch posts from several subreddits at once and merge them, highest score first. "
+        "Use this instead of calling a listing tool once per subreddit. "
+        "listing is one of hot, new, top, rising; time (for top) is one of hour, day, week, month, year, all."
+    )
+    args_schema = {
+        "type": "object",
+        "properties": {
+            "subreddit_names": {"type": "array", "items": {"type": "string"}, "description": "Subreddit names without r/"},
+            "listing": {"type": "string", "enum": ["hot", "new", "top", "rising"], "default": "hot"},
+            "limit": {"type": "integer", "description": "Posts per subreddit", "default": 10},
+            "time": {"type": "string", "default": "week"},
+        },
+        "required": ["subreddit_names"],
+    }
+
+    def __init__(self, tool_mapping: dict) -> None:
+        self._tools = tool_mapping
+
+    async def coroutine(self, subreddit_names: list[str], listing: str = "hot", limit: int = 10, time: str = "week") -> str:
+        tool = self._tools.get(f"get_subreddit_{listing}_posts")
+        if tool is None:
+            raise ValueError(f"Unsupported listing: {listing}")
+
+        names = list(dict.fromkeys(n.strip().removeprefix("r/") for n in subreddit_names if n.strip()))
+        names = names[:FANOUT_MAX_SUBREDDITS]
+
+        def args(name: str) -> dict:
+            return {"subreddit_name": name, "limit": limit, **({"time": time} if listing == "top" else {})}
+
+        results = await asyncio.gather(*(call_tool(tool, args(n)) for n in names), return_exceptions=True)
+
+        merged: dict[str, dict] = {}
+        failed = {}
+        for name, result in zip(names, results):
+            if isinstance(result, Exception):
+                failed[name] = str(result)
+                continue
+            for post in _posts(tool_output_text(result)):
+                post.setdefault("subreddit", name)
+                # Cross-posts share the URL; keep the higher-scoring copy.
+                key = str(post.get("url") or post.get("id") or post.get("title"))
+                if key not in merged or (post.get("score") or 0) > (merged[key].get("score") or 0):
+                    merged[key] = post
+
+        posts = sorted(merged.values(), key=lambda p: p.get("score") or 0, reverse=True)
+        return json.dumps(
+            {"listing": listing, "subreddits": names, "failed": failed, "posts": posts[:FANOUT_MAX_POSTS]},
+            ensure_ascii=False,
+            default=str,
+        )
+
+
 class RedditAgent:
     def __init__(self) -> None:
-        self._mcp_client = MultiServerMCPClient(load_mcp_config("reddit_config.json"))
+        self.mcp_pool = McpServerPool(load_mcp_config("reddit_config.json"))
         self._llm_client = ai.Client()
         self._model = "ollama:gemma3:latest"
-        self._tools = None
+        # Shared across requests, so the workflow's revision round reuses the first round's fetches.
+        self.cache = TTLCache(maxsize=512, ttl=REDDIT_LISTING_TTL, name="reddit")
+        # Posts already seen per workflow task (message metadata "workflow_task_id").
+        self.fingerprints = TTLCache(maxsize=128, ttl=6 * 3600, name="reddit_fingerprints")
+
+    def _dedupe_hooks(self, tool_mapping: dict, task_id: str | None) -> tuple[dict, FingerprintIndex | None]:
+        if not task_id:
+            return {}, None
+        index = self.fingerprints.get(task_id)
+        if index is None:
+            index = FingerprintIndex()
+            self.fingerprints.set(task_id, index)
+        hook = partial(dedupe_posts, index=index)
+        return {name: hook for name in tool_mapping if name in POST_LISTING_TOOLS}, index
+
+    def _cached_tools(self, tool_mapping: dict, tool_defs: list) -> tuple[dict, list]:
+        import tool_def_maker
+
+        mapping = {
+            name: CachedRedditTool(tool, self.cache, TOOL_TTLS.get(name))
+            for name, tool in tool_mapping.items()
+        }
+        fan_out = SubredditFanOutTool(mapping)
+        mapping[fan_out.name] = fan_out
+        return mapping, tool_defs + [tool_def_maker.lc_tool_to_openai_def(fan_out)]
 
     async def _ensure_tools(self):
-        if self._tools is None:
-            self._tools = await self._mcp_client.get_tools()
-        return self._tools
+        return await self.mcp_pool.get_tools()
 
-    async def invoke(self, user_input: str) -> str:
+    async def invoke(self, user_input: str, task_id: str | None = None) -> str:
+        """
+        task_id groups the research rounds of one workflow: posts seen in an earlier
+        round are dropped from later rounds' tool results.
+        """
         tools = await self._ensure_tools()
 
         if tools:
@@ -55,16 +218,35 @@ class RedditAgent:
 
             tool_def = [tool_def_maker.lc_tool_to_openai_def(t) for t in tools]
             tool_mapping = tool_def_maker.build_tool_mapping(tools,tool_def)
+            tool_mapping, tool_def = self._cached_tools(tool_mapping, tool_def)
+
 
+        hooks, index = self._dedupe_hooks(tool_mapping, task_id)
+        dropped, saved = (index.dropped, index.tokens_saved) if index else (0, 0)
+
+        redditResponse = await agents.reddit_llm.reddit_search_openai(user_input,tool_mapping,tool_def,tool_result_hooks=hooks)
+        log.debug("cache stats", cache=self.cache.stats())
+        if index:
+            log.info(
+                "dedupe",
+                task_id=task_id,
+                dropped=index.dropped - dropped,
+                tokens_saved=index.tokens_saved - saved,
+                task_dropped=index.dropped,
+                task_tokens_saved=index.tokens_saved,
+            )
 
-        redditResponse = await agents.reddit_llm.reddit_search_openai(user_input,tool_mapping,tool_def)
-        
         return redditResponse
 
 
 class RedditAgentExecutor(AgentExecutor):
+    """
+    Each search runs as an A2A task, so callers (the Docs workflow) can cancel it.
+    """
+
     def __init__(self) -> None:
         self.agent = RedditAgent()
+        self.running = RunningTasks()
 
     async def execute(
         self,
@@ -72,11 +254,29 @@ class RedditAgentExecutor(AgentExecutor):
         event_queue: EventQueue,
     ) -> None:
         user_input: str = context.get_user_input()  # type: ignore[assignment]
-        result = await self.agent.invoke(user_input)
-        await event_queue.enqueue_event(new_agent_text_message(result))
+        metadata = (context.message.metadata if context.message else None) or {}
+
+        task = context.current_task
+        if task is None:
+            task = new_task(context.message)
+            await event_queue.enqueue_event(task)
+        updater = TaskUpdater(event_queue, task.id, task.context_id)
+        await updater.start_work()
+
+        with deadline_scope(from_metadata(metadata)), server_span("reddit.execute", metadata):
+            try:
+                async with self.running.track(task.id):
+                    result = await self.agent.invoke(user_input, task_id=metadata.get("workflow_task_id"))
+            except Exception as e:
+                # A task left "working" would be polled until the caller's deadline.
+                log.error("reddit search failed", error=repr(e))
+                await updater.failed(updater.new_agent_message([Part(root=TextPart(text=f"Reddit search failed: {e}"))]))
+                return
+        await updater.add_artifact([Part(root=TextPart(text=result))], name="answer")
+        await updater.complete()
 
     async def cancel(self, context: RequestContext, event_queue: EventQueue) -> None:
-        raise Exception("Cancellation not supported")    
+        await self.running.cancel(context, event_queue)
 
 external_skill = AgentSkill(
     id="reddit_agent",
@@ -97,9 +297,11 @@ external_card = AgentCard(
     supportsAuthenticatedExtendedCard=False,
 )
 
+agent_executor = RedditAgentExecutor()
+
 request_handler = DefaultRequestHandler(
-    agent_executor=RedditAgentExecutor(),
-    task_store=InMemoryTaskStore(),
+    agent_executor=agent_executor,
+    task_store=make_task_store("reddit"),
 )
 
 app_builder = A2AStarletteApplication(
@@ -108,4 +310,10 @@ app_builder = A2AStarletteApplication(
 )
 
 # uv run uvicorn reddit_a2a:app --port 8130
-app = app_builder.build()
+# The lifespan launches the Reddit MCP server (uvx) once at startup and keeps it resident.
+app = app_builder.build(
+    lifespan=agent_executor.agent.mcp_pool.lifespan,
+    routes=[agent_executor.agent.mcp_pool.route()],
+)
+instrument(app, "reddit")
+watch_caches(agent_executor.agent.cache, agent_executor.agent.fingerprints)
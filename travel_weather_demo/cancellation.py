@@ -0,0 +1,127 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable
+from uuid import uuid4
+
+from a2a.client import A2AClient
+from a2a.server.agent_execution import RequestContext
+from a2a.server.events import EventQueue
+from a2a.server.tasks import TaskUpdater
+from a2a.types import CancelTaskRequest, TaskIdParams
+
+from metrics import TASKS, TASKS_IN_FLIGHT
+from structured_log import get_logger
+
+# Upper bound on how long a cancel request waits for downstream agents to acknowledge.
+A2A_CANCEL_TIMEOUT = float(os.getenv("A2A_CANCEL_TIMEOUT", "5"))
+
+log = get_logger("cancellation")
+
+
+@dataclass
+class Execution:
+    """
+    One running AgentExecutor.execute call.
+
+    on_cancel: coroutines awaited by cancel() before the local work is stopped,
+               e.g. cancelling the tasks this execution opened on downstream agents.
+               They run while the execution's HTTP clients are still open.
+    """
+    task_id: str
+    task: asyncio.Task
+    on_cancel: list[Callable[[], Awaitable[Any]]] = field(default_factory=list)
+
+
+_current: ContextVar[Execution | None] = ContextVar("a2a_execution", default=None)
+
+
+def _forget() -> None:
+    pass
+
+
+def on_cancel(callback: Callable[[], Awaitable[Any]]) -> Callable[[], None]:
+    """
+    Register a cancel hook on the execution running in this context (no-op outside one).
+    Child asyncio tasks inherit the context, so hooks can be added from them too.
+    Returns a function that unregisters the hook again.
+    """
+    execution = _current.get()
+    if execution is None:
+        return _forget
+    execution.on_cancel.append(callback)
+
+    def forget() -> None:
+        if callback in execution.on_cancel:
+            execution.on_cancel.remove(callback)
+
+    return forget
+
+
+def cancel_downstream(client: A2AClient, task_id: str) -> Callable[[], None]:
+    """
+    Propagate a cancel of the current execution to a task on a downstream A2A agent.
+    Call the returned function once the downstream task has finished.
+    """
+    async def cancel() -> None:
+        await client.cancel_task(CancelTaskRequest(id=str(uuid4()), params=TaskIdParams(id=task_id)))
+
+    return on_cancel(cancel)
+
+
+class RunningTasks:
+    """
+    The executions in flight in one AgentExecutor, keyed by A2A task id.
+
+    execute() wraps its work in track(); cancel() tells downstream agents to cancel
+    their tasks, then cancels the asyncio work, which aborts awaited HTTP requests and
+    unwinds the execution's `async with` / `finally` cleanup (httpx clients closed,
+    sub-tasks awaited), and publishes the canceled status. Model calls running in a
+    worker thread cannot be interrupted: they are abandoned and their result dropped.
+    """
+
+    def __init__(self) -> None:
+        self._running: dict[str, Execution] = {}
+
+    @asynccontextmanager
+    async def track(self, task_id: str) -> AsyncIterator[Execution]:
+        execution = Execution(task_id=task_id, task=asyncio.current_task())
+        self._running[task_id] = execution
+        token = _current.set(execution)
+        TASKS_IN_FLIGHT.inc()
+        outcome = "failed"
+        try:
+            yield execution
+            outcome = "completed"
+        except asyncio.CancelledError:
+            outcome = "canceled"
+            raise
+        finally:
+            TASKS.inc(outcome=outcome)
+            TASKS_IN_FLIGHT.dec()
+            _current.reset(token)
+            self._running.pop(task_id, None)
+
+    async def cancel(self, context: RequestContext, event_queue: EventQueue) -> None:
+        execution = self._running.get(context.task_id)
+        if execution is not None:
+            if execution.on_cancel:
+                hooks = [hook() for hook in execution.on_cancel]
+                try:
+                    results = await asyncio.wait_for(
+                        asyncio.gather(*hooks, return_exceptions=True), A2A_CANCEL_TIMEOUT
+                    )
+                except TimeoutError:
+                    results = [TimeoutError(f"no answer within {A2A_CANCEL_TIMEOUT}s")]
+                for result in results:
+                    if isinstance(result, Exception):
+                        log.warning("downstream cancel failed", task_id=context.task_id, error=repr(result))
+            execution.task.cancel()
+
+        updater = TaskUpdater(event_queue, context.task_id, context.context_id)
+        await updater.cancel()
+
+    def __len__(self) -> int:
+        return len(self._running)
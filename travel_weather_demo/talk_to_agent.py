@@ -1,23 +1,39 @@
 import asyncio
+import os
+import time
 from uuid import uuid4
 from typing import Any
 
-import httpx
 from a2a.client import A2ACardResolver, A2AClient
 from a2a.types import MessageSendParams, SendMessageRequest
 
 from dotenv import load_dotenv
 
+from deadline import DEADLINE_KEY
+
 load_dotenv()
 
+from tracing import inject, set_service, span, traced_client
+
+set_service("talk_to_agent")
+
 BASE_URL = "http://localhost:8081"
+# Seconds the agents get for the request; sent as an absolute deadline in the message metadata.
+REQUEST_BUDGET = float(os.getenv("A2A_REQUEST_BUDGET", "60"))
 
 
 async def ask_agent(message: str, city: str) -> None:
     """
     Send a simple A2A message to the Weather Stylist agent and print the response.
     """
-    async with httpx.AsyncClient(timeout=60.0) as httpx_client:
+    deadline = time.time() + REQUEST_BUDGET
+    with span("talk_to_agent.ask_agent", "a2a", agent="weather_stylist") as root:
+        print(f"trace: {root.trace_id}  (render with: python tracing.py {root.trace_id[:8]})")
+        await _ask_agent(message, city, deadline)
+
+
+async def _ask_agent(message: str, city: str, deadline: float) -> None:
+    async with traced_client(timeout=REQUEST_BUDGET) as httpx_client:
         # 1) Discover agent card from /.well-known/agent-card.json
         resolver = A2ACardResolver(
             httpx_client=httpx_client,
@@ -48,6 +64,7 @@ async def ask_agent(message: str, city: str) -> None:
                     {"kind": "text", "text": full_message},
                 ],
                 "messageId": uuid4().hex,
+                "metadata": inject({DEADLINE_KEY: deadline}),
             }
         }
 
@@ -7,38 +7,57 @@
 
 from __future__ import annotations
 
+import asyncio
 import os
 from typing import Any
 from uuid import uuid4
 
 import aisuite as ai
-import httpx
 
 from a2a.client import A2ACardResolver, A2AClient
+from a2a.client.errors import A2AClientHTTPError, A2AClientTimeoutError
 from a2a.server.agent_execution import AgentExecutor, RequestContext
 from a2a.server.apps import A2AStarletteApplication
 from a2a.server.events import EventQueue
 from a2a.server.request_handlers import DefaultRequestHandler
-from a2a.server.tasks import InMemoryTaskStore
+from a2a.server.tasks import TaskUpdater
 from a2a.types import (
     AgentCapabilities,
     AgentCard,
     AgentSkill,
     MessageSendParams,
-    SendMessageRequest,
+    Part,
+    SendStreamingMessageRequest,
+    TextPart,
 )
-from a2a.utils import new_agent_text_message
+from a2a.utils import new_task
 
 from dotenv import load_dotenv
 
 load_dotenv()
 
+from cancellation import RunningTasks, cancel_downstream
+from deadline import deadline_scope, downstream_metadata, from_metadata, has_time, time_limit
+from metrics import instrument
+from sqlite_task_store import make_task_store
+from structured_log import get_logger
+from tracing import inject, server_span, set_service, span, traced_client
+
+set_service("travel_planner")
+log = get_logger("travel_planner")
+
 # URL of your existing Weather Stylist agent
 # You can override this with WEATHER_AGENT_URL env var if needed.
 WEATHER_AGENT_URL = os.getenv("WEATHER_AGENT_URL", "http://localhost:8080")
 
 DEFAULT_MODEL = os.getenv("TRAVEL_PLANNER_MODEL", "openai:gpt-4o-mini")
 
+# Under a request deadline (deadline.py): the Weather Stylist is only asked with this many
+# seconds left, and without TRAVEL_PLAN_MIN_TIME left for the LLM the stylist's advice is
+# returned as is.
+STYLIST_MIN_TIME = float(os.getenv("TRAVEL_STYLIST_MIN_TIME", "10"))
+PLAN_MIN_TIME = float(os.getenv("TRAVEL_PLAN_MIN_TIME", "5"))
+
 
 class TravelPlannerAgent:
     """
@@ -58,7 +77,7 @@ class TravelPlannerAgent:
 
         Returns the *text* produced by the Weather Stylist, or a fallback string.
         """
-        async with httpx.AsyncClient(timeout=60.0) as httpx_client:
+        async with traced_client(timeout=time_limit(60.0)) as httpx_client:
             # 1) Discover the remote agent via its agent card
             resolver = A2ACardResolver(
                 httpx_client=httpx_client,
@@ -67,13 +86,7 @@ class TravelPlannerAgent:
             agent_card = await resolver.get_agent_card()
 
             if agent_card:
-                print("\n******************")
-
-                print("Travel Planner: Hey I know an agent who can help you with this:")
-
-                print(agent_card.name)
-
-                print("******************\n")
+                log.info("delegating", agent=agent_card.name)
 
 
             # 2) Create an A2A client (yes, A2AClient is deprecated, but fine for now)
@@ -86,43 +99,53 @@ class TravelPlannerAgent:
                 f"{user_input}\n\n"
                 "Please respond ONLY with concise weather & outfit advice for the user."
             )
+            metadata = inject(downstream_metadata())
 
             payload: dict[str, Any] = {
                 "message": {
                     "role": "user",
                     "parts": [{"kind": "text", "text": message_text}],
                     "messageId": uuid4().hex,
+                    **({"metadata": metadata} if metadata else {}),
                 }
             }
 
-            request = SendMessageRequest(
+            request = SendStreamingMessageRequest(
                 id=str(uuid4()),
                 params=MessageSendParams(**payload),
             )
 
-            response = await client.send_message(request)
-
-            # The JSON-RPC response looks like:
-            # {'id': '...', 'jsonrpc': '2.0',
-            #  'result': {'kind': 'message', 'messageId': '...', 'parts': [
-            #       {'kind': 'text', 'text': 'Hello World'}
-            #  ], 'role': 'agent'}}
-            # 
-            data = response.model_dump(mode="json", exclude_none=True)
-
-            if "error" in data:
-                return f"(Weather Stylist error: {data['error'].get('message')})"
-
-            result = data.get("result") or {}
-            parts = result.get("parts") or []
-            for part in parts:
-                if (
-                    isinstance(part, dict)
-                    and part.get("kind") == "text"
-                    and isinstance(part.get("text"), str)
-                ):
-                    return part["text"]
-
+            # Streamed, so the Weather Stylist's task id is known (and cancellable) while it works.
+            texts: list[str] = []
+            forget = None
+            try:
+                async for response in client.send_message_streaming(request):
+                    data = response.model_dump(mode="json", exclude_none=True)
+
+                    if "error" in data:
+                        return f"(Weather Stylist error: {data['error'].get('message')})"
+
+                    event = data.get("result") or {}
+                    task_id = event.get("id") if event.get("kind") == "task" else event.get("taskId")
+                    if forget is None and task_id:
+                        forget = cancel_downstream(client, task_id)
+
+                    if event.get("kind") == "artifact-update":
+                        parts = (event.get("artifact") or {}).get("parts") or []
+                    else:
+                        # A failed task explains why in its status message.
+                        parts = ((event.get("status") or {}).get("message") or {}).get("parts") or []
+                    texts.extend(
+                        part["text"]
+                        for part in parts
+                        if part.get("kind") == "text" and isinstance(part.get("text"), str)
+                    )
+            finally:
+                if forget is not None:
+                    forget()
+
+            if texts:
+                return "\n".join(texts)
             return "(Weather Stylist did not return a usable text response.)"
 
     async def invoke(self, user_input: str) -> str:
@@ -133,7 +156,22 @@ class TravelPlannerAgent:
             user_input = "Plan a weekend city break somewhere warm and suggest outfits."
 
         # 1) Call the Weather Stylist agent
-        stylist_text = await self._call_weather_stylist(user_input)
+        if not has_time(STYLIST_MIN_TIME):
+            stylist_text = "(Weather Stylist skipped: not enough time left before the deadline.)"
+        else:
+            try:
+                # A2AClient turns httpx timeouts / transport errors into its own errors.
+                with span("a2a weather_stylist", "a2a", agent="weather_stylist"):
+                    async with asyncio.timeout(time_limit()):
+                        stylist_text = await self._call_weather_stylist(user_input)
+            except (TimeoutError, A2AClientTimeoutError):
+                stylist_text = "(Weather Stylist didn't answer before the deadline.)"
+            except A2AClientHTTPError as e:
+                stylist_text = f"(Weather Stylist unavailable: {e.message})"
+
+        partial = f"(No travel plan could be written before the deadline.)\nWeather Stylist advice:\n{stylist_text}"
+        if not has_time(PLAN_MIN_TIME):
+            return partial
 
         # 2) Use LLM to synthesize a travel-friendly answer
         system_prompt = (
@@ -149,19 +187,28 @@ class TravelPlannerAgent:
             "- Keep the whole answer under 200 words."
         )
 
-        completion = self._client.chat.completions.create(
-            model=DEFAULT_MODEL,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {
-                    "role": "user",
-                    "content": (
-                        f"User travel question:\n{user_input}\n\n"
-                        f"Weather Stylist agent reply:\n{stylist_text}"
+        try:
+            with span("llm planner", "llm", model=DEFAULT_MODEL) as record:
+                completion = await asyncio.wait_for(
+                    asyncio.to_thread(
+                        self._client.chat.completions.create,
+                        model=DEFAULT_MODEL,
+                        messages=[
+                            {"role": "system", "content": system_prompt},
+                            {
+                                "role": "user",
+                                "content": (
+                                    f"User travel question:\n{user_input}\n\n"
+                                    f"Weather Stylist agent reply:\n{stylist_text}"
+                                ),
+                            },
+                        ],
                     ),
-                },
-            ],
-        )
+                    time_limit(),
+                )
+                record.set_usage(completion)
+        except TimeoutError:
+            return partial
 
         content: Any = completion.choices[0].message.content
 
@@ -180,6 +227,7 @@ class TravelPlannerAgentExecutor(AgentExecutor):
 
     def __init__(self) -> None:
         self.agent = TravelPlannerAgent()
+        self.running = RunningTasks()
 
     async def execute(
         self,
@@ -188,18 +236,34 @@ class TravelPlannerAgentExecutor(AgentExecutor):
     ) -> None:
         # Extract user text from the A2A RequestContext
         user_input: str = context.get_user_input()  # type: ignore[assignment]
-
-        result_text = await self.agent.invoke(user_input)
-
-        # Return a simple text message event to the caller
-        await event_queue.enqueue_event(new_agent_text_message(result_text))
+        metadata = (context.message.metadata if context.message else None) or {}
+
+        # Run as an A2A task, so callers can cancel it (tasks/cancel) while it works.
+        task = context.current_task
+        if task is None:
+            task = new_task(context.message)
+            await event_queue.enqueue_event(task)
+        updater = TaskUpdater(event_queue, task.id, task.context_id)
+        await updater.start_work()
+
+        with deadline_scope(from_metadata(metadata)), server_span("travel_planner.execute", metadata):
+            try:
+                async with self.running.track(task.id):
+                    result_text = await self.agent.invoke(user_input)
+            except Exception as e:
+                log.error("request failed", error=repr(e))
+                await updater.failed(updater.new_agent_message([Part(root=TextPart(text=f"Travel planning failed: {e}"))]))
+                return
+
+        await updater.add_artifact([Part(root=TextPart(text=result_text))], name="answer")
+        await updater.complete()
 
     async def cancel(
         self,
         context: RequestContext,
         event_queue: EventQueue,
     ) -> None:
-        raise Exception("Cancellation is not supported for this agent.")
+        await self.running.cancel(context, event_queue)
 
 
 # ---- AgentCard for the Travel Planner agent ---------------------------------------
@@ -237,7 +301,7 @@ travel_planner_card = AgentCard(
 
 request_handler = DefaultRequestHandler(
     agent_executor=TravelPlannerAgentExecutor(),
-    task_store=InMemoryTaskStore(),
+    task_store=make_task_store("travel_planner"),
 )
 
 _server_app_builder = A2AStarletteApplication(
@@ -246,6 +310,6 @@ _server_app_builder = A2AStarletteApplication(
 )
 
 # This is what uvicorn will run: `uv run uvicorn travel_planner_agent:app --port 8081`
-app = _server_app_builder.build()
+app = instrument(_server_app_builder.build(), "travel_planner")
 
 # uv run uvicorn travel_planner_agent:app --port 8081
\ No newline at end of file
@@ -6,18 +6,28 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+from structured_log import get_logger
+from tracing import set_service, span, traced
+
 mcp = FastMCP("WeatherMCP")
+set_service("weather_mcp")
+log = get_logger("weather_mcp")
 
 OPENWEATHER_KEY = os.getenv("OPENWEATHER_API_KEY")
 
 @mcp.tool()
+@traced(mcp)
 def get_weather(city: str) -> dict:
     """
     Returns basic weather info for a city.
     """
     url = "https://api.openweathermap.org/data/2.5/weather"
     params = {"q": city, "appid": OPENWEATHER_KEY, "units": "metric"}
-    r = requests.get(url, params=params)
+    with span("GET api.openweathermap.org/data/2.5/weather", "http", city=city) as record:
+        r = requests.get(url, params=params)
+        record.set(status_code=r.status_code)
+    if not r.ok:
+        log.warning("weather lookup failed", city=city, status_code=r.status_code)
     r.raise_for_status()
     data = r.json()
 
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 import os
 import re
 import json
@@ -15,16 +16,25 @@ load_dotenv()
 
 # --- MCP client imports ---
 from mcp import ClientSession, StdioServerParameters, types
-from mcp.client.stdio import stdio_client
+from mcp.client.stdio import get_default_environment, stdio_client
 
 # --- A2A imports ---
 from a2a.server.agent_execution import AgentExecutor, RequestContext
 from a2a.server.apps import A2AStarletteApplication
 from a2a.server.events import EventQueue
 from a2a.server.request_handlers import DefaultRequestHandler
-from a2a.server.tasks import InMemoryTaskStore
-from a2a.types import AgentCapabilities, AgentCard, AgentSkill
-from a2a.utils import new_agent_text_message
+from a2a.server.tasks import TaskUpdater
+from a2a.types import AgentCapabilities, AgentCard, AgentSkill, Part, TextPart
+from a2a.utils import new_task
+from cancellation import RunningTasks
+from deadline import deadline_scope, from_metadata, has_time, time_limit
+from metrics import instrument, mcp_call
+from sqlite_task_store import make_task_store
+from structured_log import get_logger
+from tracing import inject, server_span, set_service, span, subprocess_env
+
+set_service("weather_stylist")
+log = get_logger("weather_stylist")
 
 DEFAULT_MODEL = os.getenv("WEATHER_STYLIST_MODEL", "openai:gpt-4o-mini")
 
@@ -32,6 +42,10 @@ DEFAULT_MODEL = os.getenv("WEATHER_STYLIST_MODEL", "openai:gpt-4o-mini")
 MCP_COMMAND = os.getenv("WEATHER_MCP_COMMAND", "python")
 MCP_ARGS = os.getenv("WEATHER_MCP_ARGS", "weather_mcp_server.py").split()
 
+# Under a request deadline (deadline.py), the outfit LLM call needs at least this many
+# seconds; with less left, the weather summary alone is returned.
+ADVICE_MIN_TIME = float(os.getenv("WEATHER_ADVICE_MIN_TIME", "5"))
+
 
 CITY_PATTERN = re.compile(r"city\s*:\s*([A-Za-z\s]+)", re.IGNORECASE)
 
@@ -63,44 +77,47 @@ class WeatherStylistAgent:
         """
         Call the MCP weather server tool `get_weather` and return a dict:
           {"city": ..., "temp_c": ..., "description": ...}
-        or None if something goes wrong.
+        or None if something goes wrong or the request deadline passes first.
         """
         server_params = StdioServerParameters(
             command=MCP_COMMAND,
             args=MCP_ARGS,
+            # The per-call subprocess gets the TRACE_* settings and the trace context.
+            env=subprocess_env(get_default_environment()),
         )
 
         try:
-            async with stdio_client(server_params) as (read, write):
-                async with ClientSession(read, write) as session:
-                    # Initialize MCP session
-                    await session.initialize()
-
-                    # Optional: sanity-check tools
-                    tools_response = await session.list_tools()
-                    print("MCP tools:", [t.name for t in tools_response.tools])
-
-                    result = await session.call_tool(
-                        "get_weather", arguments={"city": city}
-                    )
-
-                    # Prefer structuredContent (since fastmcp tool returns a dict)
-                    if result.structuredContent is not None:
-                        if isinstance(result.structuredContent, dict):
-                            return result.structuredContent  # type: ignore[return-value]
-
-                    # Fallback: parse first TextContent as JSON if available
-                    if result.content:
-                        first = result.content[0]
-                        if isinstance(first, types.TextContent):
-                            try:
-                                return json.loads(first.text)
-                            except Exception:
-                                return {"raw": first.text}
+            with span("tool get_weather", "tool", tool="get_weather", city=city), mcp_call("get_weather"):
+                async with asyncio.timeout(time_limit()), stdio_client(server_params) as (read, write):
+                    async with ClientSession(read, write) as session:
+                        # Initialize MCP session
+                        await session.initialize()
+
+                        # Optional: sanity-check tools
+                        tools_response = await session.list_tools()
+                        log.debug("MCP tools", tools=[t.name for t in tools_response.tools])
+
+                        result = await session.call_tool(
+                            "get_weather", arguments={"city": city}, meta=inject() or None
+                        )
+
+                        # Prefer structuredContent (since fastmcp tool returns a dict)
+                        if result.structuredContent is not None:
+                            if isinstance(result.structuredContent, dict):
+                                return result.structuredContent  # type: ignore[return-value]
+
+                        # Fallback: parse first TextContent as JSON if available
+                        if result.content:
+                            first = result.content[0]
+                            if isinstance(first, types.TextContent):
+                                try:
+                                    return json.loads(first.text)
+                                except Exception:
+                                    return {"raw": first.text}
 
         except Exception as e:
             # Fail gracefully; stylist can still give generic advice
-            print(f"[WeatherStylist] MCP weather error for city '{city}': {e}")
+            log.warning("MCP weather call failed", city=city, error=repr(e))
 
         return None
 
@@ -118,9 +135,7 @@ class WeatherStylistAgent:
             user_input = "Give a generic outfit recommendation for mild spring weather."
 
         city = self._extract_city(user_input)
-        print("**************************\n")
-        print("Calling MCP weather tool")
-        print("**************************\n")
+        log.info("calling MCP weather tool", city=city)
         weather_data = await self._get_weather_from_mcp(city)
 
         # Build a compact weather summary to give the model
@@ -155,13 +170,26 @@ class WeatherStylistAgent:
             else f"User question:\n{user_input}\n\nWeather summary:\n{weather_summary}"
         )
 
-        response = self._client.chat.completions.create(
-            model=DEFAULT_MODEL,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_content},
-            ],
-        )
+        partial = f"(No outfit advice could be written before the deadline.)\n{weather_summary}"
+        if not has_time(ADVICE_MIN_TIME):
+            return partial
+
+        try:
+            with span("llm stylist", "llm", model=DEFAULT_MODEL) as record:
+                response = await asyncio.wait_for(
+                    asyncio.to_thread(
+                        self._client.chat.completions.create,
+                        model=DEFAULT_MODEL,
+                        messages=[
+                            {"role": "system", "content": system_prompt},
+                            {"role": "user", "content": user_content},
+                        ],
+                    ),
+                    time_limit(),
+                )
+                record.set_usage(response)
+        except TimeoutError:
+            return partial
 
         content: Any = response.choices[0].message.content
 
@@ -187,6 +215,7 @@ class WeatherStylistAgentExecutor(AgentExecutor):
 
     def __init__(self) -> None:
         self.agent = WeatherStylistAgent()
+        self.running = RunningTasks()
 
     async def execute(
         self,
@@ -194,15 +223,33 @@ class WeatherStylistAgentExecutor(AgentExecutor):
         event_queue: EventQueue,
     ) -> None:
         user_input: str = context.get_user_input()  # type: ignore[assignment]
-        result_text = await self.agent.invoke(user_input)
-        await event_queue.enqueue_event(new_agent_text_message(result_text))
+        metadata = (context.message.metadata if context.message else None) or {}
+        # Run as an A2A task, so callers can cancel it (tasks/cancel) while it works.
+        task = context.current_task
+        if task is None:
+            task = new_task(context.message)
+            await event_queue.enqueue_event(task)
+        updater = TaskUpdater(event_queue, task.id, task.context_id)
+        await updater.start_work()
+
+        with deadline_scope(from_metadata(metadata)), server_span("weather_stylist.execute", metadata):
+            try:
+                async with self.running.track(task.id):
+                    result_text = await self.agent.invoke(user_input)
+            except Exception as e:
+                log.error("request failed", error=repr(e))
+                await updater.failed(updater.new_agent_message([Part(root=TextPart(text=f"Weather styling failed: {e}"))]))
+                return
+
+        await updater.add_artifact([Part(root=TextPart(text=result_text))], name="answer")
+        await updater.complete()
 
     async def cancel(
         self,
         context: RequestContext,
         event_queue: EventQueue,
     ) -> None:
-        raise Exception("Cancellation is not supported for this agent.")
+        await self.running.cancel(context, event_queue)
 
 
 # ---- AgentCard & skills definition -------------------------------------------------
@@ -241,7 +288,7 @@ public_agent_card = AgentCard(
 
 request_handler = DefaultRequestHandler(
     agent_executor=WeatherStylistAgentExecutor(),
-    task_store=InMemoryTaskStore(),
+    task_store=make_task_store("weather_stylist"),
 )
 
 _server_app_builder = A2AStarletteApplication(
@@ -250,6 +297,6 @@ _server_app_builder = A2AStarletteApplication(
 )
 
 # This is what uvicorn will run: `uv run uvicorn weather_stylist_agent:app --port 8080`
-app = _server_app_builder.build()
+app = instrument(_server_app_builder.build(), "weather_stylist")
 
 # uv run uvicorn weather_stylist_agent:app --port 8080
@@ -2,6 +2,8 @@ import json
 import aisuite as ai
 import re
 
+from agents.a2a_response import decode_response
+
 CLIENT = ai.Client()
 
 # ollama:gemma3:latest
@@ -10,20 +12,24 @@ CLIENT = ai.Client()
 # openai:gpt-4o-mini
 
 
-async def final_response(user_input: str, response: str, model: str = "ollama:gemma3:latest") -> str:
+async def final_response(user_input: str, response, model: str = "ollama:gemma3:latest", use_llm: bool = False) -> str:
         """
-        Use the LLM to decide whether to:
-        - search flights only
-        - search stays (Airbnb) only
-        - or both.
+        Turn the A2A response of the orchestrator into the final answer for the user.
 
-        Returns a dict like: {"flights": true/false, "stays": true/false}
+        The text and data parts are extracted deterministically from the
+        Message/Task/Artifact envelope. Set use_llm=True to additionally have
+        the LLM summarize the extracted content.
         """
+        text = decode_response(response).render()
+
+        if not use_llm:
+            return text
+
         routing_prompt = f"""
 
                 This was the user query: {user_input}
 
-                With the final response you have receieved here: {response}
+                With the final response you have receieved here: {text}
 
                 Summarize from this and send a response.
 
@@ -33,7 +39,7 @@ async def final_response(user_input: str, response: str, model: str = "ollama:ge
         completion = CLIENT.chat.completions.create(
             model=model,
             messages=[
-                {"role": "system", "content": "You decide routing for a travel assistant."},
+                {"role": "system", "content": "You summarize the answers of a travel assistant."},
                 {"role": "user", "content": routing_prompt},
             ],
         )
@@ -41,6 +47,6 @@ async def final_response(user_input: str, response: str, model: str = "ollama:ge
         content = completion.choices[0].message.content
 
 
-                
+
 
         return content
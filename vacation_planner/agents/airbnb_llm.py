@@ -1,21 +1,18 @@
-import json
-import aisuite as ai
-import re
+from typing import Any, Awaitable, Callable
 
-CLIENT = ai.Client()
+from agents.ranking import STAY_WEIGHTS, RankingWeights, rank_stay_results, ranked_items
+from agents.tool_loop import run_tool_loop
 
-async def airbnb_search_openai(user_input: str,tool_mapping: dict = {}, tool_defs: list = [], model: str = "openai:gpt-4o-mini") -> str: 
+SYSTEM_PROMPT = "You are an expert travel assistant."
 
-    ### START CODE HERE ###
-
-    # Define your prompt here. A multi-line f-string is typically used for this.
-    prompt = f"""
+PROMPT_TEMPLATE = """
 
 
                 User query: {user_input}
-                
+
                 You need to help the user with plan his stays and accomodations.
                 Use tools if required.
+                Search results come back already ranked, best first.
 
                 Make sure you give only atmost 5 findings.
                 And give your findings in a concise way.
@@ -23,100 +20,34 @@ async def airbnb_search_openai(user_input: str,tool_mapping: dict = {}, tool_def
 
                 """
 
-    ### END CODE HERE ###
-
-    max_turns = len(tool_mapping)+1
-
-    messages = [
-
-                {"role": "system", "content": "You are an expert travel assistant."},
-                {"role": "user", "content": prompt}
-                ]
-
-    for i in range(max_turns):
-
-        print(f"\n**********************************************************************************\n")
-
-        print(f"Attempt : {i+1}")
-    
-        # Get a response from the LLM by creating a chat with the client.
-        response = CLIENT.chat.completions.create(
-            model=model,
-            messages=messages,
-            tools = tool_defs,
-            temperature=1.0,
-        )
-
-        msg = response.choices[0].message
-
-        assistant_msg = {
-            "role": msg.role,
-            "content": msg.content or ""
-        }
-
-        # IMPORTANT: keep tool_calls if present
-        if getattr(msg, "tool_calls", None):
-            assistant_msg["tool_calls"] = [
-                {
-                    "id": tc.id,
-                    "type": tc.type,
-                    "function": {
-                        "name": tc.function.name,
-                        "arguments": tc.function.arguments,
-                    },
-                }
-                for tc in msg.tool_calls
-            ]
-
-        messages.append(assistant_msg)
-
-
-
-        if not msg.tool_calls:      
-            final_text = msg.content
-            print("✅ Final answer:")
-            print(final_text)
-            break
-
-        else:
-            print("Tool Calls Detected:")
-            print(msg.tool_calls)
-
-
-        for tool_call in msg.tool_calls:
-
-            tool_id = tool_call.id
-            tool_name = tool_call.function.name
-            tool_args = tool_call.function.arguments
-
-            args = json.loads(tool_args or "{}")  
-
-
-            print(f'Calling tool: {tool_name} with args: {tool_args}')
-
-            # tool_response = tool_mapping[tool_name](**args)
-
-            tool = tool_mapping[tool_name]
-
-            # 🔄 ASYNC EXECUTION
-            # if hasattr(tool, "ainvoke"):
-            #     tool_response = await tool.ainvoke(args)
-            # else:
-            #     tool_response = tool.invoke(args)
-
-            tool_response = await tool.coroutine(**args)
-
-            print(f'Tool response: {tool_response}')
-
-            messages.append(
-                {
-                    "role": "tool",
-                    "tool_call_id": tool_id,
-                    "tool_name": tool_name,         
-                    "content": str(tool_response)    
-                }
-            )
-
-
 
-    return final_text
+async def airbnb_search_openai(user_input: str,tool_mapping: dict = {}, tool_defs: list = [], model: str = "openai:gpt-4o-mini", prompt_template: str = PROMPT_TEMPLATE, weights: RankingWeights = STAY_WEIGHTS, top_k: int = 5, on_result: Callable[[dict, int], Awaitable[Any]] | None = None, **loop_options) -> str:
+    """
+    Runs the stays search tool loop. Extra keyword arguments (max_turns, token_budget,
+    max_tool_result_chars, should_stop, ...) are passed to run_tool_loop.
+
+    airbnb_search results are ranked locally (weights, top_k) and only the top_k
+    reach the model. on_result, if given, is awaited with each ranked stay and its rank
+    (1 = best of that search) as soon as a search has been scored, so callers can stream
+    results before the model answers.
+    """
+
+    async def rank_and_emit(text: str) -> str:
+        ranked = rank_stay_results(text, top_k=top_k, weights=weights)
+        if on_result is not None:
+            for rank, item in enumerate(ranked_items(ranked), 1):
+                await on_result(item, rank)
+        return ranked
+
+    hooks = {"airbnb_search": rank_and_emit}
+    result = await run_tool_loop(
+        prompt_template.format(user_input=user_input),
+        tool_mapping,
+        tool_defs,
+        model=model,
+        system_prompt=SYSTEM_PROMPT,
+        tool_result_hooks=hooks,
+        **loop_options,
+    )
+
+    return result.final_text
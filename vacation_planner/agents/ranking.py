@@ -0,0 +1,275 @@
+import heapq
+import json
+import math
+import os
+import re
+from dataclasses import asdict, dataclass, field, fields
+from typing import Any
+
+PRICE_PATTERN = re.compile(r"[$€£₹]\s?([\d,]+(?:\.\d+)?)")
+RATING_PATTERN = re.compile(r"([\d.]+)\s+out of 5(?:[^,]*,\s*([\d,]+)\s+review)?")
+
+
+@dataclass
+class RankingWeights:
+    """
+    Relative weight of each criterion; 0 disables it. Lower is better for price,
+    duration, stops and distance; higher is better for rating.
+    """
+    price: float = 0.0
+    duration: float = 0.0
+    stops: float = 0.0
+    rating: float = 0.0
+    distance: float = 0.0
+
+    @classmethod
+    def from_env(cls, name: str, default: "RankingWeights") -> "RankingWeights":
+        """
+        Override weights with a JSON object in an env var, e.g.
+        FLIGHT_RANK_WEIGHTS='{"price": 0.7, "stops": 0.3}'.
+        """
+        raw = os.getenv(name)
+        if not raw:
+            return default
+        overrides = json.loads(raw)
+        known = {f.name for f in fields(cls)}
+        return cls(**{k: float(v) for k, v in overrides.items() if k in known})
+
+
+FLIGHT_WEIGHTS = RankingWeights.from_env("FLIGHT_RANK_WEIGHTS", RankingWeights(price=0.5, duration=0.3, stops=0.2))
+STAY_WEIGHTS = RankingWeights.from_env("STAY_RANK_WEIGHTS", RankingWeights(price=0.5, rating=0.4, distance=0.1))
+
+
+@dataclass
+class FlightOption:
+    price: float | None = None
+    duration_min: int | None = None
+    stops: int | None = None
+    carrier: str | None = None
+    departure_time: str | None = None
+    arrival_time: str | None = None
+    flight_numbers: list[str] = field(default_factory=list)
+    score: float = 0.0
+
+
+@dataclass
+class StayOption:
+    id: str | None = None
+    name: str | None = None
+    url: str | None = None
+    price: float | None = None
+    price_label: str | None = None
+    rating: float | None = None
+    reviews: int | None = None
+    latitude: float | None = None
+    longitude: float | None = None
+    distance_km: float | None = None
+    badges: str | None = None
+    score: float = 0.0
+
+
+# criterion -> (record attribute, higher_is_better)
+CRITERIA = {
+    "price": ("price", False),
+    "duration": ("duration_min", False),
+    "stops": ("stops", False),
+    "rating": ("rating", True),
+    "distance": ("distance_km", False),
+}
+
+
+def _load_json(text: str) -> Any:
+    try:
+        return json.loads(text)
+    except (TypeError, ValueError):
+        return None
+
+
+def _number(value: Any) -> float | None:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _integer(value: Any) -> int | None:
+    try:
+        return int(float(value))
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+def parse_flights(text: str) -> list[FlightOption]:
+    """
+    Parse the (projected) flight_search JSON into FlightOption records.
+    """
+    payload = _load_json(text)
+    if isinstance(payload, dict):
+        payload = payload.get("flights", [])
+    if not isinstance(payload, list):
+        return []
+
+    options = []
+    for item in payload:
+        if not isinstance(item, dict):
+            continue
+        options.append(
+            FlightOption(
+                price=_number(item.get("price")),
+                duration_min=_integer(item.get("duration_min")),
+                stops=_integer(item.get("stops")),
+                carrier=item.get("carrier"),
+                departure_time=item.get("departure_time"),
+                arrival_time=item.get("arrival_time"),
+                flight_numbers=item.get("flight_numbers") or [],
+            )
+        )
+    return options
+
+
+def _dig(item: dict, *path: str) -> Any:
+    for key in path:
+        if not isinstance(item, dict):
+            return None
+        item = item.get(key)
+    return item
+
+
+def parse_stay(item: dict) -> StayOption:
+    """
+    Parse one listing of the Airbnb MCP server's airbnb_search result.
+    """
+    price_label = _dig(item, "structuredDisplayPrice", "primaryLine", "accessibilityLabel")
+    price_match = PRICE_PATTERN.search(price_label or "")
+    rating_match = RATING_PATTERN.search(item.get("avgRatingA11yLabel") or "")
+    name = _dig(item, "demandStayListing", "description", "name", "localizedStringWithTranslationPreference")
+
+    return StayOption(
+        id=str(item["id"]) if item.get("id") is not None else None,
+        name=name or _dig(item, "structuredContent", "primaryLine") or item.get("name"),
+        url=item.get("url"),
+        price=float(price_match.group(1).replace(",", "")) if price_match else None,
+        price_label=price_label,
+        rating=float(rating_match.group(1)) if rating_match else None,
+        reviews=int(rating_match.group(2).replace(",", "")) if rating_match and rating_match.group(2) else None,
+        latitude=_number(_dig(item, "demandStayListing", "location", "coordinate", "latitude")),
+        longitude=_number(_dig(item, "demandStayListing", "location", "coordinate", "longitude")),
+        badges=item.get("badges") or None,
+    )
+
+
+def parse_stays(text: str) -> list[StayOption]:
+    payload = _load_json(text)
+    if isinstance(payload, dict):
+        payload = payload.get("searchResults", [])
+    if not isinstance(payload, list):
+        return []
+    return [parse_stay(item) for item in payload if isinstance(item, dict)]
+
+
+def _haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 6371.0 * 2 * math.asin(math.sqrt(a))
+
+
+def set_distances(stays: list[StayOption], center: tuple[float, float] | None = None) -> None:
+    """
+    Distance of each stay from center, or from the centroid of the results
+    (a proxy for "central") when no center is given.
+    """
+    located = [s for s in stays if s.latitude is not None and s.longitude is not None]
+    if not located:
+        return
+    if center is None:
+        center = (
+            sum(s.latitude for s in located) / len(located),
+            sum(s.longitude for s in located) / len(located),
+        )
+    for stay in located:
+        stay.distance_km = round(_haversine_km(center[0], center[1], stay.latitude, stay.longitude), 2)
+
+
+def rank(records: list, weights: RankingWeights, top_k: int = 5) -> list:
+    """
+    Score records on the weighted criteria and return the top_k best, best first.
+
+    Each criterion is min-max normalized over the candidates to [0, 1] (1 = best);
+    a missing value counts as worst.
+    """
+    active = [(CRITERIA[name], w) for name, w in asdict(weights).items() if w > 0]
+    total_weight = sum(w for _, w in active) or 1.0
+
+    normalizers: list[tuple[str, bool, float, float, float]] = []
+    for (attr, higher_is_better), weight in active:
+        values = [getattr(r, attr) for r in records if getattr(r, attr) is not None]
+        if values:
+            normalizers.append((attr, higher_is_better, min(values), max(values), weight))
+
+    for record in records:
+        score = 0.0
+        for attr, higher_is_better, low, high, weight in normalizers:
+            value = getattr(record, attr)
+            if value is None:
+                continue
+            if high == low:
+                score += weight
+                continue
+            norm = (value - low) / (high - low)
+            score += weight * (norm if higher_is_better else 1.0 - norm)
+        record.score = round(score / total_weight, 4)
+
+    best = heapq.nlargest(top_k, enumerate(records), key=lambda pair: (pair[1].score, -pair[0]))
+    return [record for _, record in best]
+
+
+def _ranked_json(records: list, total: int, weights: RankingWeights) -> str:
+    return json.dumps(
+        {
+            "ranked_by": {k: v for k, v in asdict(weights).items() if v > 0},
+            "candidates": total,
+            "top": [
+                {k: v for k, v in asdict(r).items() if v not in (None, [], "") and k not in ("latitude", "longitude")}
+                for r in records
+            ],
+        },
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+
+
+def ranked_items(text: str) -> list[dict]:
+    """
+    The ranked records of a rank_*_results output, best first; [] for passed-through text.
+    """
+    payload = _load_json(text)
+    if not isinstance(payload, dict) or "ranked_by" not in payload:
+        return []
+    return payload.get("top") or []
+
+
+def rank_flight_results(text: str, top_k: int = 5, weights: RankingWeights = FLIGHT_WEIGHTS) -> str:
+    """
+    Tool-result hook for flight_search: pass only the top_k flights to the model.
+    Results that aren't a flight list (errors, price calendars) pass through unchanged.
+    """
+    flights = parse_flights(text)
+    if not flights:
+        return text
+    return _ranked_json(rank(flights, weights, top_k), len(flights), weights)
+
+
+def rank_stay_results(
+    text: str,
+    top_k: int = 5,
+    weights: RankingWeights = STAY_WEIGHTS,
+    center: tuple[float, float] | None = None,
+) -> str:
+    """
+    Tool-result hook for airbnb_search: pass only the top_k stays to the model.
+    """
+    stays = parse_stays(text)
+    if not stays:
+        return text
+    set_distances(stays, center)
+    return _ranked_json(rank(stays, weights, top_k), len(stays), weights)
@@ -1,8 +1,17 @@
+import asyncio
 import json
 import aisuite as ai
 import re
 
+from deadline import time_limit
+from structured_log import get_logger
+from tracing import span
+
 CLIENT = ai.Client()
+log = get_logger("routing")
+
+# Decision used when the routing model doesn't answer before the request deadline.
+FLIGHTS_ONLY = json.dumps({"flightAgent": True, "airbnbAgent": False})
 
 # ollama:gemma3:latest
 # ollama:qwen3:4b
@@ -18,6 +27,7 @@ async def routing(skills_mapping_str: str, user_input: str, model: str = "ollama
         - or both.
 
         Returns a dict like: {"flights": true/false, "stays": true/false}
+        Flights only when the model doesn't answer before the request deadline.
         """
         routing_prompt = f"""
                 You are a travel orchestration agent.
@@ -50,13 +60,23 @@ async def routing(skills_mapping_str: str, user_input: str, model: str = "ollama
                 }}
 """
 
-        completion = CLIENT.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": "You decide routing for a travel assistant."},
-                {"role": "user", "content": routing_prompt},
-            ],
-        )
+        try:
+            with span(f"llm {model}", "llm", model=model, purpose="routing") as record:
+                completion = await asyncio.wait_for(
+                    asyncio.to_thread(
+                        CLIENT.chat.completions.create,
+                        model=model,
+                        messages=[
+                            {"role": "system", "content": "You decide routing for a travel assistant."},
+                            {"role": "user", "content": routing_prompt},
+                        ],
+                    ),
+                    time_limit(),
+                )
+                record.set_usage(completion)
+        except TimeoutError:
+            log.warning("routing timed out, searching flights only")
+            return FLIGHTS_ONLY
 
         content = completion.choices[0].message.content
 
@@ -0,0 +1,81 @@
+from uuid import uuid4
+
+from a2a.server.agent_execution import RequestContext
+from a2a.server.events import EventQueue
+from a2a.server.tasks import TaskUpdater
+from a2a.types import Artifact, DataPart, Part, TextPart
+from a2a.utils import new_task
+
+
+async def start_task(context: RequestContext, event_queue: EventQueue) -> TaskUpdater:
+    """
+    Open (or continue) the A2A task for this request and mark it as working, so results
+    can be published as artifact updates while the agent is still running.
+    """
+    task = context.current_task
+    if task is None:
+        task = new_task(context.message)
+        await event_queue.enqueue_event(task)
+    updater = TaskUpdater(event_queue, task.id, task.context_id)
+    await updater.start_work()
+    return updater
+
+
+class ResultStream:
+    """
+    Publishes each ranked result as its own artifact the moment it is scored.
+
+    Result artifacts carry a DataPart with the ranked record and metadata
+    {"kind", "rank", "search", "source"}: rank is the position within one search's
+    ranking, search counts the searches of that kind. The final answer is a text
+    artifact named "answer".
+    """
+
+    def __init__(self, updater: TaskUpdater, source: str) -> None:
+        self.updater = updater
+        self.source = source
+        self.searches: dict[str, int] = {}
+
+    def emitter(self, kind: str):
+        """
+        Callback for the LLM wrappers' on_result.
+        """
+        async def emit(item: dict, rank: int) -> None:
+            # Rank 1 opens the next ranked batch (one per search).
+            if rank == 1:
+                self.searches[kind] = self.searches.get(kind, 0) + 1
+            search = self.searches[kind]
+            await self.updater.add_artifact(
+                [Part(root=DataPart(data=item))],
+                artifact_id=uuid4().hex,
+                name=f"{kind}-{search}-{rank}" if search > 1 else f"{kind}-{rank}",
+                metadata={"kind": kind, "rank": rank, "search": search, "source": self.source},
+            )
+
+        return emit
+
+    async def relay(self, artifact: Artifact) -> None:
+        """
+        Re-publish a downstream agent's result artifact through this task's stream.
+        """
+        await self.updater.add_artifact(
+            artifact.parts,
+            artifact_id=uuid4().hex,
+            name=artifact.name,
+            metadata=artifact.metadata,
+        )
+
+    async def answer(self, text: str) -> None:
+        await self.updater.add_artifact(
+            [Part(root=TextPart(text=text))],
+            artifact_id=uuid4().hex,
+            name="answer",
+        )
+        await self.updater.complete()
+
+    async def fail(self, text: str) -> None:
+        await self.updater.failed(self.updater.new_agent_message([Part(root=TextPart(text=text))]))
+
+
+def is_result_artifact(artifact: Artifact) -> bool:
+    return bool(artifact.metadata and artifact.metadata.get("kind")) and artifact.name != "answer"
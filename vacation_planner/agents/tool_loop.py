@@ -0,0 +1,407 @@
+import asyncio
+import inspect
+import json
+import os
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+import aisuite as ai
+
+from agents.context_manager import ContextManager, estimate_messages_tokens, estimate_tokens
+from deadline import has_time, time_limit
+from structured_log import get_logger
+from tracing import span
+
+CLIENT = ai.Client()
+log = get_logger("tool_loop")
+
+DEFAULT_SYSTEM_PROMPT = "You are a helpful assistant."
+
+# Sent as a last, tool-less turn when the loop runs out of turns or is stopped early,
+# so the caller always gets an answer built from whatever the tools returned.
+FINALIZE_PROMPT = (
+    "You have run out of tool calls. "
+    "Answer the original request now using only the information gathered so far."
+)
+
+NO_ANSWER_TEXT = "The assistant could not produce an answer within its turn/token budget."
+
+PARTIAL_ANSWER_HEADER = "Partial results (the request deadline was reached before a final answer):"
+
+# With a request deadline (see deadline.py), no new tool turn starts once less than this
+# many seconds are left; the time is kept for the final answer turn.
+FINALIZE_RESERVE = float(os.getenv("TOOL_LOOP_FINALIZE_RESERVE", "10"))
+# Below this, even the final answer turn is skipped and partial results are returned.
+MIN_FINALIZE_TIME = 2.0
+
+# Set to a directory to dump every finished session (full, uncompacted history) as JSON,
+# e.g. for bench_context.py.
+RECORD_DIR = os.getenv("TOOL_LOOP_RECORD_DIR", "")
+
+
+@dataclass
+class TurnMetrics:
+    turn: int
+    llm_latency: float = 0.0
+    tool_latency: float = 0.0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    tool_calls: list[str] = field(default_factory=list)
+
+    def __str__(self) -> str:
+        return (
+            f"turn={self.turn} llm={self.llm_latency:.2f}s tool={self.tool_latency:.2f}s "
+            f"prompt_tokens={self.prompt_tokens} completion_tokens={self.completion_tokens} "
+            f"tools={self.tool_calls}"
+        )
+
+
+@dataclass
+class ToolLoopResult:
+    final_text: str
+    stop_reason: str
+    turns: list[TurnMetrics]
+    messages: list[dict]
+    compacted_results: int = 0
+
+    @property
+    def prompt_tokens(self) -> int:
+        return sum(t.prompt_tokens for t in self.turns)
+
+    @property
+    def completion_tokens(self) -> int:
+        return sum(t.completion_tokens for t in self.turns)
+
+    @property
+    def llm_latency(self) -> float:
+        return sum(t.llm_latency for t in self.turns)
+
+    @property
+    def tool_latency(self) -> float:
+        return sum(t.tool_latency for t in self.turns)
+
+    def summary(self) -> str:
+        return (
+            f"turns={len(self.turns)} stop={self.stop_reason} "
+            f"llm={self.llm_latency:.2f}s tool={self.tool_latency:.2f}s "
+            f"prompt_tokens={self.prompt_tokens} completion_tokens={self.completion_tokens} "
+            f"compacted_results={self.compacted_results}"
+        )
+
+
+def tool_output_text(tool_response: Any) -> str:
+    """
+    Flatten a tool response into the text that goes back to the model.
+
+    LangChain MCP tools return a (content, artifact) tuple where content is a str
+    or a list of str; plain callables may return anything.
+    """
+    if isinstance(tool_response, tuple) and len(tool_response) == 2:
+        tool_response = tool_response[0]
+    if isinstance(tool_response, list) and all(isinstance(part, str) for part in tool_response):
+        return "\n".join(tool_response)
+    if isinstance(tool_response, (dict, list)):
+        return json.dumps(tool_response, default=str)
+    return str(tool_response)
+
+
+def truncate_text(text: str, max_chars: int | None) -> str:
+    if max_chars is None or len(text) <= max_chars:
+        return text
+    dropped = len(text) - max_chars
+    return text[:max_chars] + f"\n...[truncated {dropped} chars]"
+
+
+async def call_tool(tool: Any, args: dict) -> Any:
+    """
+    Execute a tool from a tool mapping.
+
+    Supports LangChain StructuredTools (coroutine / ainvoke) as well as plain
+    sync or async callables, so wrappers (caches, fan-out helpers) can sit in the mapping.
+    """
+    if getattr(tool, "coroutine", None) is not None:
+        return await tool.coroutine(**args)
+    if hasattr(tool, "ainvoke"):
+        return await tool.ainvoke(args)
+    result = tool(**args)
+    if inspect.isawaitable(result):
+        result = await result
+    return result
+
+
+def _assistant_message(msg: Any) -> dict:
+    assistant_msg = {
+        "role": msg.role,
+        "content": msg.content or "",
+    }
+
+    # IMPORTANT: keep tool_calls if present
+    if getattr(msg, "tool_calls", None):
+        assistant_msg["tool_calls"] = [
+            {
+                "id": tc.id,
+                "type": tc.type,
+                "function": {
+                    "name": tc.function.name,
+                    "arguments": tc.function.arguments,
+                },
+            }
+            for tc in msg.tool_calls
+        ]
+    return assistant_msg
+
+
+def record_session(result: "ToolLoopResult", model: str, record_dir: str) -> str:
+    """
+    Write a finished session to record_dir and return the file path.
+    """
+    os.makedirs(record_dir, exist_ok=True)
+    path = os.path.join(record_dir, f"session-{int(time.time())}-{uuid.uuid4().hex[:8]}.json")
+    with open(path, "w") as f:
+        json.dump(
+            {
+                "model": model,
+                "stop_reason": result.stop_reason,
+                "turns": [vars(t) for t in result.turns],
+                "messages": result.messages,
+            },
+            f,
+            default=str,
+        )
+    return path
+
+
+async def _complete(client: Any, metrics: TurnMetrics, messages: list[dict], **kwargs: Any) -> Any:
+    """
+    Run one (blocking) chat completion off the event loop and record latency and tokens.
+    """
+    started = time.perf_counter()
+    with span(f"llm {kwargs.get('model')}", "llm", model=kwargs.get("model"), turn=metrics.turn) as record:
+        try:
+            # The worker thread can't be stopped; on timeout its result is abandoned.
+            response = await asyncio.wait_for(
+                asyncio.to_thread(client.chat.completions.create, messages=messages, **kwargs), time_limit()
+            )
+        finally:
+            metrics.llm_latency += time.perf_counter() - started
+
+        msg = response.choices[0].message
+        usage = getattr(response, "usage", None)
+        prompt_tokens = getattr(usage, "prompt_tokens", None) or estimate_messages_tokens(messages)
+        completion_tokens = getattr(usage, "completion_tokens", None) or estimate_tokens(msg.content or "")
+        record.set(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+    metrics.prompt_tokens += prompt_tokens
+    metrics.completion_tokens += completion_tokens
+    return msg
+
+
+def _log_turn(metrics: TurnMetrics) -> None:
+    log.info(
+        "turn finished",
+        turn=metrics.turn,
+        llm_s=round(metrics.llm_latency, 2),
+        tool_s=round(metrics.tool_latency, 2),
+        prompt_tokens=metrics.prompt_tokens,
+        completion_tokens=metrics.completion_tokens,
+        tools=metrics.tool_calls,
+    )
+
+
+def partial_answer(messages: list[dict]) -> str | None:
+    """
+    What the loop can return when the deadline leaves no time for a final answer turn:
+    the last thing the model said, else the tool results gathered so far.
+    """
+    said = next((m["content"] for m in reversed(messages) if m["role"] == "assistant" and m["content"]), None)
+    if said:
+        return said
+    results = [f"[{m.get('tool_name')}] {m['content']}" for m in messages if m["role"] == "tool"]
+    return "\n\n".join([PARTIAL_ANSWER_HEADER, *results]) if results else None
+
+
+async def run_tool_loop(
+    prompt: str,
+    tool_mapping: dict | None = None,
+    tool_defs: list | None = None,
+    model: str = "openai:gpt-4o-mini",
+    system_prompt: str = DEFAULT_SYSTEM_PROMPT,
+    max_turns: int | None = None,
+    token_budget: int | None = None,
+    max_tool_result_chars: int | None = 8000,
+    should_stop: Callable[[TurnMetrics, list[dict]], bool] | None = None,
+    tool_result_hooks: dict[str, Callable[[str], Any]] | None = None,
+    temperature: float = 1.0,
+    context_budget: int | None = 6000,
+    keep_recent_turns: int = 2,
+    context_manager: ContextManager | None = None,
+    client: Any = None,
+    record_dir: str | None = None,
+) -> ToolLoopResult:
+    """
+    Agentic tool loop: ask the model, run the tools it calls, feed the results back,
+    until it answers without tool calls or a budget is hit.
+
+    - max_turns: LLM turns that may call tools (defaults to len(tool_mapping) + 1).
+    - token_budget: stop calling tools once prompt + completion tokens exceed this.
+    - max_tool_result_chars: truncate each tool result before it enters the history.
+    - should_stop(turn_metrics, messages): return True to stop early after a turn.
+    - tool_result_hooks: {tool_name: hook(text) -> text} (sync or async) to post-process
+      a tool's result before it enters the history, e.g. local ranking.
+    - context_budget / keep_recent_turns: compact old tool results once the prompt
+      estimate exceeds the budget (see ContextManager); pass context_manager to customise.
+
+    When the loop stops before the model answered, one final tool-less turn asks for
+    an answer from what was gathered, so final_text is always set.
+
+    Under a request deadline (deadline.py) every LLM and tool call is bounded by the time
+    left, no tool turn starts within FINALIZE_RESERVE seconds of it, and when even the final
+    turn can't make it the loop returns partial results (stop_reason "deadline").
+    """
+    tool_mapping = tool_mapping or {}
+    tool_defs = tool_defs or []
+    tool_result_hooks = tool_result_hooks or {}
+    client = client or CLIENT
+    if max_turns is None:
+        max_turns = len(tool_mapping) + 1
+    if context_manager is None:
+        context_manager = ContextManager(context_budget, keep_recent_turns)
+    record_dir = RECORD_DIR if record_dir is None else record_dir
+
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": prompt},
+    ]
+    turns: list[TurnMetrics] = []
+    final_text = None
+    stop_reason = "max_turns"
+
+    def tokens_used() -> int:
+        return sum(t.prompt_tokens + t.completion_tokens for t in turns)
+
+    for i in range(max_turns):
+
+        if not has_time(FINALIZE_RESERVE):
+            stop_reason = "deadline"
+            break
+
+        metrics = TurnMetrics(turn=i + 1)
+        turns.append(metrics)
+
+        try:
+            msg = await _complete(
+                client, metrics, context_manager.view(messages), model=model, tools=tool_defs, temperature=temperature
+            )
+        except TimeoutError:
+            stop_reason = "deadline"
+            break
+        messages.append(_assistant_message(msg))
+
+        if not msg.tool_calls:
+            final_text = msg.content
+            stop_reason = "final_answer"
+            _log_turn(metrics)
+            break
+
+        for tool_call in msg.tool_calls:
+
+            tool_id = tool_call.id
+            tool_name = tool_call.function.name
+            tool_args = tool_call.function.arguments
+            metrics.tool_calls.append(tool_name)
+
+            log.debug("tool call", turn=metrics.turn, tool=tool_name, args=tool_args)
+
+            started = time.perf_counter()
+            try:
+                if tool_name not in tool_mapping:
+                    raise ValueError(f"unknown tool '{tool_name}'")
+                args = json.loads(tool_args or "{}")
+                with span(f"tool {tool_name}", "tool", tool=tool_name):
+                    content = tool_output_text(
+                        await asyncio.wait_for(call_tool(tool_mapping[tool_name], args), time_limit())
+                    )
+                if tool_name in tool_result_hooks:
+                    content = tool_result_hooks[tool_name](content)
+                    if inspect.isawaitable(content):
+                        content = await content
+            except TimeoutError:
+                content = "Tool error: no result before the request deadline"
+            except Exception as e:
+                content = f"Tool error: {e}"
+            metrics.tool_latency += time.perf_counter() - started
+
+            content = truncate_text(content, max_tool_result_chars)
+
+            log.debug("tool response", turn=metrics.turn, tool=tool_name, chars=len(content), response=content)
+
+            messages.append(
+                {
+                    "role": "tool",
+                    "tool_call_id": tool_id,
+                    "tool_name": tool_name,
+                    "content": content,
+                }
+            )
+
+        _log_turn(metrics)
+
+        if token_budget is not None and tokens_used() >= token_budget:
+            stop_reason = "token_budget"
+            break
+
+        if should_stop is not None and should_stop(metrics, messages):
+            stop_reason = "early_stop"
+            break
+
+    if final_text is None:
+        if has_time(MIN_FINALIZE_TIME) and (token_budget is None or tokens_used() < token_budget):
+            metrics = TurnMetrics(turn=len(turns) + 1)
+            turns.append(metrics)
+            messages.append({"role": "user", "content": FINALIZE_PROMPT})
+            try:
+                msg = await _complete(
+                    client, metrics, context_manager.view(messages), model=model, temperature=temperature
+                )
+                messages.append(_assistant_message(msg))
+                final_text = msg.content
+            except TimeoutError:
+                stop_reason = "deadline"
+                final_text = partial_answer(messages)
+        elif stop_reason == "deadline" or not has_time(MIN_FINALIZE_TIME):
+            stop_reason = "deadline"
+            final_text = partial_answer(messages)
+        else:
+            final_text = next(
+                (m["content"] for m in reversed(messages) if m["role"] == "assistant" and m["content"]),
+                None,
+            )
+
+    final_text = final_text or NO_ANSWER_TEXT
+
+    log.debug("final answer", answer=final_text)
+
+    result = ToolLoopResult(
+        final_text=final_text,
+        stop_reason=stop_reason,
+        turns=turns,
+        messages=messages,
+        compacted_results=context_manager.compacted_count,
+    )
+    log.info(
+        "tool loop finished",
+        model=model,
+        turns=len(turns),
+        stop_reason=stop_reason,
+        llm_s=round(result.llm_latency, 2),
+        tool_s=round(result.tool_latency, 2),
+        prompt_tokens=result.prompt_tokens,
+        completion_tokens=result.completion_tokens,
+        compacted_results=result.compacted_results,
+    )
+
+    if record_dir:
+        log.info("session recorded", path=record_session(result, model, record_dir))
+
+    return result
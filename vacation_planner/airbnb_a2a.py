@@ -1,4 +1,5 @@
 import json
+import os
 from pathlib import Path
 from typing import Any
 
@@ -6,15 +7,12 @@ import asyncio
 from uuid import uuid4
 import httpx
 
-from langchain_mcp_adapters.client import MultiServerMCPClient
 
 from a2a.server.agent_execution import AgentExecutor, RequestContext
 from a2a.server.events import EventQueue
 from a2a.server.request_handlers import DefaultRequestHandler
-from a2a.server.tasks import InMemoryTaskStore
 from a2a.server.apps import A2AStarletteApplication
 from a2a.types import AgentCapabilities, AgentCard, AgentSkill
-from a2a.utils import new_agent_text_message
 
 from dotenv import load_dotenv
 import aisuite as ai
@@ -22,6 +20,33 @@ import aisuite as ai
 load_dotenv()
 
 import agents.airbnb_llm
+from agents.ranking import parse_stay
+from agents.streaming import ResultStream, start_task
+from agents.tool_loop import call_tool, tool_output_text
+from cancellation import RunningTasks
+from deadline import deadline_scope, from_metadata, has_time
+from mcp_pool import McpServerPool
+from metrics import instrument, watch_caches
+from sqlite_task_store import make_task_store
+from structured_log import get_logger
+from tracing import server_span, set_service
+from ttl_cache import TTLCache
+
+set_service("airbnb")
+log = get_logger("airbnb")
+
+# Search results for the same location / dates / guests are reused for this long.
+AIRBNB_SEARCH_TTL = float(os.getenv("AIRBNB_SEARCH_TTL", "600"))
+# Listing details change rarely; keep them much longer.
+AIRBNB_LISTING_TTL = float(os.getenv("AIRBNB_LISTING_TTL", "21600"))
+# Upper bound on result pages fetched to fill the ranked top-K.
+AIRBNB_MAX_PAGES = int(os.getenv("AIRBNB_MAX_PAGES", "3"))
+# Under a request deadline, another result page is only fetched with this many seconds left.
+AIRBNB_PAGE_TIME = float(os.getenv("AIRBNB_PAGE_TIME", "15"))
+STAY_TOP_K = 5
+
+# Arguments that don't change the result set.
+IGNORED_ARGS = ("ignoreRobotsText",)
 
 
 def load_mcp_config(config_path: str = "config.json"):
@@ -32,19 +57,126 @@ def load_mcp_config(config_path: str = "config.json"):
     return servers
 
 
+def cache_key(args: dict) -> str:
+    """
+    Normalize tool arguments so equivalent requests ("Paris" / " paris ") share one entry.
+    """
+    normalized = {}
+    for key, value in args.items():
+        if key in IGNORED_ARGS or value is None or str(value).strip() == "":
+            continue
+        normalized[key] = str(value).strip().lower() if key == "location" else value
+    return json.dumps(normalized, sort_keys=True, default=str)
+
+
+def _load_json(text: str) -> Any:
+    try:
+        return json.loads(text)
+    except ValueError:
+        return None
+
+
+class CachedListingTool:
+    """
+    airbnb_listing_details behind a long-TTL cache keyed by listing id, dates and guests.
+    Exposes .coroutine so it drops into a tool mapping in place of the MCP tool.
+    """
+
+    def __init__(self, tool: Any, cache: TTLCache) -> None:
+        self.name = tool.name
+        self._tool = tool
+        self._cache = cache
+
+    async def coroutine(self, **args: Any) -> str:
+        key = cache_key(args)
+
+        async def load() -> str:
+            return tool_output_text(await call_tool(self._tool, args))
+
+        text = await self._cache.get_or_load(key, load)
+        payload = _load_json(text)
+        if not isinstance(payload, dict) or "error" in payload:
+            # Don't keep failures around for hours.
+            self._cache.invalidate(key)
+        return text
+
+
+class CachedSearchTool:
+    """
+    airbnb_search behind a TTL/LRU cache keyed by location, dates and guests (one entry
+    per result page).
+
+    A search without an explicit cursor pages incrementally: further pages are fetched
+    only while fewer than top_k priced stays are available to rank, up to max_pages,
+    and while the request deadline leaves time for them.
+    """
+
+    def __init__(self, tool: Any, cache: TTLCache, top_k: int = STAY_TOP_K, max_pages: int = AIRBNB_MAX_PAGES) -> None:
+        self.name = tool.name
+        self._tool = tool
+        self._cache = cache
+        self.top_k = top_k
+        self.max_pages = max_pages
+
+    async def _page(self, args: dict) -> tuple[dict | None, str]:
+        key = cache_key(args)
+
+        async def load() -> str:
+            return tool_output_text(await call_tool(self._tool, args))
+
+        text = await self._cache.get_or_load(key, load)
+        payload = _load_json(text)
+        if not isinstance(payload, dict) or "searchResults" not in payload:
+            # Errors go back to the model as-is, but aren't cached.
+            self._cache.invalidate(key)
+            return None, text
+        return payload, text
+
+    async def coroutine(self, **args: Any) -> str:
+        first, text = await self._page(args)
+        if first is None or args.get("cursor"):
+            return text
+
+        results = list(first.get("searchResults") or [])
+        pagination = first.get("paginationInfo") or {}
+        pages = 1
+        while pages < self.max_pages and pagination.get("nextPageCursor"):
+            priced = [stay for stay in map(parse_stay, results) if stay.price is not None]
+            if len(priced) >= self.top_k or not has_time(AIRBNB_PAGE_TIME):
+                break
+            page, _ = await self._page({**args, "cursor": pagination["nextPageCursor"]})
+            if page is None:
+                break
+            results.extend(page.get("searchResults") or [])
+            pagination = page.get("paginationInfo") or {}
+            pages += 1
+
+        if pages == 1:
+            return text
+        log.info("search pages merged", location=args.get("location"), results=len(results), pages=pages)
+        return json.dumps({**first, "searchResults": results, "paginationInfo": pagination})
+
+
 class AirBnbAgent:
     def __init__(self) -> None:
-        self._mcp_client = MultiServerMCPClient(load_mcp_config("airbnb_config.json"))
+        self.mcp_pool = McpServerPool(load_mcp_config("airbnb_config.json"))
         self._llm_client = ai.Client()
         self._model = "ollama:gemma3:latest"
-        self._tools = None
+        self.search_cache = TTLCache(maxsize=256, ttl=AIRBNB_SEARCH_TTL, name="airbnb_search")
+        self.listing_cache = TTLCache(maxsize=1024, ttl=AIRBNB_LISTING_TTL, name="airbnb_listing_details")
+
+    def _cached_tools(self, tool_mapping: dict) -> dict:
+        mapping = dict(tool_mapping)
+        if "airbnb_search" in mapping:
+            mapping["airbnb_search"] = CachedSearchTool(mapping["airbnb_search"], self.search_cache, top_k=STAY_TOP_K)
+        if "airbnb_listing_details" in mapping:
+            mapping["airbnb_listing_details"] = CachedListingTool(mapping["airbnb_listing_details"], self.listing_cache)
+        return mapping
 
     async def _ensure_tools(self):
-        if self._tools is None:
-            self._tools = await self._mcp_client.get_tools()
-        return self._tools
+        return await self.mcp_pool.get_tools()
 
-    async def invoke(self, user_input: str) -> str:
+    async def invoke(self, user_input: str, on_result=None) -> str:
         tools = await self._ensure_tools()
 
         if tools:
@@ -52,17 +184,19 @@ class AirBnbAgent:
             import tool_def_maker
 
             tool_def = [tool_def_maker.lc_tool_to_openai_def(t) for t in tools]
-            tool_mapping = tool_def_maker.build_tool_mapping(tools,tool_def)
+            tool_mapping = self._cached_tools(tool_def_maker.build_tool_mapping(tools,tool_def))
 
 
-        airbnbResponse = await agents.airbnb_llm.airbnb_search_openai(user_input,tool_mapping,tool_def)
-        
+        airbnbResponse = await agents.airbnb_llm.airbnb_search_openai(user_input,tool_mapping,tool_def,top_k=STAY_TOP_K,on_result=on_result)
+        log.debug("cache stats", search=self.search_cache.stats(), listing=self.listing_cache.stats())
+
         return airbnbResponse
 
 
 class AirBnbAgentExecutor(AgentExecutor):
     def __init__(self) -> None:
         self.agent = AirBnbAgent()
+        self.running = RunningTasks()
 
     async def execute(
         self,
@@ -70,11 +204,22 @@ class AirBnbAgentExecutor(AgentExecutor):
         event_queue: EventQueue,
     ) -> None:
         user_input: str = context.get_user_input()  # type: ignore[assignment]
-        result = await self.agent.invoke(user_input)
-        await event_queue.enqueue_event(new_agent_text_message(result))
+        metadata = (context.message.metadata if context.message else None) or {}
+        # Ranked stays are streamed as artifacts while the model writes its answer.
+        stream = ResultStream(await start_task(context, event_queue), source="airbnb")
+        with deadline_scope(from_metadata(metadata)), server_span("airbnb.execute", metadata):
+            try:
+                async with self.running.track(stream.updater.task_id):
+                    result = await self.agent.invoke(user_input, on_result=stream.emitter("stay"))
+            except Exception as e:
+                # A task left "working" would be polled until the caller's deadline.
+                log.error("stays search failed", error=repr(e))
+                await stream.fail(f"Stays search failed: {e}")
+                return
+        await stream.answer(result)
 
     async def cancel(self, context: RequestContext, event_queue: EventQueue) -> None:
-        raise Exception("Cancellation not supported")    
+        await self.running.cancel(context, event_queue)
 
 external_skill = AgentSkill(
     id="airbnb_agent",
@@ -95,9 +240,11 @@ external_card = AgentCard(
     supportsAuthenticatedExtendedCard=False,
 )
 
+agent_executor = AirBnbAgentExecutor()
+
 request_handler = DefaultRequestHandler(
-    agent_executor=AirBnbAgentExecutor(),
-    task_store=InMemoryTaskStore(),
+    agent_executor=agent_executor,
+    task_store=make_task_store("airbnb"),
 )
 
 app_builder = A2AStarletteApplication(
@@ -106,4 +253,10 @@ app_builder = A2AStarletteApplication(
 )
 
 # uv run uvicorn airbnb_a2a:app --port 8090
-app = app_builder.build()
+# The lifespan launches the Airbnb MCP server (npx) once at startup and keeps it resident.
+app = app_builder.build(
+    lifespan=agent_executor.agent.mcp_pool.lifespan,
+    routes=[agent_executor.agent.mcp_pool.route()],
+)
+instrument(app, "airbnb")
+watch_caches(agent_executor.agent.search_cache, agent_executor.agent.listing_cache)
@@ -0,0 +1,60 @@
+import argparse
+import glob
+import json
+
+from agents.context_manager import ContextManager
+
+# Replays sessions recorded with TOOL_LOOP_RECORD_DIR and compares the prompt bytes
+# sent on every LLM turn with and without context compaction.
+#
+# TOOL_LOOP_RECORD_DIR=sessions uv run uvicorn airbnb_a2a:app --port 8090
+# uv run python bench_context.py "sessions/*.json"
+
+
+def replay(messages: list[dict], manager: ContextManager | None) -> int:
+    """
+    Total prompt bytes over all LLM calls of a session.
+    Every assistant message was produced from the history that precedes it.
+    """
+    total = 0
+    for index, message in enumerate(messages):
+        if message["role"] != "assistant":
+            continue
+        prompt = messages[:index]
+        if manager is not None:
+            prompt = manager.view(prompt)
+        total += len(json.dumps(prompt, ensure_ascii=False))
+    return total
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure prompt-size reduction from context compaction.")
+    parser.add_argument("pattern", help="glob of recorded session files")
+    parser.add_argument("--budget", type=int, default=6000, help="context token budget")
+    parser.add_argument("--keep-recent-turns", type=int, default=2)
+    args = parser.parse_args()
+
+    raw_total = compacted_total = 0
+    for path in sorted(glob.glob(args.pattern)):
+        with open(path) as f:
+            messages = json.load(f)["messages"]
+
+        raw = replay(messages, None)
+        compacted = replay(messages, ContextManager(args.budget, args.keep_recent_turns))
+        raw_total += raw
+        compacted_total += compacted
+
+        saved = 100 * (1 - compacted / raw) if raw else 0.0
+        print(f"{path}: raw={raw:,}B compacted={compacted:,}B saved={saved:.1f}%")
+
+    if raw_total:
+        print(
+            f"TOTAL: raw={raw_total:,}B compacted={compacted_total:,}B "
+            f"saved={100 * (1 - compacted_total / raw_total):.1f}%"
+        )
+    else:
+        print("No recorded sessions found.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import argparse
+import asyncio
+import gc
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+from uuid import uuid4
+
+from a2a.server.tasks import InMemoryTaskStore
+from a2a.types import Artifact, Message, Part, Role, Task, TaskState, TaskStatus, TextPart
+
+from sqlite_task_store import SqliteTaskStore
+
+# Compares the in-memory and SQLite task stores on a synthetic workload: every task
+# is saved once per status update (as DefaultRequestHandler does) and read back once.
+# Reports Python heap growth and save/get latency percentiles.
+#
+# uv run python bench_task_store.py --tasks 2000 --updates 5
+
+
+def make_task(history: int, artifact_chars: int) -> Task:
+    context_id = uuid4().hex
+    messages = [
+        Message(
+            role=Role.user if i % 2 == 0 else Role.agent,
+            parts=[Part(root=TextPart(text=f"message {i} " + "lorem ipsum " * 40))],
+            message_id=uuid4().hex,
+            context_id=context_id,
+        )
+        for i in range(history)
+    ]
+    return Task(
+        id=uuid4().hex,
+        context_id=context_id,
+        status=TaskStatus(state=TaskState.working),
+        history=messages,
+        artifacts=[Artifact(artifact_id=uuid4().hex, parts=[Part(root=TextPart(text="x" * artifact_chars))])],
+    )
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def run(label: str, store, tasks: int, updates: int, history: int, artifact_chars: int) -> None:
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+
+    save_ms: list[float] = []
+    get_ms: list[float] = []
+    for _ in range(tasks):
+        task = make_task(history, artifact_chars)
+        for _ in range(updates):
+            started = time.perf_counter()
+            await store.save(task)
+            save_ms.append((time.perf_counter() - started) * 1000)
+        started = time.perf_counter()
+        await store.get(task.id)
+        get_ms.append((time.perf_counter() - started) * 1000)
+        del task
+
+    gc.collect()
+    growth = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+
+    print(
+        f"{label:<8} heap_growth={growth / 1e6:7.1f}MB  "
+        f"save p50={statistics.median(save_ms):6.3f}ms p99={percentile(save_ms, 99):6.3f}ms  "
+        f"get p50={statistics.median(get_ms):6.3f}ms p99={percentile(get_ms, 99):6.3f}ms"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark InMemoryTaskStore vs SqliteTaskStore.")
+    parser.add_argument("--tasks", type=int, default=2000)
+    parser.add_argument("--updates", type=int, default=5, help="saves per task")
+    parser.add_argument("--history", type=int, default=40, help="messages per task history")
+    parser.add_argument("--artifact-chars", type=int, default=4000)
+    args = parser.parse_args()
+    workload = (args.tasks, args.updates, args.history, args.artifact_chars)
+
+    await run("memory", InMemoryTaskStore(), *workload)
+
+    path = os.path.join(tempfile.mkdtemp(prefix="bench_tasks_"), "tasks.db")
+    store = SqliteTaskStore(path)
+    await run("sqlite", store, *workload)
+    print(f"sqlite file: {os.path.getsize(path) / 1e6:.1f}MB for {store.count()} tasks")
+    store.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -6,15 +6,12 @@ import asyncio
 from uuid import uuid4
 import httpx
 
-from langchain_mcp_adapters.client import MultiServerMCPClient
 
 from a2a.server.agent_execution import AgentExecutor, RequestContext
 from a2a.server.events import EventQueue
 from a2a.server.request_handlers import DefaultRequestHandler
-from a2a.server.tasks import InMemoryTaskStore
 from a2a.server.apps import A2AStarletteApplication
 from a2a.types import AgentCapabilities, AgentCard, AgentSkill
-from a2a.utils import new_agent_text_message
 
 from dotenv import load_dotenv
 import aisuite as ai
@@ -23,9 +20,27 @@ load_dotenv()
 
 
 from a2a.client import A2ACardResolver, A2AClient
-from a2a.types import MessageSendParams, SendMessageRequest
+from a2a.types import (
+    CancelTaskRequest,
+    MessageSendParams,
+    SendStreamingMessageRequest,
+    TaskArtifactUpdateEvent,
+    TaskIdParams,
+)
 
 import agents.routing, agents.flight_llm
+from agents.a2a_response import A2AContent, decode_response
+from agents.streaming import ResultStream, is_result_artifact, start_task
+from cancellation import A2A_CANCEL_TIMEOUT, RunningTasks, cancel_downstream
+from deadline import deadline_scope, downstream_metadata, from_metadata, time_limit
+from mcp_pool import McpServerPool
+from metrics import instrument
+from sqlite_task_store import make_task_store
+from structured_log import get_logger
+from tracing import inject, server_span, set_service, span, traced_client
+
+set_service("flights")
+log = get_logger("flights")
 
 BASE_URL = "http://localhost:8090"
 
@@ -33,7 +48,7 @@ BASE_URL = "http://localhost:8090"
 
 class FlightAgent:
     def __init__(self) -> None:
-        self._mcp_client = MultiServerMCPClient(
+        self.mcp_pool = McpServerPool(
             {
                 "flights": {
                     "command": "python",
@@ -44,18 +59,76 @@ class FlightAgent:
                                                 )
         self._llm_client = ai.Client()
         self._model = "ollama:gemma3:latest"
-        self._tools = None
 
     async def _ensure_tools(self):
-        if self._tools is None:
-            self._tools = await self._mcp_client.get_tools()
-        return self._tools
-
-    async def invoke(self, user_input: str) -> str:
-
-
-
-        async with httpx.AsyncClient(timeout=120.0) as httpx_client:
+        return await self.mcp_pool.get_tools()
+
+    async def _ask_airbnb(self, client: A2AClient, prompt: str, stream: ResultStream | None, downstream: dict) -> str:
+        """
+        Stream the request to the Airbnb agent. Its ranked stays are relayed through our
+        own task as they arrive; the returned text is its final answer.
+        Cancelling our task cancels the Airbnb task too; our deadline and trace are passed on.
+        downstream["task_id"] is set to the Airbnb task's id as soon as it is known.
+        """
+        with span("a2a airbnb", "a2a", agent="airbnb") as record:
+            text = await self._stream_airbnb(client, prompt, stream, downstream)
+            record.set(chars=len(text))
+            return text
+
+    async def _stream_airbnb(self, client: A2AClient, prompt: str, stream: ResultStream | None, downstream: dict) -> str:
+        metadata = inject(downstream_metadata())
+        send_message_payload: dict[str, Any] = {
+            "message": {
+                "role": "user",
+                "parts": [
+                    {"kind": "text", "text": prompt},
+                ],
+                "messageId": uuid4().hex,
+                **({"metadata": metadata} if metadata else {}),
+            }
+        }
+
+        request = SendStreamingMessageRequest(
+            id=str(uuid4()),
+            params=MessageSendParams(**send_message_payload),
+        )
+
+        content = A2AContent()
+        forget = None
+        try:
+            async for response in client.send_message_streaming(request):
+                event = getattr(response.root, "result", None)
+                if forget is None and (downstream_task_id := getattr(event, "task_id", None) or getattr(event, "id", None)):
+                    forget = cancel_downstream(client, downstream_task_id)
+                    downstream["task_id"] = downstream_task_id
+                if isinstance(event, TaskArtifactUpdateEvent) and is_result_artifact(event.artifact):
+                    if stream is not None:
+                        await stream.relay(event.artifact)
+                    continue
+                content.merge(decode_response(response))
+        finally:
+            if forget is not None:
+                forget()
+        return content.text
+
+    async def _cancel_airbnb(self, client: A2AClient, task_id: str) -> None:
+        try:
+            await asyncio.wait_for(
+                client.cancel_task(CancelTaskRequest(id=str(uuid4()), params=TaskIdParams(id=task_id))),
+                A2A_CANCEL_TIMEOUT,
+            )
+        except Exception as e:
+            log.warning("airbnb cancel failed", task_id=task_id, error=repr(e))
+
+    async def invoke(self, user_input: str, stream: ResultStream | None = None) -> str:
+        """
+        With a stream, ranked flights and (relayed) stays are published as artifacts
+        as soon as they are scored. Under a request deadline, an Airbnb answer that
+        hasn't arrived in time is dropped and the flights are returned on their own;
+        the same goes for an Airbnb call that fails.
+        """
+
+        async with traced_client(timeout=time_limit(120.0)) as httpx_client:
             
             # 1) Discover agent card from /.well-known/agent-card.json
             resolver = A2ACardResolver(
@@ -65,37 +138,29 @@ class FlightAgent:
             agent_card = await resolver.get_agent_card()
 
             airBnbResponse="Airbnb agent wasn't required for this use case. Ignore the Airbnb suggestions."
+            airbnb_task = None
+            airbnb_downstream: dict = {}
 
             if agent_card:
 
 
-                print("Agents Available:")
-
                 skills_mapping = {
                             "flightAgent": external_skill.model_dump(),
                             "airbnbAgent": [s.model_dump() for s in agent_card.skills],
                         }
-                
-                print(skills_mapping)
 
                 skills_mapping_str = json.dumps(skills_mapping, indent=2)
 
                 agent_decision = await agents.routing.routing(skills_mapping_str, user_input)
                 agent_decision = json.loads(agent_decision)
 
-                print("\nRouting decision:", agent_decision)
+                log.info("routing decision", decision=agent_decision)
 
                 
 
                 if agent_decision.get("airbnbAgent")==True:
 
-                    print("\n******************")
-
-                    print("Orchestrator: Hey I know a friend who can help you with this:")
-
-                    print(agent_card.name)
-
-                    print("******************\n")
+                    log.info("delegating", agent=agent_card.name)
 
                     # If only airbnb agent, then transfer the prompt here
                     airbnbPrompt = user_input
@@ -110,38 +175,44 @@ class FlightAgent:
                     # Create an A2A client for that airbnb agent
                     client = A2AClient(httpx_client=httpx_client, agent_card=agent_card)
 
-
-                    send_message_payload: dict[str, Any] = {
-                        "message": {
-                            "role": "user",
-                            "parts": [
-                                {"kind": "text", "text": airbnbPrompt},
-                            ],
-                            "messageId": uuid4().hex,
-                        }
-                    }
-
-                    request = SendMessageRequest(
-                        id=str(uuid4()),
-                        params=MessageSendParams(**send_message_payload),
-                    )
-
-                    
-                    airBnbResponse = await client.send_message(request)
-
-
-        tools = await self._ensure_tools()
-
-        if tools:
-
-            import tool_def_maker
-
-            tool_def = [tool_def_maker.lc_tool_to_openai_def(t) for t in tools]
-            tool_mapping = tool_def_maker.build_tool_mapping(tools,tool_def)
-
-
-        flightResponse = "Flight agent wasn't required for this use case. Ignore the Flight suggestions."
-        flightResponse = await agents.flight_llm.flight_search_openai(user_input,tool_mapping,tool_def)
+                    # Stream the Airbnb agent while our own flight search runs.
+                    airbnb_task = asyncio.create_task(self._ask_airbnb(client, airbnbPrompt, stream, airbnb_downstream))
+
+            tools = await self._ensure_tools()
+
+            if tools:
+
+                import tool_def_maker
+
+                tool_def = [tool_def_maker.lc_tool_to_openai_def(t) for t in tools]
+                tool_mapping = tool_def_maker.build_tool_mapping(tools,tool_def)
+
+
+            flightResponse = "Flight agent wasn't required for this use case. Ignore the Flight suggestions."
+            try:
+                flightResponse = await agents.flight_llm.flight_search_openai(
+                    user_input,tool_mapping,tool_def,
+                    on_result=stream.emitter("flight") if stream else None,
+                )
+            except BaseException:
+                if airbnb_task is not None:
+                    airbnb_task.cancel()
+                    # Let it unwind before the shared httpx client is closed.
+                    await asyncio.wait([airbnb_task])
+                raise
+
+            if airbnb_task is not None:
+                try:
+                    airBnbResponse = await asyncio.wait_for(airbnb_task, time_limit())
+                except TimeoutError:
+                    # wait_for only cancelled our side of the stream; stop the Airbnb task too.
+                    if airbnb_downstream.get("task_id"):
+                        await self._cancel_airbnb(client, airbnb_downstream["task_id"])
+                    airBnbResponse = "The Airbnb agent didn't answer before the deadline; no stay suggestions."
+                except Exception as e:
+                    # Keep the finished flight answer; only the stays are missing.
+                    log.warning("airbnb agent failed", error=repr(e))
+                    airBnbResponse = "The Airbnb agent failed; stay suggestions are unavailable."
 
         return str(flightResponse)+" "+str(airBnbResponse)
 
@@ -149,6 +220,7 @@ class FlightAgent:
 class FlightAgentExecutor(AgentExecutor):
     def __init__(self) -> None:
         self.agent = FlightAgent()
+        self.running = RunningTasks()
 
     async def execute(
         self,
@@ -156,11 +228,22 @@ class FlightAgentExecutor(AgentExecutor):
         event_queue: EventQueue,
     ) -> None:
         user_input: str = context.get_user_input()  # type: ignore[assignment]
-        result = await self.agent.invoke(user_input)
-        await event_queue.enqueue_event(new_agent_text_message(result))
+        metadata = (context.message.metadata if context.message else None) or {}
+        stream = ResultStream(await start_task(context, event_queue), source="flights")
+        with deadline_scope(from_metadata(metadata)), server_span("flights.execute", metadata):
+            try:
+                async with self.running.track(stream.updater.task_id):
+                    result = await self.agent.invoke(user_input, stream=stream)
+            except Exception as e:
+                # A task left "working" would be polled until the caller's deadline.
+                log.error("flight search failed", error=repr(e))
+                await stream.fail(f"Flight search failed: {e}")
+                return
+        await stream.answer(result)
 
     async def cancel(self, context: RequestContext, event_queue: EventQueue) -> None:
-        raise Exception("Cancellation not supported")    
+        # Cancels the running flight search and the Airbnb task it opened.
+        await self.running.cancel(context, event_queue)
 
 external_skill = AgentSkill(
     id="flight_agent",
@@ -181,9 +264,11 @@ external_card = AgentCard(
     supportsAuthenticatedExtendedCard=False,
 )
 
+agent_executor = FlightAgentExecutor()
+
 request_handler = DefaultRequestHandler(
-    agent_executor=FlightAgentExecutor(),
-    task_store=InMemoryTaskStore(),
+    agent_executor=agent_executor,
+    task_store=make_task_store("flights"),
 )
 
 app_builder = A2AStarletteApplication(
@@ -192,4 +277,9 @@ app_builder = A2AStarletteApplication(
 )
 
 # uv run uvicorn flights_a2a:app --port 8091
-app = app_builder.build()
+# The lifespan launches the flights MCP server once at startup and keeps it resident.
+app = app_builder.build(
+    lifespan=agent_executor.agent.mcp_pool.lifespan,
+    routes=[agent_executor.agent.mcp_pool.route()],
+)
+instrument(app, "flights")
@@ -1,41 +1,320 @@
 from mcp.server.fastmcp import FastMCP
+import asyncio
 import json
+import logging
+import time
+from datetime import date, timedelta
 
 import requests
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 import os
 
+from ttl_cache import TTLCache
+
 load_dotenv()
+
+from structured_log import get_logger
+from tracing import set_service, span, traced
+
+set_service("flights_mcp")
+log = get_logger("flights_mcp")
 RAPID_GOOGLE_FLIGHTS_API=os.getenv("RAPID_GOOGLE_FLIGHTS_API", "")
 
+FLIGHTS_URL = "https://google-flights2.p.rapidapi.com/api/v1/searchFlights"
+
+# Identical searches within this window are served from memory.
+FLIGHT_CACHE_TTL = float(os.getenv("FLIGHT_CACHE_TTL", "900"))
+
+# Only this many itineraries (after projection) are returned to the model.
+MAX_FLIGHT_RESULTS = int(os.getenv("MAX_FLIGHT_RESULTS", "15"))
+
+DEFAULT_QUERY = {
+    "travel_class": "ECONOMY",
+    "adults": "1",
+    "show_hidden": "1",
+    "currency": "USD",
+    "language_code": "en-US",
+    "country_code": "US",
+    "search_type": "best",
+}
+
+UPPERCASE_FIELDS = ("departure_id", "arrival_id", "travel_class", "currency", "country_code")
+
+# Upstream protection for fan-out searches: at most this many requests in flight
+# and this many request starts per second. Cache hits bypass both.
+FLIGHT_SEARCH_CONCURRENCY = int(os.getenv("FLIGHT_SEARCH_CONCURRENCY", "4"))
+FLIGHT_SEARCH_RATE_PER_SEC = float(os.getenv("FLIGHT_SEARCH_RATE_PER_SEC", "5"))
+
+# Largest outbound x trip-length grid a single price calendar may search.
+CALENDAR_MAX_SEARCHES = int(os.getenv("CALENDAR_MAX_SEARCHES", "42"))
+
 
 mcp=FastMCP("Flights Server")
 
 
+# One pooled, keep-alive session for every RapidAPI call made by this server.
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=2))
+_session.headers.update({
+    "x-rapidapi-key": RAPID_GOOGLE_FLIGHTS_API,
+    "x-rapidapi-host": "google-flights2.p.rapidapi.com",
+})
+
+search_cache = TTLCache(maxsize=512, ttl=FLIGHT_CACHE_TTL, name="flight_search")
+
+
+class RateLimiter:
+    """
+    Spaces request starts at least 1/rate seconds apart.
+    """
+
+    def __init__(self, rate_per_sec: float) -> None:
+        self._interval = 1.0 / rate_per_sec if rate_per_sec > 0 else 0.0
+        self._next_start = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self) -> None:
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next_start - now
+            self._next_start = max(now, self._next_start) + self._interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+_rate_limiter = RateLimiter(FLIGHT_SEARCH_RATE_PER_SEC)
+_search_slots = asyncio.Semaphore(FLIGHT_SEARCH_CONCURRENCY)
+
+
+def normalize_query(querystring: dict) -> dict:
+    """
+    Fill in defaults, drop empty values and normalize casing so equivalent
+    searches share one cache key.
+    """
+    query = dict(DEFAULT_QUERY)
+    for key, value in (querystring or {}).items():
+        if value is None or str(value).strip() == "":
+            continue
+        query[key] = str(value).strip()
+    for key in UPPERCASE_FIELDS:
+        if key in query:
+            query[key] = query[key].upper()
+    return dict(sorted(query.items()))
+
+
+def _minutes(duration) -> int | None:
+    if isinstance(duration, dict):
+        duration = duration.get("raw")
+    try:
+        return int(duration)
+    except (TypeError, ValueError):
+        return None
+
+
+def _price(price) -> float | None:
+    if isinstance(price, dict):
+        price = price.get("amount") or price.get("raw")
+    if isinstance(price, str):
+        price = price.replace("$", "").replace(",", "").strip()
+    try:
+        return float(price)
+    except (TypeError, ValueError):
+        return None
+
+
+def _itineraries(payload: dict) -> list[dict]:
+    data = payload.get("data", payload) if isinstance(payload, dict) else {}
+    itineraries = data.get("itineraries", data) if isinstance(data, dict) else data
+    if isinstance(itineraries, list):
+        return itineraries
+    if isinstance(itineraries, dict):
+        return (itineraries.get("topFlights") or []) + (itineraries.get("otherFlights") or [])
+    return []
+
+
+def project_itinerary(itinerary: dict) -> dict:
+    """
+    Keep only the fields flights are ranked on: price, duration, stops, carrier and times.
+    """
+    legs = itinerary.get("flights") or []
+    first, last = (legs[0], legs[-1]) if legs else ({}, {})
+
+    carriers = []
+    for leg in legs:
+        airline = leg.get("airline")
+        if airline and airline not in carriers:
+            carriers.append(airline)
+
+    stops = itinerary.get("stops")
+    if stops is None and legs:
+        stops = len(legs) - 1
+
+    return {
+        "price": _price(itinerary.get("price")),
+        "duration_min": _minutes(itinerary.get("duration")),
+        "stops": stops,
+        "carrier": ", ".join(carriers) or itinerary.get("airline"),
+        "flight_numbers": [leg.get("flight_number") for leg in legs if leg.get("flight_number")],
+        "departure_time": itinerary.get("departure_time") or (first.get("departure_airport") or {}).get("time"),
+        "arrival_time": itinerary.get("arrival_time") or (last.get("arrival_airport") or {}).get("time"),
+    }
+
+
+def project_flights(payload: dict, max_results: int = MAX_FLIGHT_RESULTS) -> list[dict]:
+    flights = [project_itinerary(it) for it in _itineraries(payload) if isinstance(it, dict)]
+    # Identical itineraries show up in both topFlights and otherFlights.
+    unique = {json.dumps(f, sort_keys=True): f for f in flights}
+    return list(unique.values())[:max_results]
+
+
+def _fetch(query: dict) -> dict:
+    with span("GET google-flights2.p.rapidapi.com", "http", url=FLIGHTS_URL) as record:
+        response = _session.get(FLIGHTS_URL, params=query, timeout=30)
+        record.set(status_code=response.status_code)
+        response.raise_for_status()
+        return response.json()
+
+
+async def search_flights(querystring: dict) -> dict:
+    """
+    Cached, single-flight flight search returning the projected result.
+    Concurrent identical searches share one upstream request.
+    """
+    query = normalize_query(querystring)
+
+    async def load() -> dict:
+        async with _search_slots:
+            await _rate_limiter.wait()
+            payload = await asyncio.to_thread(_fetch, query)
+        flights = project_flights(payload)
+        result = {"query": query, "count": len(flights), "flights": flights}
+        # Sizing both payloads re-serializes them: only when the record is kept.
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug(
+                "flight search",
+                route=f"{query.get('departure_id')}->{query.get('arrival_id')}",
+                raw_bytes=len(json.dumps(payload)),
+                projected_bytes=len(json.dumps(result)),
+            )
+        return result
+
+    return await search_cache.get_or_load(json.dumps(query), load)
 
 
 @mcp.tool()
-def flight_search(querystring: dict = {}) -> str:
+@traced(mcp)
+async def flight_search(querystring: dict = {}) -> str:
     """
     Uses Google FLights API to search for flights based on the given parameters.
     The query string dict must look like this:
     {"departure_id":"LAX","arrival_id":"JFK","outbound_date":"2025-12-24","return_date":"2026-01-09","travel_class":"ECONOMY","adults":"1","show_hidden":"1","currency":"USD","language_code":"en-US","country_code":"US","search_type":"best"}
-    Return the search results in JSON format that is converted into a string.
+    Only departure_id, arrival_id and outbound_date are required; the rest default to the values above.
+    Returns JSON with the matching flights (price, duration_min, stops, carrier, flight_numbers, departure_time, arrival_time).
     """
-    # url = "https://google-flights2.p.rapidapi.com/api/v1/searchFlights"
+    if not RAPID_GOOGLE_FLIGHTS_API:
+        return json.dumps({"error": "RAPID_GOOGLE_FLIGHTS_API is not set; flight search is unavailable."})
+
+    try:
+        result = await search_flights(querystring)
+    except requests.RequestException as e:
+        return json.dumps({"error": f"Flight search failed: {e}"})
+
+    return json.dumps(result, separators=(",", ":"))
+
 
-    # # querystring = {"departure_id":"LAX","arrival_id":"JFK","outbound_date":"2025-12-24","return_date":"2026-01-09","travel_class":"ECONOMY","adults":"1","show_hidden":"1","currency":"USD","language_code":"en-US","country_code":"US","search_type":"best"}
+def _calendar_grid(start_date: str, end_date: str, trip_lengths: list[int]) -> list[tuple[str, str | None]]:
+    start, end = date.fromisoformat(start_date), date.fromisoformat(end_date)
+    if end < start:
+        raise ValueError("end_date is before start_date")
+    outbound_dates = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+    if not trip_lengths:
+        return [(d.isoformat(), None) for d in outbound_dates]
+    return [
+        (d.isoformat(), (d + timedelta(days=n)).isoformat())
+        for d in outbound_dates
+        for n in trip_lengths
+    ]
+
+
+async def _cheapest(query: dict) -> dict | None:
+    result = await search_flights(query)
+    priced = [f for f in result["flights"] if f.get("price") is not None]
+    return min(priced, key=lambda f: f["price"]) if priced else None
+
+
+@mcp.tool()
+@traced(mcp)
+async def flight_price_calendar(
+    departure_id: str,
+    arrival_id: str,
+    start_date: str,
+    end_date: str,
+    trip_lengths: list[int] = [],
+    travel_class: str = "ECONOMY",
+    adults: int = 1,
+    currency: str = "USD",
+) -> str:
+    """
+    Cheapest price for every departure date in a window, e.g. "cheapest week in January".
+    Dates are YYYY-MM-DD. trip_lengths are return-trip lengths in days (e.g. [7]);
+    leave empty for one-way prices.
+    Returns a compact JSON price table: one row per outbound date, one column per
+    trip length, plus the overall cheapest option. Use this instead of calling
+    flight_search once per date.
+    """
+    if not RAPID_GOOGLE_FLIGHTS_API:
+        return json.dumps({"error": "RAPID_GOOGLE_FLIGHTS_API is not set; flight search is unavailable."})
 
-    # headers = {
-    #     "x-rapidapi-key": RAPID_GOOGLE_FLIGHTS_API,
-    #     "x-rapidapi-host": "google-flights2.p.rapidapi.com"
-    # }
+    try:
+        grid = _calendar_grid(start_date, end_date, trip_lengths)
+    except ValueError as e:
+        return json.dumps({"error": f"Invalid date window: {e}"})
+    if len(grid) > CALENDAR_MAX_SEARCHES:
+        return json.dumps({
+            "error": f"The window needs {len(grid)} searches; the limit is {CALENDAR_MAX_SEARCHES}. "
+                     "Narrow the dates or use fewer trip lengths."
+        })
 
-    # response = requests.get(url, headers=headers, params=querystring)
+    base = {
+        "departure_id": departure_id,
+        "arrival_id": arrival_id,
+        "travel_class": travel_class,
+        "adults": adults,
+        "currency": currency,
+    }
+    queries = [
+        {**base, "outbound_date": outbound, **({"return_date": ret} if ret else {})}
+        for outbound, ret in grid
+    ]
+    cells = await asyncio.gather(*(_cheapest(q) for q in queries), return_exceptions=True)
 
-    # return json.dumps(response.json())
+    lengths = trip_lengths or [None]
+    columns = ["outbound_date"] + [f"{n}d" if n is not None else "one_way" for n in lengths]
+    rows: dict[str, list] = {}
+    cheapest = None
+    errors = 0
+    for (outbound, ret), cell in zip(grid, cells):
+        row = rows.setdefault(outbound, [outbound])
+        if isinstance(cell, Exception):
+            errors += 1
+            row.append(None)
+            continue
+        row.append(cell["price"] if cell else None)
+        if cell and (cheapest is None or cell["price"] < cheapest["price"]):
+            cheapest = {"outbound_date": outbound, "return_date": ret, **cell}
 
-    return "Your flight ticket is $100"
+    return json.dumps(
+        {
+            "route": f"{departure_id.upper()}-{arrival_id.upper()}",
+            "currency": currency.upper(),
+            "columns": columns,
+            "rows": list(rows.values()),
+            "cheapest": cheapest,
+            "failed_searches": errors,
+        },
+        separators=(",", ":"),
+    )
 
 
 
@@ -44,4 +323,4 @@ def flight_search(querystring: dict = {}) -> str:
 #Use standard input/output (stdin and stdout) to receive and respond to tool function calls.
 
 if __name__=="__main__":
-    mcp.run(transport="stdio")
\ No newline at end of file
+    mcp.run(transport="stdio")
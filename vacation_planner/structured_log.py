@@ -0,0 +1,131 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from typing import Any
+
+import tracing
+
+# Log records are handed to a queue and written by a background thread, so logging on a
+# hot path never waits on the terminal / disk. Output goes to stderr or LOG_FILE, never
+# stdout (MCP stdio servers use stdout for the protocol).
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FILE = os.getenv("LOG_FILE", "")
+# text (one `key=value` line per record) or json (JSON lines).
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+# Share of DEBUG records kept (payload previews of every tool call / completion).
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1"))
+# String fields (tool responses, documents, user input) are cut to this many characters.
+LOG_PREVIEW_CHARS = int(os.getenv("LOG_PREVIEW_CHARS", "300"))
+
+ROOT_LOGGER = "app"
+
+# Keyword arguments that logging itself takes; every other keyword becomes a field.
+_LOGGING_KWARGS = {"exc_info", "stack_info", "stacklevel", "extra"}
+
+_listener: logging.handlers.QueueListener | None = None
+_lock = threading.Lock()
+
+
+def preview(value: Any, limit: int = LOG_PREVIEW_CHARS) -> Any:
+    """
+    Numbers and booleans as they are; anything else as a string of at most `limit` characters.
+    """
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    text = value if isinstance(value, str) else repr(value)
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}… (+{len(text) - limit} chars)"
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps a LOG_SAMPLE_RATE share of DEBUG records; INFO and above always pass.
+    """
+
+    def __init__(self, rate: float = LOG_SAMPLE_RATE) -> None:
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno > logging.DEBUG or self.rate >= 1 or random.random() < self.rate
+
+
+class StructuredFormatter(logging.Formatter):
+    """
+    Formats the message plus the record's fields (previewed) as text or a JSON line.
+    Runs in the listener thread, so the cost of rendering payloads stays off the hot path.
+    """
+
+    def __init__(self, fmt: str = LOG_FORMAT) -> None:
+        super().__init__()
+        self.json = fmt == "json"
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = {k: preview(v) for k, v in getattr(record, "fields", {}).items()}
+        if record.exc_info:
+            fields["exc"] = self.formatException(record.exc_info)
+        created = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)) + f".{int(record.msecs):03d}"
+        logger = record.name.removeprefix(f"{ROOT_LOGGER}.")
+        if self.json:
+            return json.dumps(
+                {"ts": created, "level": record.levelname, "logger": logger, "msg": record.getMessage(), **fields},
+                ensure_ascii=False,
+                default=str,
+            )
+        pairs = " ".join(f"{k}={json.dumps(v, ensure_ascii=False, default=str)}" for k, v in fields.items())
+        return f"{created} {record.levelname:<5} {logger}: {record.getMessage()}{' ' + pairs if pairs else ''}"
+
+
+class StructuredLogger(logging.LoggerAdapter):
+    """
+    log.info("tool call", tool=name, args=args): keyword arguments become structured fields,
+    plus the trace id of the current span. Disabled levels cost one level check.
+    """
+
+    def process(self, msg: Any, kwargs: dict[str, Any]) -> tuple[Any, dict[str, Any]]:
+        fields = {k: kwargs.pop(k) for k in list(kwargs) if k not in _LOGGING_KWARGS}
+        if (span := tracing.current()) is not None:
+            fields.setdefault("trace_id", span.trace_id)
+        kwargs["extra"] = {**(kwargs.get("extra") or {}), "fields": fields}
+        return msg, kwargs
+
+
+def _configure() -> None:
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return
+        if LOG_FILE:
+            os.makedirs(os.path.dirname(LOG_FILE) or ".", exist_ok=True)
+            output: logging.Handler = logging.FileHandler(LOG_FILE, encoding="utf-8")
+        else:
+            output = logging.StreamHandler(sys.stderr)
+        output.setFormatter(StructuredFormatter())
+
+        records: queue.SimpleQueue = queue.SimpleQueue()
+        handler = logging.handlers.QueueHandler(records)
+        handler.addFilter(SamplingFilter())
+        # QueueHandler.prepare() would format in the caller's thread; the listener's handler does it.
+        handler.prepare = lambda record: record
+
+        root = logging.getLogger(ROOT_LOGGER)
+        root.setLevel(LOG_LEVEL)
+        root.addHandler(handler)
+        root.propagate = False
+
+        _listener = logging.handlers.QueueListener(records, output)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+
+def get_logger(name: str) -> StructuredLogger:
+    _configure()
+    return StructuredLogger(logging.getLogger(f"{ROOT_LOGGER}.{name}"), {})
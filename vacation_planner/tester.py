@@ -1,25 +1,42 @@
 import asyncio
+import json
+import os
+import time
 from uuid import uuid4
 from typing import Any
 
-import httpx
 from a2a.client import A2ACardResolver, A2AClient
-from a2a.types import MessageSendParams, SendMessageRequest
+from a2a.types import MessageSendParams, SendStreamingMessageRequest, TaskArtifactUpdateEvent
 
 from dotenv import load_dotenv
 
-import agents.a2a_final_response
+from agents.a2a_response import A2AContent, decode_response
+from agents.streaming import is_result_artifact
+from deadline import DEADLINE_KEY
 
 load_dotenv()
 
+from tracing import inject, set_service, span, traced_client
+
+set_service("tester")
+
 BASE_URL = "http://localhost:8091"
+# Seconds the agents get for one request; sent as an absolute deadline in the message metadata.
+REQUEST_BUDGET = float(os.getenv("A2A_REQUEST_BUDGET", "120"))
 
 
 async def ask_agent(message: str) -> None:
     """
     Send a simple A2A message to the Flight agent and print the response.
     """
-    async with httpx.AsyncClient(timeout=120.0) as httpx_client:
+    deadline = time.time() + REQUEST_BUDGET
+    with span("tester.ask_agent", "a2a", agent="flights") as root:
+        print(f"trace: {root.trace_id}  (render with: python tracing.py {root.trace_id[:8]})")
+        await _ask_agent(message, deadline)
+
+
+async def _ask_agent(message: str, deadline: float) -> None:
+    async with traced_client(timeout=REQUEST_BUDGET) as httpx_client:
         # 1) Discover agent card from /.well-known/agent-card.json
         resolver = A2ACardResolver(
             httpx_client=httpx_client,
@@ -50,23 +67,46 @@ async def ask_agent(message: str) -> None:
                     {"kind": "text", "text": full_message},
                 ],
                 "messageId": uuid4().hex,
+                "metadata": inject({DEADLINE_KEY: deadline}),
             }
         }
 
-        request = SendMessageRequest(
+        request = SendStreamingMessageRequest(
             id=str(uuid4()),
             params=MessageSendParams(**send_message_payload),
         )
 
-        # 4) Call the agent via A2A
-        response = await client.send_message(request)
-
-        # 5) Print raw JSON for now
-        print("=== Raw A2A response ===")
-
-        final_response = await agents.a2a_final_response.final_response(message, str(response.model_dump(mode="json", exclude_none=True)))
-
-        print(final_response)
+        # 4) Stream the call: ranked flights and stays arrive as artifacts before the answer
+        started = time.perf_counter()
+        first_result_at = None
+        results = 0
+        content = A2AContent()
+
+        print("=== A2A stream ===")
+        async for response in client.send_message_streaming(request):
+            event = getattr(response.root, "result", None)
+            elapsed = time.perf_counter() - started
+
+            if isinstance(event, TaskArtifactUpdateEvent) and is_result_artifact(event.artifact):
+                results += 1
+                if first_result_at is None:
+                    first_result_at = elapsed
+                meta = event.artifact.metadata
+                for part in event.artifact.parts:
+                    data = getattr(part.root, "data", None)
+                    print(f"[{elapsed:6.2f}s] {meta.get('kind')} #{meta.get('rank')} ({meta.get('source')}): {json.dumps(data, ensure_ascii=False)}")
+                continue
+
+            content.merge(decode_response(response))
+
+        total = time.perf_counter() - started
+
+        # 5) The final answer (text parts of the task; no extra LLM pass)
+        print("=== A2A response ===")
+        print(content.text)
+
+        ttfr = f"{first_result_at:.2f}s" if first_result_at is not None else "n/a"
+        print(f"\nresults streamed: {results}  time to first result: {ttfr}  total: {total:.2f}s")
 
 
 async def main() -> None:
@@ -0,0 +1,419 @@
+import argparse
+import atexit
+import functools
+import inspect
+import json
+import os
+import queue
+import secrets
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Iterator
+
+import httpx
+
+# "" (off), "file" (JSON lines in TRACE_FILE) or "otlp" (OTLP/HTTP JSON to TRACE_OTLP_ENDPOINT).
+# MCP servers started over stdio don't inherit the environment: set these in .env
+# (the servers import this module after load_dotenv()).
+TRACE_EXPORT = os.getenv("TRACE_EXPORT", "")
+TRACE_FILE = os.getenv("TRACE_FILE", ".traces/spans.jsonl")
+TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+# Spans are exported in batches from a background thread, at least this often.
+TRACE_FLUSH_INTERVAL = float(os.getenv("TRACE_FLUSH_INTERVAL", "1"))
+
+# W3C trace context: the key in A2A message metadata / MCP request _meta, the HTTP header,
+# and the environment variable a (per-call) MCP subprocess reads at startup.
+TRACEPARENT_KEY = "traceparent"
+TRACEPARENT_ENV = "TRACEPARENT"
+
+# Span kinds, as rendered by the waterfall and mapped to OTLP span kinds.
+SERVER, CLIENT, INTERNAL = "server", "client", "internal"
+KINDS = {"a2a": CLIENT, "http": CLIENT, "llm": CLIENT, "tool": CLIENT, "server": SERVER, "mcp": SERVER, "stage": INTERNAL}
+OTLP_KINDS = {INTERNAL: 1, SERVER: 2, CLIENT: 3}
+
+_service = os.getenv("TRACE_SERVICE", os.path.basename(sys.argv[0]).removesuffix(".py") or "python")
+
+
+@dataclass
+class Span:
+    trace_id: str
+    span_id: str
+    parent_id: str | None
+    name: str
+    kind: str
+    service: str
+    start: float
+    end: float | None = None
+    attributes: dict[str, Any] = field(default_factory=dict)
+    error: str | None = None
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update({k: v for k, v in attributes.items() if v is not None})
+
+    def set_usage(self, completion: Any) -> None:
+        """
+        Record the token usage of a chat completion (when the provider reports it).
+        """
+        usage = getattr(completion, "usage", None)
+        self.set(
+            prompt_tokens=getattr(usage, "prompt_tokens", None),
+            completion_tokens=getattr(usage, "completion_tokens", None),
+        )
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+
+_current: ContextVar[Span | None] = ContextVar("trace_span", default=None)
+# Called with every finished span, whether or not spans are exported (see metrics.py).
+_listeners: list[Callable[[Span], None]] = []
+
+
+def set_service(name: str) -> None:
+    """
+    Name this process in exported spans (call once at import time of the app / MCP server).
+    """
+    global _service
+    _service = name
+
+
+def on_span_end(listener: Callable[[Span], None]) -> None:
+    _listeners.append(listener)
+
+
+def parse_traceparent(value: str | None) -> tuple[str, str] | None:
+    parts = (value or "").split("-")
+    if len(parts) == 4 and len(parts[1]) == 32 and len(parts[2]) == 16:
+        return parts[1], parts[2]
+    return None
+
+
+def current() -> Span | None:
+    return _current.get()
+
+
+def traceparent() -> str | None:
+    span = _current.get()
+    return span.traceparent if span else None
+
+
+def inject(metadata: dict | None = None) -> dict:
+    """
+    Metadata for an outgoing A2A message / MCP request, carrying the current trace context.
+    """
+    metadata = dict(metadata or {})
+    if (value := traceparent()) is not None:
+        metadata[TRACEPARENT_KEY] = value
+    return metadata
+
+
+def subprocess_env(env: dict | None = None) -> dict:
+    """
+    Environment for an MCP subprocess started for one call, so its spans join this trace
+    and are exported the same way.
+    """
+    env = dict(env or {})
+    env.update({k: v for k, v in os.environ.items() if k.startswith("TRACE_")})
+    if (value := traceparent()) is not None:
+        env[TRACEPARENT_ENV] = value
+    return env
+
+
+@contextmanager
+def span(name: str, kind: str = "internal", parent: str | None = None, **attributes: Any) -> Iterator[Span]:
+    """
+    Record a span around the block. The parent is the current span, or the `parent`
+    traceparent (from A2A metadata / MCP _meta / TRACEPARENT) when there is none.
+    """
+    outer = _current.get()
+    if outer is not None:
+        trace_id, parent_id = outer.trace_id, outer.span_id
+    elif (remote := parse_traceparent(parent or os.getenv(TRACEPARENT_ENV))) is not None:
+        trace_id, parent_id = remote
+    else:
+        trace_id, parent_id = secrets.token_hex(16), None
+
+    record = Span(trace_id, secrets.token_hex(8), parent_id, name, kind, _service, time.time())
+    record.set(**attributes)
+    token = _current.set(record)
+    try:
+        yield record
+    except BaseException as e:
+        record.error = repr(e)
+        raise
+    finally:
+        record.end = time.time()
+        _current.reset(token)
+        for listener in _listeners:
+            listener(record)
+        _exporter.add(record)
+
+
+def server_span(name: str, metadata: dict | None, **attributes: Any):
+    """
+    Span for one incoming A2A request, continuing the caller's trace from the message metadata.
+    """
+    return span(name, "server", parent=(metadata or {}).get(TRACEPARENT_KEY), **attributes)
+
+
+def mcp_span(server: Any, tool: str, **attributes: Any):
+    """
+    Span for one tool call inside a FastMCP server, continuing the client's trace from the
+    request's _meta.traceparent (pooled sessions) or TRACEPARENT (per-call subprocesses).
+    """
+    parent = None
+    try:
+        meta = server.get_context().request_context.meta
+        parent = getattr(meta, TRACEPARENT_KEY, None) or (meta.model_extra or {}).get(TRACEPARENT_KEY)
+    except (AttributeError, LookupError, ValueError):
+        pass
+    return span(f"mcp {tool}", "mcp", parent=parent, **attributes)
+
+
+def traced(server: Any):
+    """
+    Decorator for FastMCP tools (below @server.tool()): every call runs in an mcp_span.
+    """
+    def decorate(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                with mcp_span(server, fn.__name__):
+                    return await fn(*args, **kwargs)
+        else:
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with mcp_span(server, fn.__name__):
+                    return fn(*args, **kwargs)
+        return wrapper
+
+    return decorate
+
+
+class TracingTransport(httpx.AsyncBaseTransport):
+    """
+    httpx transport that records an "http" span per request and sends the traceparent header.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport | None = None) -> None:
+        self._transport = transport or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        with span(f"{request.method} {request.url.host}{request.url.path}", "http", url=str(request.url)) as record:
+            request.headers[TRACEPARENT_KEY] = record.traceparent
+            response = await self._transport.handle_async_request(request)
+            record.set(status_code=response.status_code)
+            return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+def traced_client(**kwargs: Any) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=TracingTransport(), **kwargs)
+
+
+# ---- export ------------------------------------------------------------------------
+
+
+def _otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(spans: list[Span]) -> dict:
+    by_service: dict[str, list[Span]] = defaultdict(list)
+    for record in spans:
+        by_service[record.service].append(record)
+    return {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service}}]},
+                "scopeSpans": [
+                    {
+                        "scope": {"name": "a2a-tracing"},
+                        "spans": [
+                            {
+                                "traceId": s.trace_id,
+                                "spanId": s.span_id,
+                                **({"parentSpanId": s.parent_id} if s.parent_id else {}),
+                                "name": s.name,
+                                "kind": OTLP_KINDS[KINDS.get(s.kind, INTERNAL)],
+                                "startTimeUnixNano": str(int(s.start * 1e9)),
+                                "endTimeUnixNano": str(int((s.end or s.start) * 1e9)),
+                                "attributes": [
+                                    {"key": k, "value": _otlp_value(v)}
+                                    for k, v in {"span.kind": s.kind, **s.attributes}.items()
+                                ],
+                                "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+                            }
+                            for s in group
+                        ],
+                    }
+                ],
+            }
+            for service, group in by_service.items()
+        ]
+    }
+
+
+class SpanExporter:
+    """
+    Queues finished spans and writes them from a daemon thread, so recording a span never
+    blocks the event loop. Nothing is kept when TRACE_EXPORT is off.
+    """
+
+    def __init__(self, mode: str = TRACE_EXPORT, path: str = TRACE_FILE, endpoint: str = TRACE_OTLP_ENDPOINT) -> None:
+        self.mode = mode
+        self.path = path
+        self.endpoint = endpoint
+        self._queue: queue.Queue[Span] = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def add(self, record: Span) -> None:
+        if not self.mode:
+            return
+        self._queue.put(record)
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+                    self._thread.start()
+                    atexit.register(self.flush)
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(TRACE_FLUSH_INTERVAL)
+            self.flush()
+
+    def flush(self) -> None:
+        batch: list[Span] = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if not batch:
+            return
+        try:
+            if self.mode == "otlp":
+                httpx.post(self.endpoint, json=to_otlp(batch), timeout=5.0).raise_for_status()
+            else:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                lines = "".join(json.dumps(asdict(s), default=str) + "\n" for s in batch)
+                # One append per batch: lines from concurrent processes don't interleave.
+                with open(self.path, "a") as f:
+                    f.write(lines)
+        except Exception as e:
+            print(f"[tracing] dropped {len(batch)} spans: {e!r}", file=sys.stderr)
+
+
+_exporter = SpanExporter()
+
+
+# ---- waterfall CLI ---------------------------------------------------------------
+
+
+def load_spans(path: str) -> dict[str, list[Span]]:
+    traces: dict[str, list[Span]] = defaultdict(list)
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                record = Span(**json.loads(line))
+                traces[record.trace_id].append(record)
+    return traces
+
+
+def critical_path(root: Span, children: dict[str, list[Span]]) -> list[Span]:
+    """
+    The chain of spans that determined root's end time: walking back from the end, the
+    child that finished last, then whatever finished before that child started, and so on.
+    """
+    path = [root]
+    cursor = root.end
+    for child in sorted(children.get(root.span_id, []), key=lambda s: s.end, reverse=True):
+        if child.end <= cursor + 1e-3:
+            path.extend(critical_path(child, children))
+            cursor = child.start
+    return path
+
+
+def render(spans: list[Span], width: int = 50) -> str:
+    ids = {s.span_id for s in spans}
+    children: dict[str, list[Span]] = defaultdict(list)
+    roots = []
+    for s in sorted(spans, key=lambda s: s.start):
+        if s.parent_id in ids:
+            children[s.parent_id].append(s)
+        else:
+            roots.append(s)
+
+    start = min(s.start for s in spans)
+    total = max(s.end for s in spans) - start or 1e-9
+    critical = {s.span_id: s for root in roots for s in critical_path(root, children)}
+
+    lines = [f"trace {spans[0].trace_id}  {total * 1000:.0f} ms  {len(spans)} spans  (* = critical path)"]
+
+    def walk(s: Span, depth: int) -> None:
+        left = int((s.start - start) / total * width)
+        bar = max(1, int((s.end - s.start) / total * width))
+        label = f"{'  ' * depth}{s.name} [{s.service}]"
+        mark = "*" if s.span_id in critical else " "
+        error = "  ERROR" if s.error else ""
+        lines.append(f"{mark} {label[:48]:<48} {(s.end - s.start) * 1000:8.0f} ms |{' ' * left}{'█' * bar}{error}")
+        for child in children.get(s.span_id, []):
+            walk(child, depth + 1)
+
+    for root in roots:
+        walk(root, 0)
+
+    # Exclusive time of each critical span (minus its critical children), by kind.
+    breakdown: dict[str, float] = defaultdict(float)
+    for s in critical.values():
+        nested = sum(c.end - c.start for c in children.get(s.span_id, []) if c.span_id in critical)
+        breakdown[f"{s.kind} ({s.service})"] += max(0.0, (s.end - s.start) - nested)
+    lines.append("critical path breakdown:")
+    for key, seconds in sorted(breakdown.items(), key=lambda kv: kv[1], reverse=True):
+        lines.append(f"  {key:<40} {seconds * 1000:8.0f} ms  {seconds / total:6.1%}")
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Render recorded traces as critical-path waterfalls.")
+    parser.add_argument("trace_id", nargs="?", help="trace to render (default: list the latest traces)")
+    parser.add_argument("--file", default=TRACE_FILE)
+    parser.add_argument("--last", type=int, default=10, help="how many traces to list")
+    args = parser.parse_args()
+
+    traces = load_spans(args.file)
+    if args.trace_id:
+        matches = [t for t in traces if t.startswith(args.trace_id)]
+        if not matches:
+            sys.exit(f"no trace {args.trace_id!r} in {args.file}")
+        print(render(traces[matches[0]]))
+        return
+
+    latest = sorted(traces.values(), key=lambda spans: min(s.start for s in spans), reverse=True)[: args.last]
+    for spans in latest:
+        root = min(spans, key=lambda s: s.start)
+        duration = max(s.end for s in spans) - root.start
+        started = time.strftime("%H:%M:%S", time.localtime(root.start))
+        print(f"{root.trace_id}  {started}  {duration * 1000:8.0f} ms  {len(spans):4d} spans  {root.name}")
+
+
+# uv run python tracing.py              list the latest traces in TRACE_FILE
+# uv run python tracing.py <trace id>   waterfall + critical path of one request
+if __name__ == "__main__":
+    main()